@@ -170,6 +170,53 @@ MEDIA_URL = '/media/'
 # STATIC_ROOT = os.path.join(os.path.dirname(BASE_DIR),"myApp/static")
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Embeddings
+# Модель загружается лениво при первом обращении (db.model_provider).
+# EMBEDDING_MODEL_PATH — локальный каталог с моделью: загрузка без сети.
+# EMBEDDING_PRELOAD — загрузить модель в master-процессе gunicorn до fork.
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/paraphrase-multilingual-mpnet-base-v2")
+EMBEDDING_MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH")
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE")
+EMBEDDING_OFFLINE = os.getenv("EMBEDDING_OFFLINE", "0") == "1"
+EMBEDDING_PRELOAD = os.getenv("EMBEDDING_PRELOAD", "0") == "1"
+EMBEDDING_TORCH_THREADS = int(os.getenv("EMBEDDING_TORCH_THREADS", "0")) or None
+# Микробатчинг: запросы на кодирование из разных потоков объединяются в батчи
+EMBEDDING_BATCHING = os.getenv("EMBEDDING_BATCHING", "1") == "1"
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "64"))
+EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+# Отдельный процесс с моделью (manage.py embedding_server) на Unix-сокете;
+# без EMBEDDING_SERVER_SOCKET модель загружается в каждом воркере
+EMBEDDING_SERVER_SOCKET = os.getenv("EMBEDDING_SERVER_SOCKET")
+EMBEDDING_SERVER_TIMEOUT = float(os.getenv("EMBEDDING_SERVER_TIMEOUT", "30"))
+EMBEDDING_SERVER_FALLBACK = os.getenv("EMBEDDING_SERVER_FALLBACK", "1") == "1"
+# Кодирование сохраняемых векторов: float32, float16 или int8 (масштаб на вектор)
+EMBEDDING_STORAGE_ENCODING = os.getenv("EMBEDDING_STORAGE_ENCODING", "float32")
+# Каталог с матрицей нормированных эмбеддингов (.npy, открывается через mmap)
+EMBEDDING_MATRIX_DIR = os.getenv("EMBEDDING_MATRIX_DIR", os.path.join(BASE_DIR, "embeddings"))
+EMBEDDING_MATRIX_ENCODING = os.getenv("EMBEDDING_MATRIX_ENCODING", "float32")
+# IVF-индекс эмбеддингов фрагментов (manage.py build_ann_index)
+ANN_INDEX_DIR = os.getenv("ANN_INDEX_DIR", os.path.join(BASE_DIR, "embeddings", "ann"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+
+# Neo4j
+# Проверка ограничений уникальности uri при старте (manage.py check / runserver);
+# создать их: manage.py bootstrap_schema
+NEO4J_SCHEMA_CHECK = os.getenv("NEO4J_SCHEMA_CHECK", "1") == "1"
+# Асинхронные представления онтологии/классов/объектов (db.async_views);
+# только под ASGI-сервером: uvicorn core.asgi:application (core.wsgi с ним не стартует)
+ONTOLOGY_ASYNC = os.getenv("ONTOLOGY_ASYNC", "0") == "1"
+# Хранилище онтологии: neo4j или memory (networkx в памяти каждого процесса,
+# изменения не сохраняются и не видны другим воркерам; асинхронный режим — только neo4j).
+# ONTOLOGY_SNAPSHOT — JSON-снимок для memory (manage.py ontology_snapshot)
+ONTOLOGY_BACKEND = os.getenv("ONTOLOGY_BACKEND", "neo4j")
+ONTOLOGY_SNAPSHOT = os.getenv("ONTOLOGY_SNAPSHOT")
+# Фоновые задачи (?async=1 у delete_class и удаления атрибутов, manage.py run_ontology_jobs):
+# строк на пакет, пауза опроса очереди и через сколько секунд без контрольной
+# точки задача считается брошенной и забирается другим воркером
+ONTOLOGY_JOB_BATCH_SIZE = int(os.getenv("ONTOLOGY_JOB_BATCH_SIZE", "5000"))
+ONTOLOGY_JOB_POLL_INTERVAL = float(os.getenv("ONTOLOGY_JOB_POLL_INTERVAL", "2"))
+ONTOLOGY_JOB_STALE_AFTER = float(os.getenv("ONTOLOGY_JOB_STALE_AFTER", "300"))
+
 # Heroku: Update database configuration from $DATABASE_URL.
 db_from_env = dj_database_url.config()
 DATABASES['default'].update(db_from_env)
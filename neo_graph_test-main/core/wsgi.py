@@ -14,3 +14,17 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# Под WSGI каждый асинхронный запрос выполняется в своём цикле событий,
+# и репозиторий (с пулом соединений) создавался бы заново на каждый запрос
+if settings.ONTOLOGY_ASYNC:
+    raise ImproperlyConfigured("ONTOLOGY_ASYNC=1 requires an ASGI server: uvicorn core.asgi:application")
+
+# При gunicorn --preload модель загружается здесь, в master-процессе,
+# и воркеры после fork разделяют её веса copy-on-write.
+if settings.EMBEDDING_PRELOAD:
+    from db.embeddings import preload_model
+    preload_model()
@@ -0,0 +1,461 @@
+import fcntl
+import json
+import os
+import re
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+
+from .embeddings import MODEL_NAME
+from .quantization import dequantize
+from .models import ChunkEmbedding
+
+# запись журнала вставок: chunk_id, text_id, номер списка, затем dim float32
+INSERT_HEADER = struct.Struct("<qqi")
+TOMBSTONE = struct.Struct("<q")
+
+# файлы сегмента; у каждой сборки свои, с номером поколения в имени
+SEGMENT_FILES = ("vectors", "ids", "text_ids", "centroids", "offsets")
+SEGMENT_FILE_RE = re.compile(r"^(%s)-(\d+)\.npy$" % "|".join(SEGMENT_FILES))
+
+
+def normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def train_centroids(sample, nlist, iterations=20, seed=0):
+    """
+    Сферический k-means (косинусная мера) на выборке векторов.
+    Пустые кластеры переинициализируются случайными точками выборки.
+    """
+    rng = np.random.default_rng(seed)
+    sample = normalize_rows(sample)
+    nlist = max(1, min(nlist, sample.shape[0]))
+    centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = np.bincount(assign, minlength=nlist) == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Приближённый поиск ближайших соседей по эмбеддингам фрагментов (IVF).
+
+    Векторы разбиты на nlist списков по ближайшему центроиду. Базовый
+    сегмент хранится на диске отсортированным по спискам (vectors-<gen>.npy,
+    ids-<gen>.npy, text_ids-<gen>.npy, offsets-<gen>.npy) и открывается через
+    mmap, так что при поиске читаются только nprobe ближайших списков.
+    Файлы сборки перечислены в meta.json: новое поколение становится видно
+    одной атомарной заменой meta.json, и процесс никогда не читает файлы
+    разных сборок вперемешку.
+
+    Изменения после сборки пишутся в журналы поколения:
+      inserts-<gen>.log    — новые фрагменты (добавляются при создании текстов),
+      tombstones-<gen>.log — удалённые фрагменты (delete_text / пересчёт текста).
+    Каждый процесс дочитывает хвосты журналов перед поиском, поэтому
+    изменения, сделанные одним воркером, видны остальным.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.RLock()
+        self.meta = None
+        self._reset_delta()
+
+    # ---------- файлы ----------
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _log_path(self, kind, generation=None):
+        generation = generation or self.meta["generation"]
+        return self._path(f"{kind}-{generation}.log")
+
+    @contextmanager
+    def _file_lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path("index.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_meta(self):
+        try:
+            with open(self._path("meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def exists(self):
+        return self._read_meta() is not None
+
+    def _reset_delta(self):
+        self._delta_ids = []
+        self._delta_text_ids = []
+        self._delta_lists = []
+        self._delta_vectors = []
+        self._delta_cache = None
+        self._tombstones = set()
+        self._tombstone_array = np.zeros(0, dtype=np.int64)
+        self._insert_offset = 0
+        self._tombstone_offset = 0
+
+    # ---------- загрузка ----------
+    def _segment_path(self, meta, name):
+        # индексы, собранные до появления поколений в именах, хранят файлы без суффикса
+        return self._path(meta.get("files", {}).get(name, f"{name}.npy"))
+
+    def _load(self, meta):
+        self.meta = meta
+        self.centroids = np.load(self._segment_path(meta, "centroids"))
+        self.offsets = np.load(self._segment_path(meta, "offsets"))
+        if meta["count"]:
+            self.vectors = np.load(self._segment_path(meta, "vectors"), mmap_mode="r")
+            self.ids = np.load(self._segment_path(meta, "ids"), mmap_mode="r")
+            self.text_ids = np.load(self._segment_path(meta, "text_ids"), mmap_mode="r")
+        else:
+            self.vectors = np.zeros((0, meta["dim"]), dtype=np.float32)
+            self.ids = self.text_ids = np.zeros(0, dtype=np.int64)
+        self._reset_delta()
+
+    def _sync(self):
+        """Подгружает новую сборку или дочитывает журналы, записанные другими процессами."""
+        meta = self._read_meta()
+        if meta is None:
+            self.meta = None
+            return False
+        if self.meta is None or meta["generation"] != self.meta["generation"]:
+            self._load(meta)
+
+        dim = self.meta["dim"]
+        record_size = INSERT_HEADER.size + 4 * dim
+        try:
+            with open(self._log_path("inserts"), "rb") as f:
+                f.seek(self._insert_offset)
+                data = f.read()
+        except OSError:
+            data = b""
+        usable = len(data) - len(data) % record_size
+        for pos in range(0, usable, record_size):
+            chunk_id, text_id, list_no = INSERT_HEADER.unpack_from(data, pos)
+            vector = np.frombuffer(data, dtype=np.float32, count=dim, offset=pos + INSERT_HEADER.size)
+            self._append_delta(chunk_id, text_id, list_no, vector)
+        self._insert_offset += usable
+
+        try:
+            with open(self._log_path("tombstones"), "rb") as f:
+                f.seek(self._tombstone_offset)
+                data = f.read()
+        except OSError:
+            data = b""
+        usable = len(data) - len(data) % TOMBSTONE.size
+        if usable:
+            removed = np.frombuffer(data[:usable], dtype=np.int64)
+            self._tombstones.update(int(i) for i in removed)
+            self._tombstone_array = np.fromiter(self._tombstones, dtype=np.int64, count=len(self._tombstones))
+        self._tombstone_offset += usable
+        return True
+
+    def _append_delta(self, chunk_id, text_id, list_no, vector):
+        self._delta_ids.append(chunk_id)
+        self._delta_text_ids.append(text_id)
+        self._delta_lists.append(list_no)
+        self._delta_vectors.append(vector)
+        self._delta_cache = None
+
+    def _delta(self):
+        if self._delta_cache is None:
+            dim = self.meta["dim"]
+            self._delta_cache = (
+                np.asarray(self._delta_ids, dtype=np.int64),
+                np.asarray(self._delta_text_ids, dtype=np.int64),
+                np.asarray(self._delta_lists, dtype=np.int32),
+                np.vstack(self._delta_vectors) if self._delta_vectors else np.zeros((0, dim), dtype=np.float32),
+            )
+        return self._delta_cache
+
+    # ---------- изменения ----------
+    def add(self, items):
+        """
+        Добавляет фрагменты [(chunk_id, text_id, vector), ...] в индекс.
+        Ничего не делает, если индекс ещё не построен.
+        """
+        items = list(items)
+        if not items:
+            return 0
+        with self._lock, self._file_lock():
+            if not self._sync():
+                return 0
+            vectors = normalize_rows(np.vstack([v for _, _, v in items]))
+            lists = np.argmax(vectors @ self.centroids.T, axis=1)
+            records = b"".join(
+                INSERT_HEADER.pack(int(chunk_id), int(text_id), int(list_no)) + vector.tobytes()
+                for (chunk_id, text_id, _), list_no, vector in zip(items, lists, vectors)
+            )
+            with open(self._log_path("inserts"), "ab") as f:
+                f.write(records)
+            self._sync()
+        return len(items)
+
+    def remove(self, chunk_ids):
+        """Помечает фрагменты удалёнными (tombstone)."""
+        chunk_ids = [int(i) for i in chunk_ids]
+        if not chunk_ids:
+            return 0
+        with self._lock, self._file_lock():
+            if not self._sync():
+                return 0
+            with open(self._log_path("tombstones"), "ab") as f:
+                f.write(np.asarray(chunk_ids, dtype=np.int64).tobytes())
+            self._sync()
+        return len(chunk_ids)
+
+    # ---------- поиск ----------
+    def search(self, query_vector, k=10, nprobe=None):
+        """
+        Возвращает [(chunk_id, text_id, similarity), ...] для k ближайших фрагментов.
+        Просматриваются только nprobe списков с ближайшими центроидами.
+        """
+        with self._lock:
+            if not self._sync():
+                return []
+            nprobe = min(nprobe or settings.ANN_NPROBE, self.centroids.shape[0])
+            query = np.asarray(query_vector, dtype=np.float32)
+            norm = np.linalg.norm(query)
+            if norm:
+                query = query / norm
+
+            centroid_scores = self.centroids @ query
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+            id_parts, text_parts, score_parts = [], [], []
+            for list_no in probe:
+                start, end = int(self.offsets[list_no]), int(self.offsets[list_no + 1])
+                if start == end:
+                    continue
+                id_parts.append(self.ids[start:end])
+                text_parts.append(self.text_ids[start:end])
+                score_parts.append(self.vectors[start:end] @ query)
+
+            delta_ids, delta_text_ids, delta_lists, delta_vectors = self._delta()
+            if delta_ids.shape[0]:
+                mask = np.isin(delta_lists, probe)
+                if mask.any():
+                    id_parts.append(delta_ids[mask])
+                    text_parts.append(delta_text_ids[mask])
+                    score_parts.append(delta_vectors[mask] @ query)
+
+            if not id_parts:
+                return []
+            ids = np.concatenate(id_parts)
+            text_ids = np.concatenate(text_parts)
+            scores = np.concatenate(score_parts)
+            if self._tombstone_array.shape[0]:
+                scores = np.where(np.isin(ids, self._tombstone_array), -np.inf, scores)
+
+            k = min(int(k), scores.shape[0])
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                (int(ids[i]), int(text_ids[i]), float(scores[i]))
+                for i in top
+                if np.isfinite(scores[i])
+            ]
+
+    def search_texts(self, query_vector, k=10, nprobe=None, oversample=4, exclude_text_id=None):
+        """
+        Ближайшие тексты: лучший фрагмент каждого текста, k текстов.
+        """
+        best = {}
+        for _, text_id, score in self.search(query_vector, k * oversample, nprobe):
+            if text_id == exclude_text_id:
+                continue
+            if score > best.get(text_id, -np.inf):
+                best[text_id] = score
+        return sorted(best.items(), key=lambda item: -item[1])[:k]
+
+    # ---------- сборка ----------
+    def build(self, model_name=MODEL_NAME, nlist=None, sample_size=100000, iterations=20, batch_size=10000):
+        """
+        Строит индекс по всем сохранённым ChunkEmbedding модели model_name:
+        обучает центроиды на случайной выборке, раскладывает векторы по
+        спискам и атомарно подменяет файлы. Вставки и удаления, записанные
+        в журналы во время сборки, переносятся в журналы нового поколения.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        queryset = ChunkEmbedding.objects.filter(model_name=model_name).order_by("id")
+        count = queryset.count()
+        dim = queryset.values_list("dim", flat=True).first() or 0
+        generation = str(int(time.time() * 1000))
+        started = time.perf_counter()
+
+        if count:
+            nlist = nlist or max(1, int(4 * np.sqrt(count)))
+            # 1) векторы в порядке id — во временный memmap
+            raw_path = self._path(f"raw-{generation}.npy")
+            raw = np.lib.format.open_memmap(raw_path, mode="w+", dtype=np.float32, shape=(count, dim))
+            ids = np.zeros(count, dtype=np.int64)
+            text_ids = np.zeros(count, dtype=np.int64)
+            n = 0
+            rows = queryset.values_list("id", "text_id", "dim", "vector", "encoding", "scale")
+            for chunk_id, text_id, row_dim, data, encoding, scale in rows.iterator(chunk_size=batch_size):
+                if n >= count or row_dim != dim:
+                    continue
+                raw[n] = dequantize(data, row_dim, encoding, scale)
+                ids[n], text_ids[n] = chunk_id, text_id
+                n += 1
+
+            # 2) центроиды по выборке
+            rng = np.random.default_rng(0)
+            sample_rows = np.sort(rng.choice(n, min(sample_size, n), replace=False))
+            centroids = train_centroids(raw[sample_rows], nlist, iterations)
+
+            # 3) назначение списков батчами и раскладка по спискам
+            assign = np.zeros(n, dtype=np.int32)
+            for start in range(0, n, batch_size):
+                block = normalize_rows(raw[start:start + batch_size])
+                assign[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+            order = np.argsort(assign, kind="stable")
+            offsets = np.zeros(centroids.shape[0] + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum(np.bincount(assign, minlength=centroids.shape[0]))
+
+            vectors = np.lib.format.open_memmap(
+                self._path(f"vectors-{generation}.npy"), mode="w+", dtype=np.float32, shape=(n, dim)
+            )
+            for start in range(0, n, batch_size):
+                rows_order = order[start:start + batch_size]
+                vectors[start:start + rows_order.shape[0]] = normalize_rows(raw[np.sort(rows_order)])[
+                    np.argsort(np.argsort(rows_order))
+                ]
+            vectors.flush()
+            del vectors, raw
+            os.remove(raw_path)
+            np.save(self._path(f"ids-{generation}.npy"), ids[:n][order])
+            np.save(self._path(f"text_ids-{generation}.npy"), text_ids[:n][order])
+        else:
+            n = 0
+            nlist = 1
+            centroids = np.zeros((1, dim), dtype=np.float32)
+            offsets = np.zeros(2, dtype=np.int64)
+            ids = np.zeros(0, dtype=np.int64)
+
+        np.save(self._path(f"centroids-{generation}.npy"), centroids)
+        np.save(self._path(f"offsets-{generation}.npy"), offsets)
+        meta = {
+            "generation": generation,
+            "model_name": model_name,
+            "dim": dim,
+            "nlist": int(centroids.shape[0]),
+            "count": n,
+            "files": {
+                name: f"{name}-{generation}.npy"
+                for name in SEGMENT_FILES
+                if os.path.exists(self._path(f"{name}-{generation}.npy"))
+            },
+            "build_seconds": round(time.perf_counter() - started, 3),
+        }
+
+        with self._lock, self._file_lock():
+            old_meta = self._read_meta()
+            self._carry_over_logs(meta, set(int(i) for i in ids[:n]), centroids)
+            # переключение поколения — одна атомарная замена meta.json
+            with open(self._path("meta.tmp.json"), "w") as f:
+                json.dump(meta, f)
+            os.replace(self._path("meta.tmp.json"), self._path("meta.json"))
+            self._remove_stale_segments(meta, old_meta)
+            self.meta = None
+            self._sync()
+        return meta
+
+    def _remove_stale_segments(self, meta, old_meta):
+        """
+        Удаляет файлы сборок старше предыдущей. Предыдущая остаётся: процесс,
+        прочитавший старый meta.json до замены, ещё может открывать её файлы.
+        """
+        keep = {meta["generation"]}
+        if old_meta is not None:
+            keep.add(old_meta["generation"])
+        for name in os.listdir(self.directory):
+            match = SEGMENT_FILE_RE.match(name)
+            if match and match.group(2) not in keep:
+                os.remove(self._path(name))
+        if old_meta is not None and "files" in old_meta:
+            # файлы без суффикса — от сборки, предшествовавшей предыдущей
+            for name in SEGMENT_FILES:
+                if os.path.exists(self._path(f"{name}.npy")):
+                    os.remove(self._path(f"{name}.npy"))
+
+    def _carry_over_logs(self, new_meta, built_ids, centroids):
+        """Переносит записи журналов старого поколения, не вошедшие в новую сборку."""
+        old_meta = self._read_meta()
+        if old_meta is None:
+            return
+        dim = old_meta["dim"]
+        record_size = INSERT_HEADER.size + 4 * dim
+        live_ids = set(built_ids)
+        inserts_path = self._log_path("inserts", old_meta["generation"])
+        tombstones_path = self._log_path("tombstones", old_meta["generation"])
+
+        if os.path.exists(inserts_path) and dim == new_meta["dim"]:
+            with open(inserts_path, "rb") as f:
+                data = f.read()
+            carried = []
+            for pos in range(0, len(data) - len(data) % record_size, record_size):
+                chunk_id, text_id, _ = INSERT_HEADER.unpack_from(data, pos)
+                if chunk_id in built_ids:
+                    continue
+                vector = np.frombuffer(data, dtype=np.float32, count=dim, offset=pos + INSERT_HEADER.size)
+                list_no = int(np.argmax(centroids @ vector))
+                carried.append(INSERT_HEADER.pack(chunk_id, text_id, list_no) + vector.tobytes())
+                live_ids.add(chunk_id)
+            with open(self._log_path("inserts", new_meta["generation"]), "ab") as f:
+                f.write(b"".join(carried))
+        if os.path.exists(tombstones_path):
+            with open(tombstones_path, "rb") as f:
+                data = f.read()
+            removed = np.frombuffer(data[:len(data) - len(data) % TOMBSTONE.size], dtype=np.int64)
+            # надгробия нужны только для фрагментов, попавших в новую сборку или журнал
+            removed = [int(i) for i in removed if int(i) in live_ids]
+            with open(self._log_path("tombstones", new_meta["generation"]), "ab") as f:
+                f.write(np.asarray(removed, dtype=np.int64).tobytes())
+        for path in (inserts_path, tombstones_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def stats(self):
+        with self._lock:
+            if not self._sync():
+                return {"built": False}
+            return {
+                "built": True,
+                **self.meta,
+                "pending_inserts": len(self._delta_ids),
+                "tombstones": len(self._tombstones),
+            }
+
+
+_index = None
+
+
+def get_ann_index():
+    """IVF-индекс фрагментов текущего процесса (файлы общие для всех воркеров)."""
+    global _index
+    if _index is None:
+        _index = IVFIndex(settings.ANN_INDEX_DIR)
+    return _index
@@ -0,0 +1,147 @@
+import copy
+import functools
+from typing import Any, Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+
+from .async_repository import AsyncNeo4jRepository
+from .ontology import (
+    CLASS_CHILDREN_COUNT_QUERY,
+    CLASS_CHILDREN_PAGE_QUERY,
+    CLASS_CHILDREN_QUERY,
+    CLASS_OBJECTS_COUNT_QUERY,
+    CLASS_OBJECTS_LEGACY_QUERY,
+    CLASS_OBJECTS_PAGE_QUERY,
+    CLASS_OBJECTS_QUERY,
+    OBJECTS_COUNT_QUERY,
+    CLASS_PARENTS_QUERY,
+    CLASS_QUERY,
+    OBJECT_QUERY,
+    ROOT_CLASSES_QUERY,
+    OntologyService,
+    objects_page_query,
+)
+from .repository import PROJECTION_SCALAR
+
+
+def async_transactional(timeout: Optional[float] = None):
+    """
+    Асинхронный аналог ontology.transactional для чтения: метод целиком
+    выполняется в одной управляемой read-транзакции.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            if getattr(self.repo, "in_transaction", False):
+                return await method(self, *args, **kwargs)
+            return await self.repo.read(lambda uow: method(self._bind(uow), *args, **kwargs), timeout=timeout)
+        return wrapper
+    return decorator
+
+
+def _in_thread(name):
+    """Запись через синхронный OntologyService в пуле потоков."""
+    async def method(self, *args, **kwargs):
+        return await sync_to_async(getattr(self.sync_service, name), thread_sensitive=False)(*args, **kwargs)
+    method.__name__ = name
+    method.__doc__ = f"Асинхронная обёртка OntologyService.{name}."
+    return method
+
+
+class AsyncOntologyService:
+    """
+    Асинхронный OntologyService для ASGI-представлений.
+    Чтение идёт через асинхронный драйвер теми же запросами, что и в
+    синхронном сервисе. Запись (редкая и многошаговая) выполняется
+    синхронным сервисом в отдельном потоке, чтобы не дублировать логику
+    валидации и каскадного удаления.
+    """
+
+    def __init__(self, repo: AsyncNeo4jRepository, sync_service: OntologyService):
+        self.repo = repo
+        self.sync_service = sync_service
+
+    def _bind(self, uow) -> "AsyncOntologyService":
+        bound = copy.copy(self)
+        bound.repo = uow
+        return bound
+
+    # ---------- Ontology-wide ----------
+    async def get_ontology(self) -> List[Dict[str, Any]]:
+        return await self.repo.get_all_nodes_and_arcs()
+
+    async def get_ontology_page(self, after: Optional[str] = None, limit: int = 500):
+        return await self.repo.get_nodes_and_arcs_page(after=after, limit=limit)
+
+    def iter_ontology(self):
+        return self.repo.iter_nodes_and_arcs()
+
+    @async_transactional()
+    async def get_ontology_parent_classes(self):
+        return await self.repo.run_custom_query(ROOT_CLASSES_QUERY)
+
+    # ---------- Class queries ----------
+    @async_transactional()
+    async def get_class(self, class_uri: str):
+        rows = await self.repo.run_custom_query(CLASS_QUERY, {"uri": class_uri}, projection=PROJECTION_SCALAR)
+        return rows[0] if rows else None
+
+    @async_transactional()
+    async def get_class_parents(self, class_uri: str):
+        return await self.repo.run_custom_query(CLASS_PARENTS_QUERY, {"uri": class_uri},
+                                                projection=PROJECTION_SCALAR)
+
+    @async_transactional()
+    async def get_class_children(self, class_uri: str):
+        return await self.repo.run_custom_query(CLASS_CHILDREN_QUERY, {"uri": class_uri},
+                                                projection=PROJECTION_SCALAR)
+
+    @async_transactional()
+    async def get_class_objects(self, class_uri: str):
+        objects = await self.repo.run_custom_query(CLASS_OBJECTS_QUERY, {"uri": class_uri},
+                                                   projection=PROJECTION_SCALAR)
+        if not objects:
+            objects = await self.repo.run_custom_query(CLASS_OBJECTS_LEGACY_QUERY, {"uri": class_uri},
+                                                       projection=PROJECTION_SCALAR)
+        return objects
+
+    @async_transactional()
+    async def get_class_children_page(self, class_uri: str, after: Optional[str] = None, limit: int = 500,
+                                      include_subclasses: bool = True):
+        params = {"uri": class_uri, "include_subclasses": include_subclasses}
+        return await self._page(CLASS_CHILDREN_PAGE_QUERY, params, after, limit,
+                                await self._count(CLASS_CHILDREN_COUNT_QUERY, params))
+
+    @async_transactional()
+    async def get_class_objects_page(self, class_uri: str, after: Optional[str] = None, limit: int = 500,
+                                     include_subclasses: bool = False):
+        params = {"uri": class_uri, "include_subclasses": include_subclasses}
+        count = await self._count(CLASS_OBJECTS_COUNT_QUERY, params)
+        query = objects_page_query(count, await self._count(OBJECTS_COUNT_QUERY, {}), limit) if count else \
+            CLASS_OBJECTS_PAGE_QUERY
+        return await self._page(query, params, after, limit, count)
+
+    async def _page(self, query: str, params: Dict[str, Any], after: Optional[str], limit: int, count: int):
+        """То же, что OntologyService._page."""
+        items = await self.repo.run_custom_query(query, {**params, "after": after, "limit": limit},
+                                                 projection=PROJECTION_SCALAR)
+        next_cursor = items[-1]["properties"].get("uri") if len(items) == limit else None
+        return {"items": items, "next": next_cursor, "count": count}
+
+    async def _count(self, query: str, params: Dict[str, Any]) -> int:
+        rows = await self.repo.run_custom_query(query, params, projection=PROJECTION_SCALAR)
+        return int(rows[0] or 0) if rows else 0
+
+    # ---------- Objects ----------
+    @async_transactional()
+    async def get_object(self, object_uri: str):
+        rows = await self.repo.run_custom_query(OBJECT_QUERY, {"uri": object_uri}, projection=PROJECTION_SCALAR)
+        return rows[0] if rows else None
+
+    # ---------- Запись ----------
+    create_class = _in_thread("create_class")
+    update_class = _in_thread("update_class")
+    delete_class = _in_thread("delete_class")
+    create_object = _in_thread("create_object")
+    update_object = _in_thread("update_object")
+    delete_object = _in_thread("delete_object")
@@ -0,0 +1,160 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from neo4j import AsyncGraphDatabase, basic_auth, unit_of_work
+from neo4j.exceptions import ConstraintError
+
+from .repository import (
+    NEO4J_MAX_RETRY_TIME,
+    NEO4J_PASSWORD,
+    NEO4J_TX_TIMEOUT,
+    NEO4J_URI,
+    NEO4J_USER,
+    NODES_PAGE_SIZE,
+    NODES_WITH_ARCS_PAGE_QUERY,
+    NODES_WITH_ARCS_QUERY,
+    PROJECTION_RECORDS,
+    PROJECTION_SCALAR,
+    DuplicateUriError,
+    Neo4jRepository,
+)
+from .schema import ONTOLOGY_LABEL
+
+
+class AsyncNeo4jRepository:
+    """
+    Асинхронный аналог Neo4jRepository на AsyncGraphDatabase: ожидание Neo4j
+    не занимает поток, и один процесс обслуживает сотни одновременных чтений.
+    Запросы и сериализация результатов — те же, что у синхронного репозитория.
+    Драйвер привязан к циклу событий, в котором открыты его соединения
+    (см. get_async_repository).
+    """
+    in_transaction = False
+
+    def __init__(self,
+                 uri=NEO4J_URI,
+                 user=NEO4J_USER,
+                 password=NEO4J_PASSWORD,
+                 tx_timeout=NEO4J_TX_TIMEOUT):
+        self.driver = AsyncGraphDatabase.driver(
+            uri,
+            auth=basic_auth(user, password),
+            max_transaction_retry_time=NEO4J_MAX_RETRY_TIME
+        )
+        self.tx_timeout = tx_timeout
+
+    async def close(self):
+        await self.driver.close()
+
+    # ---------- unit of work ----------
+    async def read(self, work, timeout: Optional[float] = None):
+        """await work(uow) в одной управляемой read-транзакции (см. Neo4jRepository.read)."""
+        return await self._execute(work, write=False, timeout=timeout)
+
+    async def write(self, work, timeout: Optional[float] = None):
+        return await self._execute(work, write=True, timeout=timeout)
+
+    async def _execute(self, work, write: bool, timeout: Optional[float]):
+        @unit_of_work(timeout=timeout or self.tx_timeout)
+        async def tx_function(tx):
+            return await work(AsyncTransactionRepository(self, tx))
+
+        try:
+            async with self.driver.session() as s:
+                if write:
+                    return await s.execute_write(tx_function)
+                return await s.execute_read(tx_function)
+        except ConstraintError as exc:
+            raise DuplicateUriError(exc.message) from exc
+
+    # ---------- запросы ----------
+    async def run_custom_query(self,
+                               query: str,
+                               parameters: Dict[str, Any] = None,
+                               projection: str = PROJECTION_RECORDS) -> List[Any]:
+        return [row async for row in self.iter_custom_query(query, parameters, projection)]
+
+    async def iter_custom_query(self,
+                                query: str,
+                                parameters: Dict[str, Any] = None,
+                                projection: str = PROJECTION_RECORDS):
+        convert = Neo4jRepository._projector(projection)
+        async for record in self._stream(query, parameters):
+            yield convert(record)
+
+    async def _stream(self, query: str, parameters: Dict[str, Any] = None):
+        try:
+            async with self.driver.session() as s:
+                result = await s.run(query, parameters or {})
+                async for record in result:
+                    yield record
+        except ConstraintError as exc:
+            raise DuplicateUriError(exc.message) from exc
+
+    # ---------- узлы ----------
+    async def get_node_by_uri(self, uri: str) -> Optional[Dict[str, Any]]:
+        query = f"MATCH (n:{ONTOLOGY_LABEL} {{uri: $uri}}) RETURN n LIMIT 1"
+        rows = await self.run_custom_query(query, {"uri": uri}, projection=PROJECTION_SCALAR)
+        return rows[0] if rows else None
+
+    async def get_all_nodes_and_arcs(self) -> List[Dict[str, Any]]:
+        return [node async for node in self.iter_nodes_and_arcs()]
+
+    async def iter_nodes_and_arcs(self, after: Optional[str] = None, limit: Optional[int] = None):
+        if limit is None and after is None:
+            query = NODES_WITH_ARCS_QUERY
+            parameters = {}
+        else:
+            query = NODES_WITH_ARCS_PAGE_QUERY
+            parameters = {"after": after, "limit": limit if limit is not None else NODES_PAGE_SIZE}
+
+        async for record in self._stream(query, parameters):
+            yield Neo4jRepository._serialize_node_with_arcs(record["n"], record["arcs"])
+
+    async def get_nodes_and_arcs_page(self, after: Optional[str] = None, limit: int = 500) -> Dict[str, Any]:
+        items = [node async for node in self.iter_nodes_and_arcs(after=after, limit=limit)]
+        next_cursor = items[-1]["id"] if len(items) == limit else None
+        return {"items": items, "next": next_cursor}
+
+
+class AsyncTransactionRepository(AsyncNeo4jRepository):
+    """Асинхронный репозиторий, привязанный к управляемой транзакции."""
+    in_transaction = True
+
+    def __init__(self, parent: AsyncNeo4jRepository, tx):
+        self.driver = parent.driver
+        self.tx_timeout = parent.tx_timeout
+        self.tx = tx
+
+    async def close(self):
+        pass
+
+    async def read(self, work, timeout: Optional[float] = None):
+        return await work(self)
+
+    async def write(self, work, timeout: Optional[float] = None):
+        return await work(self)
+
+    async def _stream(self, query: str, parameters: Dict[str, Any] = None):
+        result = await self.tx.run(query, parameters or {})
+        async for record in result:
+            yield record
+
+
+_repository = None
+_repository_loop = None
+
+
+def get_async_repository() -> AsyncNeo4jRepository:
+    """
+    Репозиторий текущего цикла событий. Под ASGI-сервером (uvicorn) цикл
+    один на процесс, и пул соединений драйвера общий для всех запросов.
+    Под WSGI цикл свой у каждого запроса и на каждый создавался бы новый
+    пул, поэтому core.wsgi с ONTOLOGY_ASYNC=1 не запускается.
+    """
+    global _repository, _repository_loop
+    loop = asyncio.get_running_loop()
+    if _repository is None or _repository_loop is not loop:
+        _repository = AsyncNeo4jRepository()
+        _repository_loop = loop
+    return _repository
@@ -0,0 +1,124 @@
+from collections import deque
+from typing import Any, Dict
+
+from .ontology import SUBCLASS_REL
+from .repository import PROJECTION_PROPERTIES, PROJECTION_SCALAR
+from .schema import DESCENDANT_REL
+
+SUBCLASS_EDGES_QUERY = f"""
+MATCH (c:Class)-[:{SUBCLASS_REL}]->(p:Class)
+RETURN c.uri AS child, p.uri AS parent
+"""
+
+CLOSURE_EDGES_QUERY = f"""
+MATCH (c:Class)-[d:{DESCENDANT_REL}]->(a:Class)
+RETURN c.uri AS child, a.uri AS ancestor, d.depth AS depth
+"""
+
+# Иерархия есть, а замыкания нет: граф создан до появления DESCENDANT_OF
+# или загружен без него — потомки классов не находятся
+CLOSURE_MISSING_QUERY = f"""
+RETURN EXISTS {{ MATCH (:Class)-[:{SUBCLASS_REL}]->(:Class) }}
+       AND NOT EXISTS {{ MATCH (:Class)-[:{DESCENDANT_REL}]->(:Class) }} AS missing
+"""
+
+CLEAR_CLOSURE_QUERY = f"""
+MATCH ()-[d:{DESCENDANT_REL}]->()
+CALL {{
+    WITH d
+    DELETE d
+}} IN TRANSACTIONS OF $batch_size ROWS
+"""
+
+# Уровень 1 замыкания — сами рёбра SUBCLASS_OF
+CLOSURE_BASE_QUERY = f"""
+MATCH (c:Class)-[:{SUBCLASS_REL}]->(p:Class)
+WHERE c <> p
+WITH DISTINCT c, p
+CREATE (c)-[:{DESCENDANT_REL} {{depth: 1}}]->(p)
+RETURN count(*) AS cnt
+"""
+
+# Уровень depth+1: продолжение путей длины depth одним ребром SUBCLASS_OF
+# (поиск в ширину, поэтому глубина каждой пары минимальна)
+CLOSURE_STEP_QUERY = f"""
+MATCH (x:Class)-[:{DESCENDANT_REL} {{depth: $depth}}]->(:Class)-[:{SUBCLASS_REL}]->(z:Class)
+WHERE x <> z AND NOT (x)-[:{DESCENDANT_REL}]->(z)
+WITH DISTINCT x, z
+CREATE (x)-[:{DESCENDANT_REL} {{depth: $depth + 1}}]->(z)
+RETURN count(*) AS cnt
+"""
+
+
+def expected_closure(edges) -> Dict[tuple, int]:
+    """{(потомок, предок): длина кратчайшего пути} по списку рёбер (потомок, родитель)."""
+    parents = {}
+    for child, parent in edges:
+        parents.setdefault(child, set()).add(parent)
+
+    closure = {}
+    for start in parents:
+        queue = deque([(start, 0)])
+        seen = {start}
+        while queue:
+            node, depth = queue.popleft()
+            for parent in parents.get(node, ()):
+                if parent in seen:
+                    continue
+                seen.add(parent)
+                closure[(start, parent)] = depth + 1
+                queue.append((parent, depth + 1))
+    return closure
+
+
+def check_closure(repo, sample: int = 20) -> Dict[str, Any]:
+    """
+    Сравнивает рёбра DESCENDANT_OF с замыканием, вычисленным по SUBCLASS_OF.
+    Возвращает число недостающих, лишних пар и пар с неверной глубиной и примеры.
+    """
+    edges = [(row["child"], row["parent"])
+             for row in repo.iter_custom_query(SUBCLASS_EDGES_QUERY, projection=PROJECTION_PROPERTIES)]
+    expected = expected_closure(edges)
+    actual = {(row["child"], row["ancestor"]): row["depth"]
+              for row in repo.iter_custom_query(CLOSURE_EDGES_QUERY, projection=PROJECTION_PROPERTIES)}
+
+    missing = [pair for pair in expected if pair not in actual]
+    extra = [pair for pair in actual if pair not in expected]
+    wrong_depth = [pair for pair, depth in expected.items() if pair in actual and actual[pair] != depth]
+    return {
+        "subclass_edges": len(edges),
+        "expected_pairs": len(expected),
+        "actual_pairs": len(actual),
+        "missing": len(missing),
+        "extra": len(extra),
+        "wrong_depth": len(wrong_depth),
+        "consistent": not (missing or extra or wrong_depth),
+        "samples": {
+            "missing": [list(pair) for pair in missing[:sample]],
+            "extra": [list(pair) for pair in extra[:sample]],
+            "wrong_depth": [[*pair, actual[pair], expected[pair]] for pair in wrong_depth[:sample]],
+        },
+    }
+
+
+def closure_missing(repo) -> bool:
+    """True, если рёбра SUBCLASS_OF есть, а ни одного ребра DESCENDANT_OF нет."""
+    rows = repo.run_custom_query(CLOSURE_MISSING_QUERY, projection=PROJECTION_SCALAR)
+    return bool(rows and rows[0])
+
+
+def rebuild_closure(repo, batch_size: int = 10000) -> Dict[str, int]:
+    """
+    Перестраивает замыкание с нуля поиском в ширину по уровням.
+    Выполняется auto-commit запросами: очистка идёт пакетами через
+    CALL ... IN TRANSACTIONS, каждый уровень — отдельной транзакцией.
+    """
+    repo.run_custom_query(CLEAR_CLOSURE_QUERY, {"batch_size": batch_size})
+    levels = {}
+    created = repo.run_custom_query(CLOSURE_BASE_QUERY, projection=PROJECTION_SCALAR)[0]
+    depth = 1
+    while created:
+        levels[depth] = created
+        created = repo.run_custom_query(CLOSURE_STEP_QUERY, {"depth": depth}, projection=PROJECTION_SCALAR)[0]
+        depth += 1
+    return {"pairs": sum(levels.values()), "max_depth": max(levels) if levels else 0, "levels": levels}
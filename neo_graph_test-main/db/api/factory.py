@@ -0,0 +1,21 @@
+from django.conf import settings
+
+BACKEND_NEO4J = "neo4j"
+BACKEND_MEMORY = "memory"
+BACKENDS = (BACKEND_NEO4J, BACKEND_MEMORY)
+
+
+def create_repository(backend: str = None):
+    """
+    Репозиторий онтологии по настройке ONTOLOGY_BACKEND:
+    neo4j — Neo4jRepository; memory — MemoryRepository (networkx в памяти
+    процесса), заполняемый из снимка ONTOLOGY_SNAPSHOT, если он задан.
+    """
+    backend = backend or settings.ONTOLOGY_BACKEND
+    if backend == BACKEND_NEO4J:
+        from .repository import Neo4jRepository
+        return Neo4jRepository()
+    if backend == BACKEND_MEMORY:
+        from .memory_repository import MemoryRepository
+        return MemoryRepository(snapshot_path=settings.ONTOLOGY_SNAPSHOT)
+    raise ValueError(f"Unknown ontology backend '{backend}', expected one of {BACKENDS}")
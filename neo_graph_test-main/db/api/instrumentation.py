@@ -0,0 +1,225 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("db.api.slow_queries")
+
+# Сбор статистики по запросам run_custom_query / iter_custom_query
+NEO4J_QUERY_STATS = os.getenv("NEO4J_QUERY_STATS", "1") == "1"
+# Порог медленного запроса (мс, от запуска до исчерпания результата)
+NEO4J_SLOW_QUERY_MS = float(os.getenv("NEO4J_SLOW_QUERY_MS", "500"))
+# Файл журнала медленных запросов (JSON на строку); без него — только логгер db.api.slow_queries
+NEO4J_SLOW_QUERY_LOG = os.getenv("NEO4J_SLOW_QUERY_LOG")
+# Ограничение числа форм запросов в статистике (шаблоны с uri в типе ребра дают много форм)
+NEO4J_QUERY_STATS_MAX_SHAPES = int(os.getenv("NEO4J_QUERY_STATS_MAX_SHAPES", "1000"))
+
+_IDENTIFIER_RE = re.compile(r"`(?:[^`]|``)*`")
+
+
+def query_shape(query: str) -> str:
+    """
+    Форма запроса: текст без лишних пробелов, идентификаторы в обратных
+    кавычках (тип ребра = uri свойства) заменены на `?`. Параметры в форму
+    не входят — они и так передаются отдельно.
+    """
+    return _IDENTIFIER_RE.sub("`?`", " ".join(query.split()))
+
+
+def _ms(value) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+def format_plan(plan: Dict[str, Any], depth: int = 0) -> List[str]:
+    """Дерево плана из ResultSummary.profile / .plan построчно с отступами."""
+    if not plan:
+        return []
+    args = plan.get("args") or {}
+    line = "  " * depth + str(plan.get("operatorType", "?"))
+    details = args.get("Details") or args.get("details")
+    if details:
+        line += f" [{details}]"
+    for key, label in (("rows", "rows"), ("dbHits", "dbHits"), ("EstimatedRows", "est")):
+        value = plan.get(key, args.get(key))
+        if value is not None:
+            line += f" {label}={round(value, 1) if isinstance(value, float) else value}"
+    lines = [line]
+    for child in plan.get("children") or ():
+        lines.extend(format_plan(child, depth + 1))
+    return lines
+
+
+def total_db_hits(plan: Optional[Dict[str, Any]]) -> int:
+    if not plan:
+        return 0
+    return int(plan.get("dbHits") or 0) + sum(total_db_hits(child) for child in plan.get("children") or ())
+
+
+class QueryStats:
+    """
+    Агрегированная статистика по формам запросов в пределах процесса:
+    число вызовов и ошибок, время на клиенте без ожидания потребителя
+    (суммарное и максимальное),
+    result_available_after / result_consumed_after из ResultSummary, строки
+    и dbHits последнего PROFILE. Медленный запрос один раз на форму
+    перезапускается с PROFILE (только чтение; запись — EXPLAIN, без выполнения),
+    план пишется в журнал медленных запросов.
+    """
+
+    def __init__(self, slow_ms: float = NEO4J_SLOW_QUERY_MS, max_shapes: int = NEO4J_QUERY_STATS_MAX_SHAPES):
+        self.slow_ms = slow_ms
+        self.max_shapes = max_shapes
+        self._lock = threading.Lock()
+        self._shapes: Dict[str, Dict[str, Any]] = {}
+        self._profiler = None
+        self.dropped = 0
+
+    def record(self, query: str, elapsed_ms: float, rows: int, summary=None, failed: bool = False,
+               driver=None, parameters: Optional[Dict[str, Any]] = None):
+        shape = query_shape(query)
+        available = _ms(getattr(summary, "result_available_after", None))
+        consumed = _ms(getattr(summary, "result_consumed_after", None))
+        with self._lock:
+            entry = self._shapes.get(shape)
+            if entry is None:
+                if len(self._shapes) >= self.max_shapes:
+                    self.dropped += 1
+                    return
+                entry = self._shapes[shape] = {
+                    "query": shape, "count": 0, "errors": 0, "rows": 0,
+                    "total_ms": 0.0, "max_ms": 0.0,
+                    "server_available_ms": 0.0, "server_consumed_ms": 0.0, "server_samples": 0,
+                    "slow": 0, "query_type": None, "profiled": None, "db_hits": None,
+                }
+            entry["count"] += 1
+            entry["rows"] += rows
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            if failed:
+                entry["errors"] += 1
+            if available is not None and consumed is not None:
+                entry["server_available_ms"] += available
+                entry["server_consumed_ms"] += consumed
+                entry["server_samples"] += 1
+            if summary is not None:
+                entry["query_type"] = getattr(summary, "query_type", None)
+            slow = not failed and elapsed_ms >= self.slow_ms
+            if slow:
+                entry["slow"] += 1
+            profile = slow and entry["profiled"] is None and driver is not None
+            if profile:
+                entry["profiled"] = "pending"
+            query_type = entry["query_type"]
+
+        if profile:
+            self._profile_later(driver, query, shape, parameters or {}, query_type, {
+                "elapsed_ms": round(elapsed_ms, 2), "rows": rows,
+                "server_available_ms": available, "server_consumed_ms": consumed,
+            })
+
+    def _profile_later(self, driver, query, shape, parameters, query_type, timings):
+        # повторный запуск — в фоне, чтобы не удлинять запрос, который оказался медленным
+        with self._lock:
+            if self._profiler is None:
+                self._profiler = ThreadPoolExecutor(max_workers=1, thread_name_prefix="neo4j-profile")
+        self._profiler.submit(self._profile, driver, query, shape, parameters, query_type, timings)
+
+    def _profile(self, driver, query, shape, parameters, query_type, timings):
+        # PROFILE выполняет запрос: повторять можно только чтение
+        mode = "PROFILE" if query_type == "r" else "EXPLAIN"
+        entry = {"time": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "query": shape, "mode": mode, **timings}
+        try:
+            with driver.session() as s:
+                summary = s.run(f"{mode} {query}", parameters).consume()
+            plan = summary.profile if mode == "PROFILE" else summary.plan
+            entry["db_hits"] = total_db_hits(plan) if mode == "PROFILE" else None
+            entry["plan"] = "\n".join(format_plan(plan))
+        except Exception as exc:
+            entry["error"] = f"{type(exc).__name__}: {exc}"
+        with self._lock:
+            stats = self._shapes.get(shape)
+            if stats is not None:
+                stats["profiled"] = mode.lower() if "error" not in entry else "failed"
+                stats["db_hits"] = entry.get("db_hits")
+        write_slow_query(entry)
+
+    def snapshot(self, sort: str = "total_ms", limit: Optional[int] = None) -> Dict[str, Any]:
+        with self._lock:
+            rows = [dict(entry) for entry in self._shapes.values()]
+            dropped = self.dropped
+        for row in rows:
+            row["mean_ms"] = round(row["total_ms"] / row["count"], 3) if row["count"] else 0.0
+            samples = row.pop("server_samples")
+            row["server_available_mean_ms"] = round(row.pop("server_available_ms") / samples, 3) if samples else None
+            row["server_consumed_mean_ms"] = round(row.pop("server_consumed_ms") / samples, 3) if samples else None
+            row["total_ms"] = round(row["total_ms"], 3)
+            row["max_ms"] = round(row["max_ms"], 3)
+        rows.sort(key=lambda row: row.get(sort) or 0, reverse=True)
+        return {
+            "slow_query_ms": self.slow_ms,
+            "shapes": len(rows),
+            "dropped_shapes": dropped,
+            "queries": rows[:limit] if limit else rows,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+            self.dropped = 0
+
+
+_log_lock = threading.Lock()
+
+
+def write_slow_query(entry: Dict[str, Any]):
+    slow_query_logger.warning("Slow query %.1f ms (%s): %s", entry.get("elapsed_ms", 0), entry["mode"], entry["query"])
+    if not NEO4J_SLOW_QUERY_LOG:
+        return
+    with _log_lock:
+        try:
+            with open(NEO4J_SLOW_QUERY_LOG, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError:
+            logger.exception("Cannot write slow query log %s", NEO4J_SLOW_QUERY_LOG)
+
+
+query_stats = QueryStats()
+
+
+def instrumented(run, query: str, parameters: Optional[Dict[str, Any]], driver=None):
+    """
+    Выполняет run(query, parameters) и отдаёт записи, по исчерпании
+    результата записывая статистику. Время включает чтение всего результата,
+    но не время, пока генератор стоит на yield: медленный потребитель
+    (например, NDJSON-клиент) не делает запрос медленным.
+    """
+    parameters = parameters or {}
+    if not NEO4J_QUERY_STATS:
+        yield from run(query, parameters)
+        return
+
+    started = time.perf_counter()
+    suspended = 0.0
+    rows, summary, failed = 0, None, False
+    try:
+        result = run(query, parameters)
+        for record in result:
+            rows += 1
+            paused = time.perf_counter()
+            try:
+                yield record
+            finally:
+                suspended += time.perf_counter() - paused
+        summary = result.consume()
+    except Exception:
+        failed = True
+        raise
+    finally:
+        # если потребитель остановился раньше (GeneratorExit), пишутся время и строки до этого момента
+        query_stats.record(query, (time.perf_counter() - started - suspended) * 1000, rows, summary, failed,
+                           driver=driver, parameters=parameters)
@@ -0,0 +1,220 @@
+from typing import Any, Dict, Optional
+
+from .ontology import (
+    CLASS_ATTRIBUTE_SET_COUNT_QUERY,
+    CLASS_TREE_URIS_QUERY,
+    CLASSES_DELETE_QUERY,
+    CLASSES_OBJECTS_COUNT_QUERY,
+    CLASSES_OBJECTS_DELETE_CHUNK_QUERY,
+    CLASSES_PROPERTIES_DELETE_QUERY,
+    CLASSES_PROPERTY_URIS_QUERY,
+    CLEAR_CLASS_ATTRIBUTE_CHUNK_QUERY,
+    OBJECT_PROPERTY_EDGES_COUNT_QUERY,
+    OBJECT_PROPERTY_EDGES_DELETE_CHUNK_QUERY,
+    OntologyService,
+    object_property_edges_query,
+)
+from .repository import PROJECTION_PROPERTIES, PROJECTION_SCALAR
+
+PHASE_DONE = "done"
+
+
+class BatchedMutation:
+    """
+    Изменение онтологии, которое фоновая задача выполняет пакетами.
+
+    prepare() разрешает uri и оценивает число строк, run_batch() выполняет
+    один пакет текущей фазы — отдельный auto-commit запрос, меняющий не больше
+    batch_size строк. Всё состояние (фаза, разрешённые uri, статистика) лежит
+    в self.state и сериализуется в JSON: задача сохраняет его после каждого
+    пакета, и прерванная задача продолжает с той же фазы. Пакеты идемпотентны —
+    повтор пакета, не попавшего в контрольную точку, ничего не портит.
+    """
+    kind: str = ""
+    phases: tuple = ()
+
+    def __init__(self, service: OntologyService, params: Dict[str, Any], state: Optional[Dict[str, Any]] = None):
+        self.service = service
+        self.repo = service.repo
+        self.params = params
+        self.state = dict(state or {})
+
+    @property
+    def prepared(self) -> bool:
+        return "phase" in self.state
+
+    @property
+    def done(self) -> bool:
+        return self.state.get("phase") == PHASE_DONE
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return self.state["stats"]
+
+    def prepare(self) -> int:
+        """Заполняет состояние и возвращает оценку числа строк."""
+        raise NotImplementedError
+
+    def run_batch(self, batch_size: int) -> int:
+        """Один пакет текущей фазы; возвращает число обработанных строк."""
+        phase = self.state["phase"]
+        rows, finished = getattr(self, f"_{phase}")(batch_size)
+        if finished:
+            following = self.phases[self.phases.index(phase) + 1:]
+            self.state["phase"] = following[0] if following else PHASE_DONE
+            if self.done:
+                self.finish()
+        return rows
+
+    def finish(self):
+        # изменение схемы: сигнатуры классов устарели во всех процессах
+        self.service.schema_changed()
+
+    def _count(self, query: str, parameters: Dict[str, Any]) -> int:
+        rows = self.repo.run_custom_query(query, parameters, projection=PROJECTION_SCALAR)
+        return int(rows[0] or 0) if rows else 0
+
+    def _count_edges(self, op_uri: str) -> int:
+        return self._count(object_property_edges_query(OBJECT_PROPERTY_EDGES_COUNT_QUERY, op_uri), {"op_uri": op_uri})
+
+    def _delete_edges_chunk(self, op_uri: str, batch_size: int):
+        """Пакет рёбер ObjectProperty: (удалено рёбер, закончено ли)."""
+        rows = self.repo.run_custom_query(object_property_edges_query(OBJECT_PROPERTY_EDGES_DELETE_CHUNK_QUERY, op_uri),
+                                          {"op_uri": op_uri, "batch_size": batch_size},
+                                          projection=PROJECTION_PROPERTIES)
+        instances = int(rows[0]["instances"] or 0) if rows else 0
+        deleted = int(rows[0]["deleted"] or 0) if rows else 0
+        return deleted, instances < batch_size
+
+
+class DeleteClassJob(BatchedMutation):
+    """Пакетный OntologyService.delete_class; params: {"class_uri"}."""
+    kind = "delete_class"
+    phases = ("relations", "properties", "objects", "classes")
+
+    def prepare(self) -> int:
+        class_uris = [u for u in self.repo.iter_custom_query(CLASS_TREE_URIS_QUERY, {"uri": self.params["class_uri"]},
+                                                             projection=PROJECTION_SCALAR) if u]
+        self.state = {
+            "phase": self.phases[0] if class_uris else PHASE_DONE,
+            "class_uris": class_uris,
+            "op_uris": [],
+            "stats": {"classes_deleted": 0, "objects_deleted": 0, "dp_deleted": 0,
+                      "op_deleted": 0, "relations_deleted": 0},
+        }
+        if not class_uris:
+            return 0
+
+        op_uris = [u for u in self.repo.run_custom_query(CLASSES_PROPERTY_URIS_QUERY,
+                                                         {"uris": class_uris, "label": "ObjectProperty"},
+                                                         projection=PROJECTION_SCALAR) if u]
+        dp_uris = self.repo.run_custom_query(CLASSES_PROPERTY_URIS_QUERY,
+                                             {"uris": class_uris, "label": "DatatypeProperty"},
+                                             projection=PROJECTION_SCALAR)
+        self.state["op_uris"] = op_uris
+        relations = sum(self._count_edges(opu) for opu in op_uris)
+        objects = self._count(CLASSES_OBJECTS_COUNT_QUERY, {"uris": class_uris})
+        return relations + len(op_uris) + len(dp_uris) + objects + len(class_uris)
+
+    def _relations(self, batch_size):
+        op_uris = self.state["op_uris"]
+        if not op_uris:
+            return 0, True
+        rows, finished = self._delete_edges_chunk(op_uris[0], batch_size)
+        self.stats["relations_deleted"] += rows
+        if finished:
+            op_uris.pop(0)
+        return rows, not op_uris
+
+    def _properties(self, batch_size):
+        rows = self.repo.run_custom_query(CLASSES_PROPERTIES_DELETE_QUERY,
+                                          {"uris": self.state["class_uris"], "batch_size": batch_size},
+                                          projection=PROJECTION_PROPERTIES)
+        op_deleted = int(rows[0]["op_deleted"] or 0) if rows else 0
+        dp_deleted = int(rows[0]["dp_deleted"] or 0) if rows else 0
+        self.stats["op_deleted"] += op_deleted
+        self.stats["dp_deleted"] += dp_deleted
+        return op_deleted + dp_deleted, True
+
+    def _objects(self, batch_size):
+        rows = self._count(CLASSES_OBJECTS_DELETE_CHUNK_QUERY,
+                           {"uris": self.state["class_uris"], "batch_size": batch_size})
+        self.stats["objects_deleted"] += rows
+        return rows, rows < batch_size
+
+    def _classes(self, batch_size):
+        # классов немного: удаляются последними, одним запросом
+        rows = self._count(CLASSES_DELETE_QUERY, {"uris": self.state["class_uris"], "batch_size": batch_size})
+        self.stats["classes_deleted"] += rows
+        return rows, True
+
+
+class DeleteClassAttributeJob(BatchedMutation):
+    """Пакетный OntologyService.delete_class_attribute; params: {"class_uri", "attr_name", "attr_uri"}."""
+    kind = "delete_class_attribute"
+    phases = ("clear", "node")
+
+    def prepare(self) -> int:
+        attr = self.service.find_class_attribute(self.params.get("class_uri"), self.params.get("attr_name"),
+                                                 self.params.get("attr_uri"))
+        self.state = {
+            "phase": self.phases[0] if attr else PHASE_DONE,
+            "attr": attr,
+            "stats": {"attribute_node_deleted": False, "objects_touched": 0},
+        }
+        if not attr:
+            return 0
+        if not attr["name"]:
+            self.state["phase"] = "node"
+            return 1
+        return self._count(CLASS_ATTRIBUTE_SET_COUNT_QUERY,
+                           {"class_uri": self.params["class_uri"], "attr_name": attr["name"]}) + 1
+
+    def _clear(self, batch_size):
+        rows = self._count(CLEAR_CLASS_ATTRIBUTE_CHUNK_QUERY, {
+            "class_uri": self.params["class_uri"],
+            "attr_name": self.state["attr"]["name"],
+            "batch_size": batch_size,
+        })
+        self.stats["objects_touched"] += rows
+        return rows, rows < batch_size
+
+    def _node(self, batch_size):
+        node_uri = self.state["attr"]["uri"]
+        deleted = bool(node_uri and self.repo.delete_node_by_uri(node_uri, detach=True))
+        self.stats["attribute_node_deleted"] = deleted
+        return int(deleted), True
+
+
+class DeleteObjectAttributeJob(BatchedMutation):
+    """Пакетный OntologyService.delete_class_object_attribute; params: {"object_property_uri"}."""
+    kind = "delete_class_object_attribute"
+    phases = ("relations", "node")
+
+    def prepare(self) -> int:
+        self.state = {
+            "phase": self.phases[0],
+            "stats": {"relations_deleted": 0, "property_node_deleted": False},
+        }
+        return self._count_edges(self.params["object_property_uri"]) + 1
+
+    def _relations(self, batch_size):
+        rows, finished = self._delete_edges_chunk(self.params["object_property_uri"], batch_size)
+        self.stats["relations_deleted"] += rows
+        return rows, finished
+
+    def _node(self, batch_size):
+        deleted = bool(self.repo.delete_node_by_uri(self.params["object_property_uri"], detach=True))
+        self.stats["property_node_deleted"] = deleted
+        return int(deleted), True
+
+
+JOB_KINDS = {cls.kind: cls for cls in (DeleteClassJob, DeleteClassAttributeJob, DeleteObjectAttributeJob)}
+
+
+def create_mutation(service: OntologyService, kind: str, params: Dict[str, Any],
+                    state: Optional[Dict[str, Any]] = None) -> BatchedMutation:
+    try:
+        return JOB_KINDS[kind](service, params, state)
+    except KeyError:
+        raise ValueError(f"Unknown job kind '{kind}'") from None
@@ -0,0 +1,793 @@
+import itertools
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+import networkx as nx
+
+from . import closure as closure_queries
+from . import ontology as queries
+from .repository import (
+    NODES_PAGE_SIZE,
+    PROJECTION_PROPERTIES,
+    PROJECTION_RECORDS,
+    PROJECTION_SCALAR,
+    DuplicateUriError,
+    Neo4jRepository,
+)
+from .schema import DERIVED_REL_TYPES, DESCENDANT_REL, ONTOLOGY_LABEL
+
+CLASS = "Class"
+OBJECT = "Object"
+DATATYPE_PROPERTY = "DatatypeProperty"
+OBJECT_PROPERTY = "ObjectProperty"
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split())
+
+
+class _NodeRef:
+    """Узел в строке результата; сериализуется так же, как узел драйвера Neo4j."""
+    __slots__ = ("id",)
+
+    def __init__(self, node_id):
+        self.id = node_id
+
+
+class MemoryRepository:
+    """
+    Репозиторий онтологии в памяти процесса на networkx.MultiDiGraph.
+
+    Реализует публичные методы Neo4jRepository (CRUD узлов и рёбер, выборки
+    по меткам, выгрузку графа, read/write) и те запросы OntologyService,
+    что объявлены константами в ontology.py: run_custom_query сопоставляет
+    текст запроса (без учёта пробелов) с обработчиком на Python.
+    Поиск по uri и по метке идёт через словари-индексы.
+
+    Запись в write-транзакции атомарна: каждое изменение пишет обратную
+    операцию в журнал, и при исключении журнал проигрывается в обратном порядке.
+    Все операции выполняются под одной блокировкой.
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = None):
+        self.graph = nx.MultiDiGraph()
+        self._by_uri: Dict[str, str] = {}
+        self._by_label: Dict[str, set] = {}
+        self._by_rel_type: Dict[str, set] = {}
+        self._edges: Dict[str, tuple] = {}
+        self._node_ids = itertools.count(1)
+        self._rel_ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._undo = None
+        self._schema_generation = 0
+        self._handlers = self._build_handlers()
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.load_snapshot(snapshot_path)
+
+    def close(self):
+        pass
+
+    generate_random_string = staticmethod(Neo4jRepository.generate_random_string)
+
+    # ---------- unit of work ----------
+    @property
+    def in_transaction(self) -> bool:
+        return getattr(self._local, "depth", 0) > 0
+
+    def read(self, work, timeout: Optional[float] = None):
+        return self._execute(work, write=False)
+
+    def write(self, work, timeout: Optional[float] = None):
+        return self._execute(work, write=True)
+
+    def _execute(self, work, write: bool):
+        with self._lock:
+            if self.in_transaction:
+                return work(self)
+            self._local.depth = 1
+            self._undo = [] if write else None
+            try:
+                return work(self)
+            except BaseException:
+                self._rollback()
+                raise
+            finally:
+                self._local.depth = 0
+                self._undo = None
+
+    def _rollback(self):
+        undo, self._undo = self._undo, None
+        for operation in reversed(undo or []):
+            operation()
+
+    def _log(self, operation):
+        if self._undo is not None:
+            self._undo.append(operation)
+
+    # ---------- примитивы изменения графа (с журналом отката) ----------
+    def _add_node(self, labels, props, node_id: Optional[str] = None) -> str:
+        uri = props.get("uri")
+        if uri is not None and uri in self._by_uri:
+            raise DuplicateUriError(f"Node with uri '{uri}' already exists")
+        node_id = node_id or f"{next(self._node_ids):012d}"
+        self.graph.add_node(node_id, labels=set(labels), props=dict(props))
+        if uri is not None:
+            self._by_uri[uri] = node_id
+        for label in labels:
+            self._by_label.setdefault(label, set()).add(node_id)
+        self._log(lambda: self._drop_node(node_id))
+        return node_id
+
+    def _drop_node(self, node_id: str):
+        for _, _, rel_id in list(self.graph.in_edges(node_id, keys=True)) + \
+                list(self.graph.out_edges(node_id, keys=True)):
+            if rel_id in self._edges:
+                self._drop_edge(rel_id)
+        data = self.graph.nodes[node_id]
+        self.graph.remove_node(node_id)
+        uri = data["props"].get("uri")
+        if uri is not None and self._by_uri.get(uri) == node_id:
+            del self._by_uri[uri]
+        for label in data["labels"]:
+            self._by_label.get(label, set()).discard(node_id)
+        self._log(lambda: self._add_node(data["labels"], data["props"], node_id))
+
+    def _set_node_props(self, node_id: str, props: Dict[str, Any]):
+        data = self.graph.nodes[node_id]
+        old = data["props"]
+        new_uri = props.get("uri")
+        if new_uri is not None and self._by_uri.get(new_uri, node_id) != node_id:
+            raise DuplicateUriError(f"Node with uri '{new_uri}' already exists")
+        if old.get("uri") is not None and self._by_uri.get(old["uri"]) == node_id:
+            del self._by_uri[old["uri"]]
+        if new_uri is not None:
+            self._by_uri[new_uri] = node_id
+        data["props"] = {k: v for k, v in props.items() if v is not None}
+        self._log(lambda: self._set_node_props(node_id, old))
+
+    def _add_edge(self, start: str, end: str, rel_type: str, props, rel_id: Optional[str] = None) -> str:
+        rel_id = rel_id or f"r{next(self._rel_ids):012d}"
+        self.graph.add_edge(start, end, key=rel_id, type=rel_type, props=dict(props or {}))
+        self._edges[rel_id] = (start, end)
+        self._by_rel_type.setdefault(rel_type, set()).add(rel_id)
+        self._log(lambda: self._drop_edge(rel_id))
+        return rel_id
+
+    def _drop_edge(self, rel_id: str):
+        start, end = self._edges.pop(rel_id)
+        data = self.graph.edges[start, end, rel_id]
+        self.graph.remove_edge(start, end, key=rel_id)
+        self._by_rel_type.get(data["type"], set()).discard(rel_id)
+        self._log(lambda: self._add_edge(start, end, data["type"], data["props"], rel_id))
+
+    def _set_edge_props(self, rel_id: str, props: Dict[str, Any]):
+        start, end = self._edges[rel_id]
+        data = self.graph.edges[start, end, rel_id]
+        old = data["props"]
+        data["props"] = dict(props)
+        self._log(lambda: self._set_edge_props(rel_id, old))
+
+    # ---------- чтение графа ----------
+    def _labels(self, node_id: str) -> set:
+        return self.graph.nodes[node_id]["labels"]
+
+    def _props(self, node_id: str) -> Dict[str, Any]:
+        return self.graph.nodes[node_id]["props"]
+
+    def _node_by_uri(self, uri, label: Optional[str] = None) -> Optional[str]:
+        node_id = self._by_uri.get(uri)
+        if node_id is None or (label and label not in self._labels(node_id)):
+            return None
+        return node_id
+
+    def _out(self, node_id: str, rel_type: str):
+        """(конец, данные ребра) исходящих рёбер типа rel_type."""
+        for _, end, data in self.graph.out_edges(node_id, data=True):
+            if data["type"] == rel_type:
+                yield end, data
+
+    def _in(self, node_id: str, rel_type: str):
+        for start, _, data in self.graph.in_edges(node_id, data=True):
+            if data["type"] == rel_type:
+                yield start, data
+
+    def _node_value(self, node_id: str) -> Dict[str, Any]:
+        return {"_type": "node", "id": node_id, "properties": dict(self._props(node_id))}
+
+    def _rel_value(self, rel_id: str) -> Dict[str, Any]:
+        start, end = self._edges[rel_id]
+        data = self.graph.edges[start, end, rel_id]
+        return {
+            "_type": "rel",
+            "id": rel_id,
+            "type": data["type"],
+            "properties": dict(data["props"]),
+            "start": start,
+            "end": end
+        }
+
+    # ---------- публичные методы Neo4jRepository ----------
+    def get_all_nodes(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"n": self._node_value(node_id)} for node_id in sorted(self.graph.nodes)]
+
+    def get_all_nodes_and_arcs(self) -> List[Dict[str, Any]]:
+        return list(self.iter_nodes_and_arcs())
+
+    def iter_nodes_and_arcs(self, after: Optional[str] = None, limit: Optional[int] = None):
+        with self._lock:
+            node_ids = sorted(self.graph.nodes)
+            if after is not None:
+                node_ids = [node_id for node_id in node_ids if node_id > after]
+            if limit is not None or after is not None:
+                node_ids = node_ids[:limit if limit is not None else NODES_PAGE_SIZE]
+            items = []
+            for node_id in node_ids:
+                node = self._node_value(node_id)
+                node["arcs"] = [
+                    self._rel_value(rel_id)
+                    for _, _, rel_id, data in self.graph.out_edges(node_id, keys=True, data=True)
+                    if data["type"] not in DERIVED_REL_TYPES
+                ]
+                items.append(node)
+        return iter(items)
+
+    def get_nodes_and_arcs_page(self, after: Optional[str] = None, limit: int = 500) -> Dict[str, Any]:
+        items = list(self.iter_nodes_and_arcs(after=after, limit=limit))
+        next_cursor = items[-1]["id"] if len(items) == limit else None
+        return {"items": items, "next": next_cursor}
+
+    def get_nodes_by_labels(self, labels: List[str]) -> List[Dict[str, Any]]:
+        if not labels:
+            return []
+        with self._lock:
+            node_ids = set.intersection(*(self._by_label.get(label, set()) for label in labels))
+            return [{"n": self._node_value(node_id)} for node_id in sorted(node_ids)]
+
+    def get_node_by_uri(self, uri: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            node_id = self._node_by_uri(uri)
+            return self._node_value(node_id) if node_id else None
+
+    def create_node(self, params: Dict[str, Any], labels: Optional[List[str]] = None) -> Dict[str, Any]:
+        props = dict(params)
+        if "uri" not in props or not props["uri"]:
+            props["uri"] = self.generate_random_string(12)
+        labels = [ONTOLOGY_LABEL] + [lbl for lbl in (labels or []) if lbl != ONTOLOGY_LABEL]
+        with self._lock:
+            node = self._node_value(self._add_node(labels, props))
+        node["uri"] = node["properties"].get("uri", "")
+        return node
+
+    def create_arc(self,
+                   node1_uri: str,
+                   node2_uri: str,
+                   rel_type: str = "RELATED",
+                   rel_props: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            start, end = self._node_by_uri(node1_uri), self._node_by_uri(node2_uri)
+            if start is None or end is None:
+                return None
+            return self._rel_value(self._add_edge(start, end, rel_type, rel_props))
+
+    def delete_node_by_uri(self, uri: str, detach: bool = True) -> int:
+        with self._lock:
+            node_id = self._node_by_uri(uri)
+            if node_id is None:
+                return 0
+            if not detach and self.graph.degree(node_id):
+                raise ValueError(f"Node '{uri}' still has relationships")
+            self._drop_node(node_id)
+            return 1
+
+    def delete_arc_by_id(self, arc_element_id: str) -> bool:
+        with self._lock:
+            if arc_element_id not in self._edges:
+                return False
+            self._drop_edge(arc_element_id)
+            return True
+
+    def update_node(self, uri: str, properties: Dict[str, Any], merge: bool = False) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            node_id = self._node_by_uri(uri)
+            if node_id is None:
+                return None
+            props = {**self._props(node_id), **properties} if merge else dict(properties)
+            self._set_node_props(node_id, props)
+            return self._node_value(node_id)
+
+    # ---------- запросы ----------
+    def run_custom_query(self,
+                         query: str,
+                         parameters: Dict[str, Any] = None,
+                         projection: str = PROJECTION_RECORDS) -> List[Any]:
+        """
+        Выполняет один из поддерживаемых запросов (константы ontology.py и closure.py).
+        Неизвестный запрос — NotImplementedError.
+        """
+        with self._lock:
+            rows = self._dispatch(query, parameters or {})
+            return [self._project(row, projection) for row in rows]
+
+    def iter_custom_query(self,
+                          query: str,
+                          parameters: Dict[str, Any] = None,
+                          projection: str = PROJECTION_RECORDS):
+        return iter(self.run_custom_query(query, parameters, projection))
+
+    def _dispatch(self, query: str, parameters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        normalized = normalize_query(query)
+        handler = self._handlers.get(normalized)
+        if handler is not None:
+            return handler(**parameters)
+        for pattern, handler in self._pattern_handlers:
+            match = pattern.fullmatch(normalized)
+            if match:
+                return handler(**{k: v.replace("``", "`") for k, v in match.groupdict().items()}, **parameters)
+        raise NotImplementedError(f"Query is not supported by the in-memory backend: {normalized[:200]}")
+
+    def _project(self, row: Dict[str, Any], projection: str):
+        if projection == PROJECTION_RECORDS:
+            return {k: self._serialize(v) for k, v in row.items()}
+        if projection == PROJECTION_PROPERTIES:
+            return {k: self._plain(v) for k, v in row.items()}
+        if projection == PROJECTION_SCALAR:
+            return self._serialize(next(iter(row.values())))
+        raise ValueError(f"Unknown projection '{projection}'")
+
+    def _serialize(self, value):
+        if isinstance(value, _NodeRef):
+            return self._node_value(value.id)
+        if isinstance(value, list):
+            # списки узлов (collect) отдаются словарями свойств, как Node драйвера
+            return [self._plain(v) for v in value]
+        return value
+
+    def _plain(self, value):
+        if isinstance(value, _NodeRef):
+            return dict(self._props(value.id))
+        if isinstance(value, list):
+            return [self._plain(v) for v in value]
+        return value
+
+    def _build_handlers(self):
+        q = queries
+        handlers = {
+            q.ROOT_CLASSES_QUERY: self._root_classes,
+            q.CLASS_QUERY: self._class,
+            q.CLASS_PARENTS_QUERY: self._class_parents,
+            q.CLASS_CHILDREN_QUERY: self._class_children,
+            q.CLASS_OBJECTS_QUERY: self._class_objects,
+            q.CLASS_OBJECTS_LEGACY_QUERY: self._class_objects_legacy,
+            q.CLASS_CHILDREN_PAGE_QUERY: self._class_children_page,
+            q.CLASS_CHILDREN_COUNT_QUERY: self._class_children_count,
+            q.CLASS_OBJECTS_PAGE_QUERY: self._class_objects_page,
+            q.CLASS_OBJECTS_PAGE_BY_URI_QUERY: self._class_objects_page,
+            q.OBJECTS_COUNT_QUERY: self._objects_count,
+            q.CLASS_OBJECTS_COUNT_QUERY: self._class_objects_count,
+            q.CLASS_TREE_URIS_QUERY: self._class_tree_uris,
+            q.CLASSES_PROPERTY_URIS_QUERY: self._classes_property_uris,
+            q.CLASSES_PROPERTIES_DELETE_QUERY: self._delete_classes_properties,
+            q.CLASSES_OBJECTS_DELETE_QUERY: self._delete_classes_objects,
+            q.CLASSES_DELETE_QUERY: self._delete_classes,
+            q.CLASSES_OBJECTS_COUNT_QUERY: self._classes_objects_count,
+            q.CLASSES_OBJECTS_DELETE_CHUNK_QUERY: self._delete_classes_objects_chunk,
+            q.CLASS_ATTRIBUTE_SET_COUNT_QUERY: self._class_attribute_set_count,
+            q.CLEAR_CLASS_ATTRIBUTE_CHUNK_QUERY: self._clear_class_attribute_chunk,
+            q.CLEAR_CLASS_ATTRIBUTE_QUERY: self._clear_class_attribute,
+            q.CLOSURE_LINK_QUERY: self._closure_link,
+            q.DATATYPE_PROPERTY_BY_URI_QUERY: self._datatype_property_by_uri,
+            q.CLASS_DATATYPE_PROPERTY_BY_NAME_QUERY: self._class_datatype_property_by_name,
+            q.SIGNATURE_INHERITED_QUERY: self._signature_inherited,
+            q.SCHEMA_GENERATION_QUERY: self._schema_generation_value,
+            q.BUMP_SCHEMA_GENERATION_QUERY: self._bump_schema_generation,
+            q.OBJECT_QUERY: self._object,
+            q.OBJECT_CLASS_URI_QUERY: self._object_class_uri,
+            q.CREATE_OBJECT_QUERY: self._create_object,
+            closure_queries.SUBCLASS_EDGES_QUERY: self._subclass_edges,
+            closure_queries.CLOSURE_EDGES_QUERY: self._closure_edges,
+            closure_queries.CLOSURE_MISSING_QUERY: self._closure_missing,
+        }
+        self._pattern_handlers = [
+            (self._template_pattern(q.OBJECT_PROPERTY_EDGES_COUNT_QUERY), self._object_property_edges_count),
+            (self._template_pattern(q.OBJECT_PROPERTY_EDGES_DELETE_QUERY), self._delete_object_property_edges),
+            (self._template_pattern(q.OBJECT_PROPERTY_EDGES_DELETE_CHUNK_QUERY),
+             self._delete_object_property_edges_chunk),
+        ]
+        return {normalize_query(query): handler for query, handler in handlers.items()}
+
+    @staticmethod
+    def _template_pattern(template: str):
+        """
+        Регулярное выражение из шаблона запроса: {name} — именованная группа
+        (повтор — ссылка на неё), {{ }} — фигурные скобки.
+        """
+        parts = re.split(r"(?<!\{)\{(\w+)\}(?!\})", normalize_query(template))
+        pattern, seen = [], set()
+        for i, part in enumerate(parts):
+            if i % 2 == 0:
+                pattern.append(re.escape(part.replace("{{", "{").replace("}}", "}")))
+            elif part in seen:
+                pattern.append(f"(?P={part})")
+            else:
+                seen.add(part)
+                pattern.append(f"(?P<{part}>.+?)")
+        pattern = "".join(pattern)
+        return re.compile(pattern)
+
+    # ---------- обработчики запросов OntologyService ----------
+    def _descendants(self, class_id: str) -> List[tuple]:
+        """(потомок, глубина) по замыканию иерархии."""
+        return [(start, data["props"].get("depth", 0)) for start, data in self._in(class_id, DESCENDANT_REL)]
+
+    def _ancestors(self, class_id: str) -> List[tuple]:
+        return [(end, data["props"].get("depth", 0)) for end, data in self._out(class_id, DESCENDANT_REL)]
+
+    def _objects_of(self, class_id: str) -> List[str]:
+        return [start for start, _ in self._in(class_id, queries.TYPE_REL) if OBJECT in self._labels(start)]
+
+    def _root_classes(self):
+        return [{"c": _NodeRef(node_id)} for node_id in sorted(self._by_label.get(CLASS, ()))
+                if not any(True for _ in self._out(node_id, queries.SUBCLASS_REL))]
+
+    def _class(self, uri):
+        node_id = self._node_by_uri(uri, CLASS)
+        return [{"c": _NodeRef(node_id)}] if node_id else []
+
+    def _class_parents(self, uri):
+        node_id = self._node_by_uri(uri, CLASS)
+        if node_id is None:
+            return []
+        ancestors = sorted(self._ancestors(node_id), key=lambda item: item[1])
+        return [{"p": _NodeRef(a)} for a, _ in ancestors if CLASS in self._labels(a)]
+
+    def _class_children(self, uri):
+        node_id = self._node_by_uri(uri, CLASS)
+        if node_id is None:
+            return []
+        descendants = sorted(self._descendants(node_id), key=lambda item: item[1])
+        return [{"child": _NodeRef(d)} for d, _ in descendants if CLASS in self._labels(d)]
+
+    def _class_objects(self, uri):
+        node_id = self._node_by_uri(uri, CLASS)
+        return [{"o": _NodeRef(o)} for o in self._objects_of(node_id)] if node_id else []
+
+    def _class_objects_legacy(self, uri):
+        return [{"o": _NodeRef(o)} for o in sorted(self._by_label.get(OBJECT, ()))
+                if self._props(o).get("class_uri") == uri]
+
+    def _after(self, node_ids, after, limit):
+        """Keyset-страница узлов в порядке uri."""
+        keyed = sorted((self._props(n).get("uri"), n) for n in node_ids if self._props(n).get("uri") is not None)
+        return [n for u, n in keyed if after is None or u > after][:limit]
+
+    def _class_children_page(self, uri, include_subclasses, after, limit):
+        node_id = self._node_by_uri(uri, CLASS)
+        if node_id is None:
+            return []
+        children = {d for d, depth in self._descendants(node_id)
+                    if CLASS in self._labels(d) and (include_subclasses or depth == 1)}
+        return [{"child": _NodeRef(d)} for d in self._after(children, after, limit)]
+
+    def _class_children_count(self, uri, include_subclasses):
+        node_id = self._node_by_uri(uri, CLASS)
+        if node_id is None:
+            return []
+        rel_type = DESCENDANT_REL if include_subclasses else queries.SUBCLASS_REL
+        return [{"cnt": sum(1 for _ in self._in(node_id, rel_type))}]
+
+    def _class_ids_with_subclasses(self, uri, include_subclasses) -> List[str]:
+        node_id = self._node_by_uri(uri, CLASS)
+        if node_id is None:
+            return []
+        descendants = [d for d, _ in self._descendants(node_id) if CLASS in self._labels(d)] \
+            if include_subclasses else []
+        return [node_id] + descendants
+
+    def _class_objects_page(self, uri, include_subclasses, after, limit):
+        objects = {o for c in self._class_ids_with_subclasses(uri, include_subclasses) for o in self._objects_of(c)}
+        return [{"o": _NodeRef(o)} for o in self._after(objects, after, limit)]
+
+    def _objects_count(self):
+        return [{"cnt": len(self._by_label.get(OBJECT, ()))}]
+
+    def _class_objects_count(self, uri, include_subclasses):
+        class_ids = self._class_ids_with_subclasses(uri, include_subclasses)
+        if not class_ids:
+            return []
+        return [{"cnt": sum(1 for c in class_ids for _ in self._in(c, queries.TYPE_REL))}]
+
+    def _class_tree_uris(self, uri):
+        node_id = self._node_by_uri(uri, CLASS)
+        if node_id is None:
+            return []
+        uris = [uri] + [self._props(d).get("uri") for d, _ in self._descendants(node_id)]
+        return [{"uri": u} for u in dict.fromkeys(uris)]
+
+    def _classes_property_uris(self, uris, label):
+        found = {}
+        for cu in uris:
+            class_id = self._node_by_uri(cu, CLASS)
+            if class_id is None:
+                continue
+            neighbours = [s for s, _ in self._in(class_id, queries.DOMAIN_REL)] + \
+                         [e for e, _ in self._out(class_id, queries.DOMAIN_REL)]
+            for p in neighbours:
+                prop_uri = self._props(p).get("uri")
+                if label in self._labels(p) and prop_uri is not None:
+                    found[prop_uri] = None
+        return [{"uri": u} for u in found]
+
+    def _class_ids(self, uris) -> List[str]:
+        return [c for c in dict.fromkeys(self._node_by_uri(cu, CLASS) for cu in uris) if c is not None]
+
+    def _delete_classes_properties(self, uris, batch_size=None):
+        found = {}
+        for class_id in self._class_ids(uris):
+            for p, _ in itertools.chain(self._in(class_id, queries.DOMAIN_REL), self._out(class_id, queries.DOMAIN_REL)):
+                labels = self._labels(p)
+                if DATATYPE_PROPERTY in labels or OBJECT_PROPERTY in labels:
+                    found[p] = OBJECT_PROPERTY in labels
+        for p in found:
+            self._drop_node(p)
+        op_deleted = sum(found.values())
+        return [{"op_deleted": op_deleted, "dp_deleted": len(found) - op_deleted}]
+
+    def _classes_objects(self, uris) -> List[str]:
+        return list(dict.fromkeys(o for class_id in self._class_ids(uris) for o in self._objects_of(class_id)))
+
+    def _delete_classes_objects(self, uris, batch_size=None):
+        objects = self._classes_objects(uris)
+        for o in objects:
+            self._drop_node(o)
+        return [{"cnt": len(objects)}]
+
+    def _classes_objects_count(self, uris):
+        return [{"cnt": len(self._classes_objects(uris))}]
+
+    def _delete_classes_objects_chunk(self, uris, batch_size):
+        chunk = self._classes_objects(uris)[:batch_size]
+        for o in chunk:
+            self._drop_node(o)
+        return [{"cnt": len(chunk)}]
+
+    def _delete_classes(self, uris, batch_size=None):
+        class_ids = self._class_ids(uris)
+        for class_id in class_ids:
+            self._drop_node(class_id)
+        return [{"cnt": len(class_ids)}]
+
+    def _subtree_objects(self, class_uri) -> Optional[List[str]]:
+        """Объекты класса и его потомков; None — класса нет."""
+        root = self._node_by_uri(class_uri, CLASS)
+        if root is None:
+            return None
+        objects = {}
+        for class_id in [root] + [d for d, _ in self._descendants(root)]:
+            for o in self._objects_of(class_id):
+                objects[o] = None
+        return list(objects)
+
+    def _clear_class_attribute(self, class_uri, attr_name):
+        objects = self._subtree_objects(class_uri)
+        if objects is None:
+            return []
+        for o in objects:
+            self._unset_prop(o, attr_name)
+        return [{"cnt": len(objects)}]
+
+    def _unset_prop(self, node_id, name):
+        props = self._props(node_id)
+        if name in props:
+            self._set_node_props(node_id, {k: v for k, v in props.items() if k != name})
+
+    def _objects_with_attribute(self, class_uri, attr_name) -> List[str]:
+        return [o for o in self._subtree_objects(class_uri) or () if self._props(o).get(attr_name) is not None]
+
+    def _class_attribute_set_count(self, class_uri, attr_name):
+        return [{"cnt": len(self._objects_with_attribute(class_uri, attr_name))}]
+
+    def _clear_class_attribute_chunk(self, class_uri, attr_name, batch_size):
+        chunk = self._objects_with_attribute(class_uri, attr_name)[:batch_size]
+        for o in chunk:
+            self._unset_prop(o, attr_name)
+        return [{"cnt": len(chunk)}]
+
+    def _closure_link(self, target_uri, parent_uri):
+        target, parent = self._node_by_uri(target_uri, CLASS), self._node_by_uri(parent_uri, CLASS)
+        if target is None or parent is None:
+            return []
+        xs = [(target, 0)] + self._descendants(target)
+        ys = [(parent, 0)] + self._ancestors(parent)
+        depths = {}
+        for x, dx in xs:
+            for y, dy in ys:
+                if x != y:
+                    depth = dx + dy + 1
+                    depths[(x, y)] = min(depth, depths.get((x, y), depth))
+
+        for (x, y), depth in depths.items():
+            existing = [key for key, data in (self.graph.get_edge_data(x, y) or {}).items()
+                        if data["type"] == DESCENDANT_REL]
+            if not existing:
+                self._add_edge(x, y, DESCENDANT_REL, {"depth": depth})
+                continue
+            props = self.graph.edges[x, y, existing[0]]["props"]
+            if depth < props.get("depth", depth):
+                self._set_edge_props(existing[0], {**props, "depth": depth})
+        return [{"cnt": len(depths)}]
+
+    def _datatype_property_by_uri(self, attr_uri):
+        node_id = self._node_by_uri(attr_uri, DATATYPE_PROPERTY)
+        if node_id is None:
+            return []
+        props = self._props(node_id)
+        return [{"uri": props.get("uri"), "name": props.get("title")}]
+
+    def _class_datatype_property_by_name(self, class_uri, attr_name):
+        class_id = self._node_by_uri(class_uri, CLASS)
+        if class_id is None:
+            return []
+        for dp, _ in self._in(class_id, queries.DOMAIN_REL):
+            if DATATYPE_PROPERTY in self._labels(dp) and self._props(dp).get("title") == attr_name:
+                return [{"uri": self._props(dp).get("uri"), "name": attr_name}]
+        return []
+
+    def _signature_inherited(self, uri):
+        class_id = self._node_by_uri(uri, CLASS)
+        if class_id is None:
+            return []
+        owners = [(class_id, 0)] + sorted(self._ancestors(class_id), key=lambda item: item[1])
+        rows = []
+        for owner, depth in owners:
+            owner_uri = self._props(owner).get("uri")
+            properties = sorted(
+                (p for p, _ in self._in(owner, queries.DOMAIN_REL)
+                 if self._labels(p) & {DATATYPE_PROPERTY, OBJECT_PROPERTY}),
+                key=lambda p: str(self._props(p).get("uri")),
+            )
+            if not properties:
+                rows.append({"owner_uri": owner_uri, "depth": depth, "property": None, "labels": None, "range": None})
+            for p in properties:
+                ranges = [r for r, _ in self._out(p, queries.RANGE_REL) if CLASS in self._labels(r)]
+                for r in ranges or [None]:
+                    rows.append({
+                        "owner_uri": owner_uri,
+                        "depth": depth,
+                        "property": _NodeRef(p),
+                        "labels": sorted(self._labels(p)),
+                        "range": _NodeRef(r) if r else None,
+                    })
+        return rows
+
+    # поколение схемы хранится полем: узел OntologyMeta в графе памяти не нужен
+    def _schema_generation_value(self):
+        return [{"generation": self._schema_generation}]
+
+    def _bump_schema_generation(self):
+        self._schema_generation += 1
+        return [{"generation": self._schema_generation}]
+
+    def _object(self, uri):
+        node_id = self._node_by_uri(uri, OBJECT)
+        return [{"o": _NodeRef(node_id)}] if node_id else []
+
+    def _object_class_uri(self, uri):
+        node_id = self._node_by_uri(uri, OBJECT)
+        if node_id is None:
+            return []
+        return [{"class_uri": self._props(c).get("uri")} for c, _ in self._out(node_id, queries.TYPE_REL)
+                if CLASS in self._labels(c)]
+
+    def _create_object(self, class_uri, props, relations):
+        class_id = self._node_by_uri(class_uri, CLASS)
+        if class_id is None:
+            return []
+        object_id = self._add_node([ONTOLOGY_LABEL, OBJECT], props)
+        self._add_edge(object_id, class_id, queries.TYPE_REL, {})
+        missing = []
+        for rel in relations:
+            target_id = self._node_by_uri(rel["target_uri"], ONTOLOGY_LABEL)
+            if target_id is None:
+                missing.append(rel["target_uri"])
+            elif rel["direction"] == 1:
+                self._add_edge(object_id, target_id, rel["rel_type"], {})
+            elif rel["direction"] == -1:
+                self._add_edge(target_id, object_id, rel["rel_type"], {})
+        return [{"o": _NodeRef(object_id), "missing": missing}]
+
+    def _op_domain_instances(self, op_uri) -> List[str]:
+        """Экземпляры классов области определения ObjectProperty (с подклассами)."""
+        op_id = self._node_by_uri(op_uri, OBJECT_PROPERTY)
+        if op_id is None:
+            return []
+        domains = [c for c, _ in itertools.chain(self._in(op_id, queries.DOMAIN_REL), self._out(op_id, queries.DOMAIN_REL))
+                   if CLASS in self._labels(c)]
+        classes = dict.fromkeys(domains + [d for c in domains for d, _ in self._descendants(c)])
+        return list(dict.fromkeys(o for c in classes for o in self._objects_of(c)))
+
+    def _edges_of(self, node_id, rel_type) -> List[str]:
+        return [rel_id for _, _, rel_id, data in itertools.chain(self.graph.out_edges(node_id, keys=True, data=True),
+                                                                 self.graph.in_edges(node_id, keys=True, data=True))
+                if data["type"] == rel_type]
+
+    def _object_property_edges_count(self, rel_type, op_uri):
+        edges = {rel_id for o in self._op_domain_instances(op_uri) for rel_id in self._edges_of(o, rel_type)}
+        return [{"cnt": len(edges)}]
+
+    def _drop_edges_of(self, instances, rel_type) -> int:
+        deleted = 0
+        for o in instances:
+            for rel_id in self._edges_of(o, rel_type):
+                if rel_id in self._edges:
+                    self._drop_edge(rel_id)
+                    deleted += 1
+        return deleted
+
+    def _delete_object_property_edges(self, rel_type, op_uri, batch_size=None):
+        return [{"cnt": self._drop_edges_of(self._op_domain_instances(op_uri), rel_type)}]
+
+    def _delete_object_property_edges_chunk(self, rel_type, op_uri, batch_size):
+        chunk = [o for o in self._op_domain_instances(op_uri) if self._edges_of(o, rel_type)][:batch_size]
+        return [{"instances": len(chunk), "deleted": self._drop_edges_of(chunk, rel_type)}]
+
+    def _subclass_edges(self):
+        return [{"child": self._props(c)["uri"], "parent": self._props(p)["uri"]}
+                for c, p in (self._edges[r] for r in self._by_rel_type.get(queries.SUBCLASS_REL, ()))
+                if CLASS in self._labels(c) and CLASS in self._labels(p)]
+
+    def _closure_missing(self):
+        return [{"missing": bool(self._subclass_edges()) and not self._closure_edges()}]
+
+    def _closure_edges(self):
+        rows = []
+        for rel_id in self._by_rel_type.get(DESCENDANT_REL, ()):
+            c, a = self._edges[rel_id]
+            rows.append({
+                "child": self._props(c)["uri"],
+                "ancestor": self._props(a)["uri"],
+                "depth": self.graph.edges[c, a, rel_id]["props"].get("depth"),
+            })
+        return rows
+
+    # ---------- снимок ----------
+    def save_snapshot(self, path: str):
+        """Сохраняет граф в JSON: узлы с метками и свойствами, рёбра с типами."""
+        with self._lock:
+            data = {
+                "nodes": [{"id": n, "labels": sorted(d["labels"]), "properties": d["props"]}
+                          for n, d in self.graph.nodes(data=True)],
+                "rels": [{"start": s, "end": e, "type": d["type"], "properties": d["props"]}
+                         for s, e, d in self.graph.edges(data=True)],
+            }
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+        os.replace(tmp, path)
+
+    def load_snapshot(self, path: str):
+        """Добавляет в граф узлы и рёбра из снимка (формат save_snapshot)."""
+        with open(path) as f:
+            data = json.load(f)
+        self.load_graph(data["nodes"], data["rels"])
+
+    def load_graph(self, nodes, rels) -> Dict[str, int]:
+        """
+        Добавляет узлы и рёбра в формате снимка; принимает любые итерируемые,
+        так что большие графы можно подавать генераторами.
+        Рёбра с концами вне nodes пропускаются.
+        """
+        with self._lock:
+            ids = {}
+            for node in nodes:
+                ids[node["id"]] = self._add_node(node["labels"], node["properties"])
+            created = 0
+            for rel in rels:
+                if rel["start"] in ids and rel["end"] in ids:
+                    self._add_edge(ids[rel["start"]], ids[rel["end"]], rel["type"], rel["properties"])
+                    created += 1
+        return {"nodes": len(ids), "relationships": created}
@@ -1,72 +1,528 @@
+import copy
+import functools
+import os
 from typing import Any, Dict, List, Optional
 
-from .repository import Neo4jRepository
+from .repository import Neo4jRepository, PROJECTION_PROPERTIES, PROJECTION_SCALAR
+from .schema import DESCENDANT_REL, ONTOLOGY_LABEL, SCHEMA_META_LABEL
+from .signature import CompiledSignature, SignatureCache, compile_signature
 from pprint import pprint
 
+# Размер пакета для CALL ... IN TRANSACTIONS при каскадном удалении класса
+DELETE_BATCH_SIZE = int(os.getenv("ONTOLOGY_DELETE_BATCH_SIZE", "10000"))
+
 SUBCLASS_REL = "SUBCLASS_OF"
 DOMAIN_REL = "DOMAIN"
 RANGE_REL = "RANGE"
 TYPE_REL = "TYPE_OF"
 
+# ---------- Запросы ----------
+# Запросы, возвращающие один столбец, читаются с PROJECTION_SCALAR:
+# без промежуточного словаря на каждую запись
+ROOT_CLASSES_QUERY = f"""
+MATCH (c:Class)
+WHERE NOT ( (c)-[:{SUBCLASS_REL}]->() )
+RETURN c
+"""
+
+CLASS_QUERY = "MATCH (c:Class {uri:$uri}) RETURN c LIMIT 1"
+
+# Предки и потомки читаются из замыкания иерархии одним переходом (см. CLOSURE_LINK_QUERY)
+CLASS_PARENTS_QUERY = f"""
+MATCH (c:Class {{uri:$uri}})-[d:{DESCENDANT_REL}]->(p:Class)
+RETURN p ORDER BY d.depth
+"""
+
+CLASS_CHILDREN_QUERY = f"""
+MATCH (child:Class)-[d:{DESCENDANT_REL}]->(c:Class {{uri:$uri}})
+RETURN child ORDER BY d.depth
+"""
+
+CLASS_OBJECTS_QUERY = f"""
+MATCH (o:Object)-[:{TYPE_REL}]->(c:Class {{uri:$uri}})
+RETURN o
+"""
+
+CLASS_OBJECTS_LEGACY_QUERY = "MATCH (o:Object {class_uri:$uri}) RETURN o"
+
+# Страницы списков класса: порядок по uri, курсор $after — uri последнего
+# элемента (keyset). $include_subclasses = false — только прямые подклассы
+# (depth 1) / только собственные объекты класса.
+# Потомки: от класса по индексу uri, рёбра замыкания одного узла и top-k
+# сортировка LIMIT (классов немного).
+CLASS_CHILDREN_PAGE_QUERY = f"""
+MATCH (child:Class)-[d:{DESCENDANT_REL}]->(c:Class {{uri:$uri}})
+WHERE ($include_subclasses OR d.depth = 1) AND ($after IS NULL OR child.uri > $after)
+WITH child ORDER BY child.uri LIMIT $limit
+RETURN child
+"""
+
+# Число потомков — степень узла класса (COUNT без условий на другой конец
+# читается из счётчиков рёбер узла, а не обходом)
+CLASS_CHILDREN_COUNT_QUERY = f"""
+MATCH (c:Class {{uri:$uri}})
+RETURN CASE WHEN $include_subclasses
+    THEN COUNT {{ (c)<-[:{DESCENDANT_REL}]-() }}
+    ELSE COUNT {{ (c)<-[:{SUBCLASS_REL}]-() }}
+END AS cnt
+"""
+
+# Объекты — два плана (выбирает OntologyService.get_class_objects_page):
+# CLASS_OBJECTS_PAGE_QUERY раскрывает все TYPE_OF класса и берёт top-k —
+# страница стоит O(объектов класса), что дёшево для небольших классов;
+# CLASS_OBJECTS_PAGE_BY_URI_QUERY идёт по индексу uri Object в порядке
+# возрастания с $after и проверяет TYPE_OF у каждого — страница стоит
+# примерно limit * (всего Object / объектов класса) и не растёт с номером страницы.
+CLASS_OBJECTS_PAGE_QUERY = f"""
+MATCH (root:Class {{uri:$uri}})
+OPTIONAL MATCH (desc:Class)-[:{DESCENDANT_REL}]->(root)
+WHERE $include_subclasses
+WITH root, collect(desc) AS descendants
+UNWIND [root] + descendants AS c
+MATCH (o:Object)-[:{TYPE_REL}]->(c)
+WHERE $after IS NULL OR o.uri > $after
+WITH DISTINCT o ORDER BY o.uri LIMIT $limit
+RETURN o
+"""
+
+CLASS_OBJECTS_PAGE_BY_URI_QUERY = f"""
+MATCH (root:Class {{uri:$uri}})
+OPTIONAL MATCH (desc:Class)-[:{DESCENDANT_REL}]->(root)
+WHERE $include_subclasses
+WITH root, collect(desc) AS descendants
+WITH [root] + descendants AS classes
+MATCH (o:Object)
+WHERE o.uri > coalesce($after, '')
+  AND EXISTS {{ MATCH (o)-[:{TYPE_REL}]->(c) WHERE c IN classes }}
+RETURN o ORDER BY o.uri LIMIT $limit
+"""
+
+# Число всех Object — из счётчиков меток, без обхода
+OBJECTS_COUNT_QUERY = "MATCH (o:Object) RETURN count(o) AS cnt"
+
+# Сумма степеней TYPE_OF по классам: объект с несколькими TYPE_OF внутри
+# поддерева считается по разу на каждый класс
+CLASS_OBJECTS_COUNT_QUERY = f"""
+MATCH (root:Class {{uri:$uri}})
+OPTIONAL MATCH (desc:Class)-[:{DESCENDANT_REL}]->(root)
+WHERE $include_subclasses
+WITH root, collect(desc) AS descendants
+UNWIND [root] + descendants AS c
+RETURN sum(COUNT {{ (c)<-[:{TYPE_REL}]-() }}) AS cnt
+"""
+
+# Класс и все его потомки
+CLASS_TREE_URIS_QUERY = f"""
+MATCH (root:Class {{uri:$uri}})
+OPTIONAL MATCH (desc:Class)-[:{DESCENDANT_REL}]->(root)
+WITH root, collect(desc.uri) AS desc_uris
+UNWIND [root.uri] + desc_uris AS uri
+RETURN DISTINCT uri
+"""
+
+# Свойства, связанные с классами ребром DOMAIN в любом направлении
+CLASSES_PROPERTY_URIS_QUERY = f"""
+UNWIND $uris AS cu
+MATCH (c:Class {{uri:cu}})-[:{DOMAIN_REL}]-(p)
+WHERE $label IN labels(p) AND p.uri IS NOT NULL
+RETURN DISTINCT p.uri AS uri
+"""
+
+
+# Обнуление атрибута у объектов класса и его потомков
+CLEAR_CLASS_ATTRIBUTE_QUERY = f"""
+MATCH (root:Class {{uri:$class_uri}})
+OPTIONAL MATCH (desc:Class)-[:{DESCENDANT_REL}]->(root)
+WITH collect(root) + collect(desc) AS classes
+UNWIND classes AS cl
+MATCH (o:Object)-[:{TYPE_REL}]->(cl)
+SET o[$attr_name] = null
+RETURN count(DISTINCT o) AS cnt
+"""
+
+# Поддержка замыкания при новом ребре (target)-[:SUBCLASS_OF]->(parent):
+# каждый потомок target (и сам target) становится потомком parent и всех его
+# предков; глубина — минимум из прежней и новой длины пути
+CLOSURE_LINK_QUERY = f"""
+MATCH (t:Class {{uri:$target_uri}}), (p:Class {{uri:$parent_uri}})
+CALL {{
+    WITH t
+    MATCH (x:Class)-[d:{DESCENDANT_REL}]->(t)
+    RETURN x, d.depth AS dx
+    UNION
+    WITH t
+    RETURN t AS x, 0 AS dx
+}}
+CALL {{
+    WITH p
+    MATCH (p)-[a:{DESCENDANT_REL}]->(y:Class)
+    RETURN y, a.depth AS dy
+    UNION
+    WITH p
+    RETURN p AS y, 0 AS dy
+}}
+WITH x, y, min(dx + dy + 1) AS depth
+WHERE x <> y
+MERGE (x)-[r:{DESCENDANT_REL}]->(y)
+ON CREATE SET r.depth = depth
+ON MATCH SET r.depth = CASE WHEN depth < r.depth THEN depth ELSE r.depth END
+RETURN count(r) AS cnt
+"""
+
+# Пакетные варианты для фоновых задач (db.api.jobs): каждый запрос меняет
+# не больше $batch_size строк в своей транзакции и возвращает их число;
+# повторяется, пока не вернёт меньше $batch_size
+CLASSES_OBJECTS_COUNT_QUERY = f"""
+UNWIND $uris AS cu
+MATCH (o:Object)-[:{TYPE_REL}]->(:Class {{uri:cu}})
+RETURN count(DISTINCT o) AS cnt
+"""
+
+CLASSES_OBJECTS_DELETE_CHUNK_QUERY = f"""
+UNWIND $uris AS cu
+MATCH (o:Object)-[:{TYPE_REL}]->(:Class {{uri:cu}})
+WITH DISTINCT o LIMIT $batch_size
+DETACH DELETE o
+RETURN count(*) AS cnt
+"""
+
+CLASS_ATTRIBUTE_SET_COUNT_QUERY = f"""
+MATCH (root:Class {{uri:$class_uri}})
+OPTIONAL MATCH (desc:Class)-[:{DESCENDANT_REL}]->(root)
+WITH collect(root) + collect(desc) AS classes
+UNWIND classes AS cl
+MATCH (o:Object)-[:{TYPE_REL}]->(cl)
+WHERE o[$attr_name] IS NOT NULL
+RETURN count(DISTINCT o) AS cnt
+"""
+
+CLEAR_CLASS_ATTRIBUTE_CHUNK_QUERY = f"""
+MATCH (root:Class {{uri:$class_uri}})
+OPTIONAL MATCH (desc:Class)-[:{DESCENDANT_REL}]->(root)
+WITH collect(root) + collect(desc) AS classes
+UNWIND classes AS cl
+MATCH (o:Object)-[:{TYPE_REL}]->(cl)
+WHERE o[$attr_name] IS NOT NULL
+WITH DISTINCT o LIMIT $batch_size
+SET o[$attr_name] = null
+RETURN count(*) AS cnt
+"""
+
+DATATYPE_PROPERTY_BY_URI_QUERY = """
+MATCH (dp:DatatypeProperty {uri:$attr_uri})
+RETURN dp.uri AS uri, dp.title AS name LIMIT 1
+"""
+
+CLASS_DATATYPE_PROPERTY_BY_NAME_QUERY = f"""
+MATCH (dp:DatatypeProperty)-[:{DOMAIN_REL}]->(c:Class {{uri:$class_uri}})
+WHERE dp.title = $attr_name
+RETURN dp.uri AS uri, $attr_name AS name LIMIT 1
+"""
+
+# Рёбра между объектами по ObjectProperty имеют тип, равный uri свойства
+# (см. create_object). Тип ребра в Cypher не параметризуется, поэтому
+# подставляется в шаблон ({rel_type}, обратные кавычки экранируются).
+# Рёбра ищутся от экземпляров классов области определения свойства (DOMAIN,
+# с подклассами по замыканию): по построению один конец каждого такого ребра —
+# экземпляр этих классов, поэтому стоимость зависит от числа затронутых
+# экземпляров, а не от общего числа рёбер в базе.
+_OBJECT_PROPERTY_DOMAIN_INSTANCES = f"""
+MATCH (p:ObjectProperty)-[:{DOMAIN_REL}]-(d:Class)
+WHERE p.uri = $op_uri
+OPTIONAL MATCH (sub:Class)-[:{DESCENDANT_REL}]->(d)
+WITH collect(DISTINCT d) + collect(DISTINCT sub) AS classes
+UNWIND classes AS cl
+MATCH (o:Object)-[:{TYPE_REL}]->(cl)
+WITH DISTINCT o
+"""
+
+OBJECT_PROPERTY_EDGES_COUNT_QUERY = _OBJECT_PROPERTY_DOMAIN_INSTANCES + """
+MATCH (o)-[r:`{rel_type}`]-()
+RETURN count(DISTINCT r) AS cnt
+"""
+
+# Удаление пакетами по $batch_size экземпляров в отдельных транзакциях.
+# CALL ... IN TRANSACTIONS работает только в auto-commit запросе.
+OBJECT_PROPERTY_EDGES_DELETE_QUERY = _OBJECT_PROPERTY_DOMAIN_INSTANCES + """
+CALL {{
+    WITH o
+    MATCH (o)-[r:`{rel_type}`]-()
+    DELETE r
+    RETURN count(r) AS deleted
+}} IN TRANSACTIONS OF $batch_size ROWS
+RETURN sum(deleted) AS cnt
+"""
+
+# Вариант для фоновых задач: не больше $batch_size экземпляров, у которых
+# ещё есть такие рёбра; закончено, когда instances < $batch_size
+OBJECT_PROPERTY_EDGES_DELETE_CHUNK_QUERY = _OBJECT_PROPERTY_DOMAIN_INSTANCES + """
+WHERE EXISTS {{ (o)-[:`{rel_type}`]-() }}
+WITH o LIMIT $batch_size
+CALL {{
+    WITH o
+    MATCH (o)-[r:`{rel_type}`]-()
+    DELETE r
+    RETURN count(r) AS deleted
+}}
+RETURN count(o) AS instances, sum(deleted) AS deleted
+"""
+
+# Рёбра, созданные до перехода на uri как тип (тип — title свойства):
+# перевод на тип $op_uri, {rel_type} — прежний title
+OBJECT_PROPERTIES_TITLED_QUERY = """
+MATCH (p:ObjectProperty)
+WHERE p.title IS NOT NULL AND p.uri IS NOT NULL AND p.title <> p.uri
+RETURN p.uri AS uri, p.title AS title
+"""
+
+OBJECT_PROPERTY_EDGES_RETYPE_QUERY = _OBJECT_PROPERTY_DOMAIN_INSTANCES + """
+MATCH (o)-[r:`{rel_type}`]-()
+WITH DISTINCT r
+CALL {{
+    WITH r
+    WITH r, startNode(r) AS a, endNode(r) AS b
+    CREATE (a)-[n:$($op_uri)]->(b)
+    SET n = properties(r)
+    DELETE r
+}} IN TRANSACTIONS OF $batch_size ROWS
+RETURN count(*) AS cnt
+"""
+
+# Каскадное удаление поддерева классов (delete_class): каждый шаг — один запрос
+# по списку uri классов, удаление пакетами по $batch_size строк в отдельных
+# транзакциях.
+
+CLASSES_PROPERTIES_DELETE_QUERY = f"""
+UNWIND $uris AS cu
+MATCH (:Class {{uri:cu}})-[:{DOMAIN_REL}]-(p)
+WHERE p:DatatypeProperty OR p:ObjectProperty
+WITH DISTINCT p, p:ObjectProperty AS is_op
+CALL {{
+    WITH p
+    DETACH DELETE p
+}} IN TRANSACTIONS OF $batch_size ROWS
+RETURN sum(CASE WHEN is_op THEN 1 ELSE 0 END) AS op_deleted,
+       sum(CASE WHEN is_op THEN 0 ELSE 1 END) AS dp_deleted
+"""
+
+CLASSES_OBJECTS_DELETE_QUERY = f"""
+UNWIND $uris AS cu
+MATCH (o:Object)-[:{TYPE_REL}]->(:Class {{uri:cu}})
+WITH DISTINCT o
+CALL {{
+    WITH o
+    DETACH DELETE o
+}} IN TRANSACTIONS OF $batch_size ROWS
+RETURN count(*) AS cnt
+"""
+
+CLASSES_DELETE_QUERY = """
+UNWIND $uris AS cu
+MATCH (c:Class {uri:cu})
+CALL {
+    WITH c
+    DETACH DELETE c
+} IN TRANSACTIONS OF $batch_size ROWS
+RETURN count(*) AS cnt
+"""
+
+# Свойства класса и всех его предков, от ближних к дальним (depth 0 — сам класс)
+SIGNATURE_INHERITED_QUERY = f"""
+MATCH (c:Class {{uri:$uri}})
+OPTIONAL MATCH (c)-[d:{DESCENDANT_REL}]->(a:Class)
+WITH c, collect({{cls: a, depth: d.depth}}) AS ancestors
+UNWIND [{{cls: c, depth: 0}}] + ancestors AS owner
+WITH owner.cls AS cls, owner.depth AS depth
+WHERE cls IS NOT NULL
+OPTIONAL MATCH (p)-[:{DOMAIN_REL}]->(cls)
+WHERE p:DatatypeProperty OR p:ObjectProperty
+OPTIONAL MATCH (p)-[:{RANGE_REL}]->(range:Class)
+RETURN cls.uri AS owner_uri, depth, p AS property, labels(p) AS labels, range
+ORDER BY depth, p.uri
+"""
+
+# Поколение схемы классов: общий для всех процессов счётчик, по которому
+# кэш сигнатур узнаёт об изменениях, сделанных другими воркерами
+SCHEMA_GENERATION_QUERY = f"""
+OPTIONAL MATCH (m:{SCHEMA_META_LABEL})
+RETURN coalesce(max(m.generation), 0) AS generation
+"""
+
+BUMP_SCHEMA_GENERATION_QUERY = f"""
+MERGE (m:{SCHEMA_META_LABEL} {{key: 'schema'}})
+SET m.generation = coalesce(m.generation, 0) + 1
+RETURN m.generation AS generation
+"""
+
+OBJECT_QUERY = "MATCH (o:Object {uri:$uri}) RETURN o LIMIT 1"
+
+# Объект, его ребро TYPE_OF и связи за один запрос. $relations — уже проверенные
+# по сигнатуре связи [{rel_type, target_uri, direction}]; тип ребра задаётся
+# динамически через $(...) (Neo4j 5.26+). missing — uri ненайденных целей.
+CREATE_OBJECT_QUERY = f"""
+MATCH (c:Class {{uri:$class_uri}})
+CREATE (o:{ONTOLOGY_LABEL}:Object)-[:{TYPE_REL}]->(c)
+SET o = $props
+WITH o
+CALL {{
+    WITH o
+    UNWIND $relations AS rel
+    OPTIONAL MATCH (t:{ONTOLOGY_LABEL} {{uri: rel.target_uri}})
+    FOREACH (_ IN CASE WHEN t IS NOT NULL AND rel.direction = 1 THEN [1] ELSE [] END |
+        CREATE (o)-[:$(rel.rel_type)]->(t))
+    FOREACH (_ IN CASE WHEN t IS NOT NULL AND rel.direction = -1 THEN [1] ELSE [] END |
+        CREATE (t)-[:$(rel.rel_type)]->(o))
+    RETURN collect(CASE WHEN t IS NULL THEN rel.target_uri END) AS missing
+}}
+RETURN o, missing
+"""
+
+OBJECT_CLASS_URI_QUERY = f"""
+MATCH (o:Object {{uri:$uri}})-[:{TYPE_REL}]->(c:Class)
+RETURN c.uri AS class_uri
+"""
+
+
+def objects_page_query(class_objects: int, total_objects: int, limit: int) -> str:
+    """
+    План страницы объектов класса по степеням: раскрытие TYPE_OF стоит
+    class_objects строк, проход по индексу uri — около limit * total / class_objects.
+    """
+    if class_objects * class_objects > total_objects * limit:
+        return CLASS_OBJECTS_PAGE_BY_URI_QUERY
+    return CLASS_OBJECTS_PAGE_QUERY
+
+
+def object_property_edges_query(template: str, op_uri: str) -> str:
+    """Запрос по рёбрам ObjectProperty: тип ребра — uri свойства."""
+    return template.format(rel_type=op_uri.replace("`", "``"))
+
+
+def transactional(write: bool = False, timeout: Optional[float] = None):
+    """
+    Выполняет метод сервиса целиком в одной управляемой транзакции
+    репозитория (read или write) с автоматическим повтором при
+    транзиентных ошибках. Если сервис уже работает внутри транзакции,
+    метод просто вызывается в ней.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if getattr(self.repo, "in_transaction", False):
+                return method(self, *args, **kwargs)
+            run = self.repo.write if write else self.repo.read
+            return run(lambda uow: method(self._bind(uow), *args, **kwargs), timeout=timeout)
+        return wrapper
+    return decorator
+
+
+def invalidates_signatures(method):
+    """
+    Отмечает изменение схемы классов (OntologyService.schema_changed).
+    Ставится поверх transactional, чтобы отметка шла после фиксации транзакции.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.schema_changed()
+    return wrapper
+
 
 class OntologyService:
-    def __init__(self, repo: Neo4jRepository):
+    def __init__(self, repo: Neo4jRepository, signatures: Optional[SignatureCache] = None):
         self.repo = repo
+        self.signatures = signatures or SignatureCache()
+
+    def _bind(self, uow) -> "OntologyService":
+        """Копия сервиса, работающая через репозиторий транзакции."""
+        bound = copy.copy(self)
+        bound.repo = uow
+        return bound
 
     # ---------- Ontology-wide ----------
     def get_ontology(self):
         """Возвращает все узлы и связи"""
         return self.repo.get_all_nodes_and_arcs()
 
+    def get_ontology_page(self, after: Optional[str] = None, limit: int = 500):
+        """Страница узлов со связями: {"items": [...], "next": курсор}"""
+        return self.repo.get_nodes_and_arcs_page(after=after, limit=limit)
+
+    def iter_ontology(self):
+        """Лениво отдаёт узлы со связями по мере чтения из базы"""
+        return self.repo.iter_nodes_and_arcs()
+
+    @transactional()
     def get_ontology_parent_classes(self):
-        q = f"""
-        MATCH (c:Class)
-        WHERE NOT ( (c)-[:{SUBCLASS_REL}]->() )
-        RETURN c
-        """
-        return self.repo.run_custom_query(q)
+        return self.repo.run_custom_query(ROOT_CLASSES_QUERY)
 
     # ---------- Class queries ----------
+    @transactional()
     def get_class(self, class_uri: str):
-        q = "MATCH (c:Class {uri:$uri}) RETURN c LIMIT 1"
-        rows = self.repo.run_custom_query(q, {"uri": class_uri})
-        return rows[0]["c"] if rows else None
+        rows = self.repo.run_custom_query(CLASS_QUERY, {"uri": class_uri}, projection=PROJECTION_SCALAR)
+        return rows[0] if rows else None
 
+    @transactional()
     def get_class_parents(self, class_uri: str):
-        q = f"""
-        MATCH (c:Class {{uri:$uri}})-[:{SUBCLASS_REL}*]->(p:Class)
-        RETURN p
-        """
-        return [r["p"] for r in self.repo.run_custom_query(q, {"uri": class_uri})]
+        return self.repo.run_custom_query(CLASS_PARENTS_QUERY, {"uri": class_uri}, projection=PROJECTION_SCALAR)
 
+    @transactional()
     def get_class_children(self, class_uri: str):
-        q = f"""
-        MATCH (child:Class)-[:{SUBCLASS_REL}*]->(c:Class {{uri:$uri}})
-        RETURN child
-        """
-        return [r["child"] for r in self.repo.run_custom_query(q, {"uri": class_uri})]
+        return self.repo.run_custom_query(CLASS_CHILDREN_QUERY, {"uri": class_uri}, projection=PROJECTION_SCALAR)
 
+    @transactional()
     def get_class_objects(self, class_uri: str):
-        q = f"""
-        MATCH (o:Object)-[:{TYPE_REL}]->(c:Class {{uri:$uri}})
-        RETURN o
+        objects = self.repo.run_custom_query(CLASS_OBJECTS_QUERY, {"uri": class_uri}, projection=PROJECTION_SCALAR)
+        if not objects:
+            objects = self.repo.run_custom_query(CLASS_OBJECTS_LEGACY_QUERY, {"uri": class_uri},
+                                                 projection=PROJECTION_SCALAR)
+        return objects
+
+    @transactional()
+    def get_class_children_page(self, class_uri: str, after: Optional[str] = None, limit: int = 500,
+                                include_subclasses: bool = True):
         """
-        rows = self.repo.run_custom_query(q, {"uri": class_uri})
-        if not rows:
-            q2 = "MATCH (o:Object {class_uri:$uri}) RETURN o"
-            rows = self.repo.run_custom_query(q2, {"uri": class_uri})
-        return [r["o"] for r in rows]
+        Страница потомков в порядке uri: {"items": [...], "next": курсор, "count": всего}.
+        include_subclasses=False — только прямые подклассы.
+        """
+        params = {"uri": class_uri, "include_subclasses": include_subclasses}
+        return self._page(CLASS_CHILDREN_PAGE_QUERY, params, after, limit,
+                          self._count(CLASS_CHILDREN_COUNT_QUERY, params))
+
+    @transactional()
+    def get_class_objects_page(self, class_uri: str, after: Optional[str] = None, limit: int = 500,
+                               include_subclasses: bool = False):
+        """
+        Страница объектов класса (с include_subclasses — и его потомков) в порядке uri.
+        Объекты только по TYPE_OF: старый поиск по свойству class_uri перебирает
+        все Object и в постраничный режим не входит.
+        """
+        params = {"uri": class_uri, "include_subclasses": include_subclasses}
+        count = self._count(CLASS_OBJECTS_COUNT_QUERY, params)
+        query = objects_page_query(count, self._count(OBJECTS_COUNT_QUERY, {}), limit) if count else \
+            CLASS_OBJECTS_PAGE_QUERY
+        return self._page(query, params, after, limit, count)
+
+    def _page(self, query: str, params: Dict[str, Any], after: Optional[str], limit: int, count: int):
+        items = self.repo.run_custom_query(query, {**params, "after": after, "limit": limit},
+                                           projection=PROJECTION_SCALAR)
+        next_cursor = items[-1]["properties"].get("uri") if len(items) == limit else None
+        return {"items": items, "next": next_cursor, "count": count}
 
     # ---------- Class lifecycle ----------
+    @transactional(write=True)
     def create_class(self, title: str, description: str = "", uri: str = None, parent_uri: str = None):
         props = {"title": title, "description": description}
         if uri:
             props["uri"] = uri
         node = self.repo.create_node(props, labels=["Class"])
         if parent_uri:
-            self.repo.create_arc(node["uri"], parent_uri, rel_type=SUBCLASS_REL)
+            self._link_parent(node["uri"], parent_uri)
         return node
 
+    @transactional(write=True)
     def update_class(self, class_uri: str, title: str = None, description: str = None):
         props = {}
         if title is not None:
@@ -75,14 +531,25 @@ class OntologyService:
             props["description"] = description
         return self.repo.update_node(class_uri, props, merge=True) if props else self.get_class(class_uri)
 
-    def delete_class(self, class_uri: str) -> Dict[str, int]:
+    @invalidates_signatures
+    def delete_class(self, class_uri: str, batch_size: Optional[int] = None) -> Dict[str, int]:
         """
         Удаляет класс и рекурсивно: всех потомков-классов и все объекты этих классов.
         Кроме того удаляет DatatypeProperty и ObjectProperty, связанные с этими классами.
         Для ObjectProperty предварительно удаляет рёбра между объектами типа op_uri.
         Возвращает статистику: {"classes_deleted": n, "objects_deleted": m,
                                  "dp_deleted": x, "op_deleted": y, "relations_deleted": z}
+
+        Каждый шаг — один запрос на всё поддерево, удаление идёт пакетами по
+        batch_size строк (CALL ... IN TRANSACTIONS), поэтому метод работает вне
+        управляемой транзакции и не атомарен. Классы удаляются последними:
+        если удаление прервалось, повторный вызов доудалит остальное.
+        Замыкание иерархии отдельно не правится: удаляется всё поддерево,
+        так что рёбра DESCENDANT_OF уходят вместе с узлами (DETACH DELETE),
+        а путей через удалённые классы у оставшихся классов быть не может.
         """
+        self._require_autocommit("delete_class")
+        params = {"batch_size": batch_size or DELETE_BATCH_SIZE}
         stats = {
             "classes_deleted": 0,
             "objects_deleted": 0,
@@ -91,126 +558,44 @@ class OntologyService:
             "relations_deleted": 0
         }
 
-        # 1) Получаем root + всех дочерних классов (desc) как отдельные строки
-        q_desc = f"""
-        MATCH (root:Class {{uri:$uri}})
-        OPTIONAL MATCH (desc:Class)-[:{SUBCLASS_REL}*]->(root)
-        RETURN root, desc
-        """
-        rows = self.repo.run_custom_query(q_desc, {"uri": class_uri})
-        if not rows:
-            return stats
-
-        # 2) Собираем уникальные uri всех классов (root + desc)
-        class_uris = set()
-        for r in rows:
-            root_node = r.get("root")
-            if root_node and isinstance(root_node, dict):
-                ru = root_node.get("properties", {}).get("uri")
-                if ru:
-                    class_uris.add(ru)
-            desc_node = r.get("desc")
-            if desc_node and isinstance(desc_node, dict):
-                du = desc_node.get("properties", {}).get("uri")
-                if du:
-                    class_uris.add(du)
-
+        # 1) Собираем uri класса и всех его потомков
+        class_uris = set(self.repo.iter_custom_query(CLASS_TREE_URIS_QUERY, {"uri": class_uri},
+                                                     projection=PROJECTION_SCALAR))
+        class_uris.discard(None)
         if not class_uris:
             return stats
+        params["uris"] = list(class_uris)
 
-        # 3) Найдём ObjectProperty и DatatypeProperty, связанные с этими классами
-        # ObjectProperty (по DOMAIN или обратной связи)
-        q_ops = f"""
-        UNWIND $uris AS cu
-        OPTIONAL MATCH (op:ObjectProperty)-[:{DOMAIN_REL}]->(c:Class {{uri:cu}})
-        WITH collect(DISTINCT op) AS ops1
-
-        UNWIND $uris AS cu
-        OPTIONAL MATCH (c2:Class {{uri:cu}})-[:{DOMAIN_REL}]->(op2:ObjectProperty)
-        WITH ops1, collect(DISTINCT op2) AS ops2
-
-        WITH [o IN ops1 WHERE o IS NOT NULL] + [o IN ops2 WHERE o IS NOT NULL] AS all_ops
-        UNWIND all_ops AS opnode
-        RETURN DISTINCT opnode
-        """
-        rop = self.repo.run_custom_query(q_ops, {"uris": list(class_uris)})
-        op_uris = []
-        if rop:
-            for row in rop:
-                opnode = row.get("opnode")
-                if opnode and isinstance(opnode, dict):
-                    u = opnode.get("properties", {}).get("uri")
-                    if u:
-                        op_uris.append(u)
-
-        # DatatypeProperty (по DOMAIN)
-        q_dps = f"""
-        UNWIND $uris AS cu
-        OPTIONAL MATCH (dp:DatatypeProperty)-[:{DOMAIN_REL}]->(c:Class {{uri:cu}})
-        WITH collect(DISTINCT dp) AS dps1
-
-        UNWIND $uris AS cu  
-        OPTIONAL MATCH (c2:Class {{uri:cu}})-[:{DOMAIN_REL}]->(dp2:DatatypeProperty)
-        WITH dps1, collect(DISTINCT dp2) AS dps2
-
-        WITH [d IN dps1 WHERE d IS NOT NULL] + [d IN dps2 WHERE d IS NOT NULL] AS all_dps
-        UNWIND all_dps AS dpnode
-        RETURN DISTINCT dpnode
-        """
-        rdp = self.repo.run_custom_query(q_dps, {"uris": list(class_uris)})
-        dp_uris = []
-        if rdp:
-            for row in rdp:
-                dpnode = row.get("dpnode")
-                if dpnode and isinstance(dpnode, dict):
-                    u = dpnode.get("properties", {}).get("uri")
-                    if u:
-                        dp_uris.append(u)
-
-        # 4) Удаляем рёбра между объектами для каждого op_uri (type(r) = op_uri)
+        # 2) Удаляем рёбра между объектами для каждого ObjectProperty этих классов (type(r) = op_uri)
+        op_uris = self.repo.run_custom_query(CLASSES_PROPERTY_URIS_QUERY,
+                                             {"uris": params["uris"], "label": "ObjectProperty"},
+                                             projection=PROJECTION_SCALAR)
         for opu in op_uris:
-            if not opu:
-                continue
-            # Исправлено: используем динамический запрос с конкатенацией
-            q_del_rel = f"MATCH ()-[r:`{opu}`]->() DELETE r RETURN count(r) AS cnt"
-            rows_rel = self.repo.run_custom_query(q_del_rel)
-            if rows_rel and isinstance(rows_rel[0].get("cnt"), int):
-                stats["relations_deleted"] += int(rows_rel[0]["cnt"])
+            if opu:
+                stats["relations_deleted"] += self._delete_object_property_edges(opu, params["batch_size"])
+
+        # 3) ObjectProperty и DatatypeProperty (DOMAIN в любую сторону)
+        rows = self.repo.run_custom_query(CLASSES_PROPERTIES_DELETE_QUERY, params, projection=PROJECTION_PROPERTIES)
+        if rows:
+            stats["op_deleted"] = int(rows[0]["op_deleted"] or 0)
+            stats["dp_deleted"] = int(rows[0]["dp_deleted"] or 0)
+
+        # 4) Объекты этих классов, 5) сами классы
+        stats["objects_deleted"] = self._count(CLASSES_OBJECTS_DELETE_QUERY, params)
+        stats["classes_deleted"] = self._count(CLASSES_DELETE_QUERY, params)
+        return stats
 
-        # 5) Удаляем найденные ObjectProperty и DatatypeProperty узлы (detach delete)
-        for opu in op_uris:
-            if opu and self.repo.delete_node_by_uri(opu, detach=True):
-                stats["op_deleted"] += 1
-
-        for dpu in dp_uris:
-            if dpu and self.repo.delete_node_by_uri(dpu, detach=True):
-                stats["dp_deleted"] += 1
-
-        # 6) Удаляем объекты, принадлежащие этим классам
-        for cu in list(class_uris):
-            q_objs = f"""
-            MATCH (o:Object)-[:{TYPE_REL}]->(c:Class {{uri:$uri}})
-            RETURN o
-            """
-            objs = self.repo.run_custom_query(q_objs, {"uri": cu})
-            for row in objs:
-                o_node = row.get("o")
-                if o_node and isinstance(o_node, dict):
-                    obj_uri = o_node.get("properties", {}).get("uri")
-                    if obj_uri:
-                        deleted = self.repo.delete_node_by_uri(obj_uri, detach=True)
-                        if deleted:
-                            stats["objects_deleted"] += int(deleted)
-
-        # 7) Удаляем сами классы (detach delete)
-        for cu in list(class_uris):
-            deleted = self.repo.delete_node_by_uri(cu, detach=True)
-            if deleted:
-                stats["classes_deleted"] += int(deleted)
+    def _require_autocommit(self, name: str):
+        if getattr(self.repo, "in_transaction", False):
+            raise RuntimeError(f"{name} runs batched transactions and cannot be called inside a transaction")
 
-        return stats
+    def _count(self, query: str, parameters: Dict[str, Any]) -> int:
+        rows = self.repo.run_custom_query(query, parameters, projection=PROJECTION_SCALAR)
+        return int(rows[0] or 0) if rows else 0
 
     # ---------- DatatypeProperty ----------
+    @invalidates_signatures
+    @transactional(write=True)
     def add_class_attribute(self, class_uri: str, attr_title: str, attr_uri: str = None, attr_props: dict = None):
         props = dict(attr_props or {})
         props.setdefault("title", attr_title)
@@ -220,61 +605,46 @@ class OntologyService:
         self.repo.create_arc(dp["uri"], class_uri, rel_type=DOMAIN_REL)
         return dp
 
+    @invalidates_signatures
+    @transactional(write=True)
     def delete_class_attribute(self, class_uri: str, attr_name: str = None, attr_uri: str = None):
         stats = {"attribute_node_deleted": False, "objects_touched": 0}
 
         # Получаем информацию об атрибуте для обоих случаев
-        attr_info = None
-
-        if attr_uri:
-            q = "MATCH (dp:DatatypeProperty {uri:$attr_uri}) RETURN dp LIMIT 1"
-            res = self.repo.run_custom_query(q, {"attr_uri": attr_uri})
-            if res:
-                attr_info = {
-                    "node": res[0]["dp"],
-                    "name": res[0]["dp"]["properties"].get("title")
-                }
-        elif attr_name:
-            q = f"""
-            MATCH (dp:DatatypeProperty)-[:{DOMAIN_REL}]->(c:Class {{uri:$class_uri}})
-            WHERE dp.title = $attr_name
-            RETURN dp LIMIT 1
-            """
-            res = self.repo.run_custom_query(q, {"class_uri": class_uri, "attr_name": attr_name})
-            if res:
-                attr_info = {
-                    "node": res[0]["dp"],
-                    "name": attr_name
-                }
-        else:
-            return stats
+        attr_info = self.find_class_attribute(class_uri, attr_name, attr_uri)
 
         # Удаляем узел атрибута
         if attr_info:
-            node_uri = attr_info["node"]["properties"].get("uri")
+            node_uri = attr_info["uri"]
             if node_uri and self.repo.delete_node_by_uri(node_uri, detach=True):
                 stats["attribute_node_deleted"] = True
 
             # Очищаем поле у объектов (работает для обоих случаев)
             if attr_info["name"]:
-                q_clear = f"""
-                MATCH (root:Class {{uri:$class_uri}})
-                OPTIONAL MATCH (desc:Class)-[:{SUBCLASS_REL}*]->(root)
-                WITH collect(root) + collect(desc) AS classes
-                UNWIND classes AS cl
-                MATCH (o:Object)-[:{TYPE_REL}]->(cl)
-                SET o[$attr_name] = null
-                RETURN count(DISTINCT o) AS cnt
-                """
-                rows = self.repo.run_custom_query(q_clear, {
+                rows = self.repo.run_custom_query(CLEAR_CLASS_ATTRIBUTE_QUERY, {
                     "class_uri": class_uri,
                     "attr_name": attr_info["name"]
-                })
-                stats["objects_touched"] = rows[0]["cnt"] if rows else 0
+                }, projection=PROJECTION_SCALAR)
+                stats["objects_touched"] = rows[0] if rows else 0
 
         return stats
 
+    def find_class_attribute(self, class_uri: str, attr_name: str = None, attr_uri: str = None):
+        """DatatypeProperty по uri или по имени у класса: {"uri", "name"} или None."""
+        if attr_uri:
+            rows = self.repo.run_custom_query(DATATYPE_PROPERTY_BY_URI_QUERY, {"attr_uri": attr_uri},
+                                              projection=PROJECTION_PROPERTIES)
+        elif attr_name:
+            rows = self.repo.run_custom_query(CLASS_DATATYPE_PROPERTY_BY_NAME_QUERY,
+                                              {"class_uri": class_uri, "attr_name": attr_name},
+                                              projection=PROJECTION_PROPERTIES)
+        else:
+            return None
+        return rows[0] if rows else None
+
     # ---------- ObjectProperty ----------
+    @invalidates_signatures
+    @transactional(write=True)
     def add_class_object_attribute(self,
                                    class_uri: str,
                                    attr_name: str,
@@ -292,188 +662,141 @@ class OntologyService:
         self.repo.create_arc(op["uri"], range_class_uri, rel_type=RANGE_REL)
         return op
 
-    def delete_class_object_attribute(self, object_property_uri: str):
+    @invalidates_signatures
+    def delete_class_object_attribute(self, object_property_uri: str, batch_size: Optional[int] = None):
+        """
+        Удаляет ObjectProperty и рёбра этого типа между объектами.
+        Как и delete_class, работает пакетами вне управляемой транзакции;
+        узел свойства удаляется последним, так что повтор доудалит рёбра.
+        """
+        self._require_autocommit("delete_class_object_attribute")
         stats = {"relations_deleted": 0, "property_node_deleted": False}
-        q_del_rel = "MATCH ()-[r]->() WHERE type(r) = $reltype DELETE r RETURN count(r) AS cnt"
-        rows = self.repo.run_custom_query(q_del_rel, {"reltype": object_property_uri})
-        stats["relations_deleted"] = rows[0]["cnt"] if rows else 0
+        stats["relations_deleted"] = self._delete_object_property_edges(object_property_uri,
+                                                                        batch_size or DELETE_BATCH_SIZE)
         if self.repo.delete_node_by_uri(object_property_uri, detach=True):
             stats["property_node_deleted"] = True
         return stats
 
+    def _delete_object_property_edges(self, op_uri: str, batch_size: int) -> int:
+        query = object_property_edges_query(OBJECT_PROPERTY_EDGES_DELETE_QUERY, op_uri)
+        return self._count(query, {"op_uri": op_uri, "batch_size": batch_size})
+
     # ---------- Parent ----------
+    @invalidates_signatures
+    @transactional(write=True)
     def add_class_parent(self, parent_uri: str, target_uri: str):
-        return bool(self.repo.create_arc(target_uri, parent_uri, rel_type=SUBCLASS_REL))
+        return self._link_parent(target_uri, parent_uri)
+
+    def _link_parent(self, target_uri: str, parent_uri: str) -> bool:
+        """Ребро SUBCLASS_OF и инкрементальное обновление замыкания в той же транзакции."""
+        if not self.repo.create_arc(target_uri, parent_uri, rel_type=SUBCLASS_REL):
+            return False
+        self.repo.run_custom_query(CLOSURE_LINK_QUERY, {"target_uri": target_uri, "parent_uri": parent_uri})
+        return True
 
     # ---------- Objects ----------
+    @transactional()
     def get_object(self, object_uri: str):
-        q = "MATCH (o:Object {uri:$uri}) RETURN o LIMIT 1"
-        rows = self.repo.run_custom_query(q, {"uri": object_uri})
-        return rows[0]["o"] if rows else None
+        rows = self.repo.run_custom_query(OBJECT_QUERY, {"uri": object_uri}, projection=PROJECTION_SCALAR)
+        return rows[0] if rows else None
 
+    @transactional(write=True)
     def delete_object(self, object_uri: str):
         return self.repo.delete_node_by_uri(object_uri, detach=True) > 0
 
+    @transactional(write=True)
     def create_object(self, class_uri: str, properties: dict, relations: Optional[List[Dict[str, Any]]] = None):
-        # Получаем сигнатуру класса для валидации
-        signature = self.collect_signature(class_uri)
-
-        # Валидируем свойства
-        validated_props = self._validate_properties(properties, signature)
-
-        props = dict(validated_props)
+        """
+        Создаёт объект класса, ребро TYPE_OF и связи одним запросом.
+        relations: [{"rel_uri", "target_uri", "direction": 1 | -1}], где rel_uri —
+        ObjectProperty класса или его предков. Связи, которые не удалось создать,
+        возвращаются в "unresolved_relations" с причиной.
+        """
+        # Сигнатура класса (с наследованием) берётся из кэша
+        signature = self._signature(class_uri)
+        props = signature.validate(properties)
         if not props.get("uri"):
             props["uri"] = self.repo.generate_random_string(12)
-        node = self.repo.create_node(props, labels=["Object"])
-        self.repo.create_arc(node["uri"], class_uri, rel_type=TYPE_REL)
 
-        # Создаём связи из аргумента relations
-        relations = relations or []
-        for rel in relations:
+        resolved, unresolved = [], []
+        for rel in relations or []:
+            rel_uri, target_uri = rel.get("rel_uri"), rel.get("target_uri")
             direction = rel.get("direction") or 1
-            target_uri = rel.get("target_uri")
-            rel_uri = rel["rel_uri"]
-
-            if not target_uri or not rel_uri:
+            spec = signature.relations.get(rel_uri) if rel_uri else None
+            if not rel_uri or not target_uri:
+                reason = "rel_uri and target_uri are required"
+            elif spec is None:
+                reason = "unknown relation"
+            elif direction not in (1, -1):
+                reason = "direction must be 1 or -1"
+            else:
+                resolved.append({"rel_uri": rel_uri, "target_uri": target_uri,
+                                 "direction": direction, "rel_type": spec.uri})
                 continue
+            unresolved.append({"rel_uri": rel_uri, "target_uri": target_uri, "direction": direction, "reason": reason})
 
-            # достаём узел класса связи
-            rel_node = self.repo.get_node_by_uri(rel_uri)
-            if not rel_node:
-                continue  # если связи нет в онтологии → пропускаем
-
-            rel_type = dict(rel_node)
-            print(rel_type )
-            rel_type = rel_type.get("properties").get("title")
-            if not rel_type:
-                continue  # если в узле не задано поле type → тоже пропускаем
-
-            # создаём связь с учётом направления
-            if direction == 1:
-                self.repo.create_arc(
-                    node1_uri=node["uri"],
-                    node2_uri=target_uri,
-                    rel_type=rel_type
-                )
-            elif direction == -1:
-                self.repo.create_arc(
-                    node1_uri=target_uri,
-                    node2_uri=node["uri"],
-                    rel_type=rel_type
-                )
-
+        rows = self.repo.run_custom_query(CREATE_OBJECT_QUERY,
+                                          {"class_uri": class_uri, "props": props, "relations": resolved})
+        if not rows:
+            raise ValueError(f"Class '{class_uri}' not found")
+
+        node = rows[0]["o"]
+        node["uri"] = node["properties"].get("uri", "")
+        missing = set(rows[0]["missing"] or ())
+        for rel in resolved:
+            if rel["target_uri"] in missing:
+                unresolved.append({"rel_uri": rel["rel_uri"], "target_uri": rel["target_uri"],
+                                   "direction": rel["direction"], "reason": "target not found"})
+        node["unresolved_relations"] = unresolved
         return node
 
+    @transactional(write=True)
     def update_object(self, object_uri: str, properties: dict):
         # Получаем класс объекта
-        q = f"""
-        MATCH (o:Object {{uri:$uri}})-[:{TYPE_REL}]->(c:Class)
-        RETURN c.uri AS class_uri
-        """
-        result = self.repo.run_custom_query(q, {"uri": object_uri})
+        result = self.repo.run_custom_query(OBJECT_CLASS_URI_QUERY, {"uri": object_uri},
+                                            projection=PROJECTION_SCALAR)
 
         if not result:
             raise ValueError(f"Object {object_uri} not found or has no class")
 
-        class_uri = result[0]["class_uri"]
-        signature = self.collect_signature(class_uri)
-
-        # Валидируем свойства
-        validated_props = self._validate_properties(properties, signature)
-
+        validated_props = self._signature(result[0]).validate(properties)
         return self.repo.update_node(object_uri, validated_props, merge=True)
 
-    def _validate_properties(self, properties: dict, signature: dict) -> dict:
-        """
-        Валидирует свойства объекта на основе сигнатуры класса.
-        Возвращает только разрешенные свойства.
-        """
-        validated_props = {}
-
-        # Разрешенные datatype properties
-        allowed_dp = {dp.get("title") for dp in signature.get("datatype_properties", []) if dp.get("title")}
-
-        # Разрешенные object properties (только имена свойств)
-        allowed_op = {op.get("title") for op in signature.get("object_properties", []) if op.get("title")}
-
-        # Служебные свойства, которые всегда разрешены
-        system_props = {"uri", "title", "description"}
-
-        all_allowed_props = allowed_dp | allowed_op | system_props
-
-        # Фильтруем свойства
-        for prop_name, prop_value in properties.items():
-            if prop_name in all_allowed_props:
-                validated_props[prop_name] = prop_value
-            else:
-                print(f"Warning: Property '{prop_name}' is not allowed for this class")
-
-        return validated_props
-
-
     # ---------- Signature ----------
+    @transactional()
     def collect_signature(self, class_uri: str) -> dict:
         """
-        Возвращает сигнатуру класса в виде словаря, готового к JSON:
+        Возвращает сигнатуру класса (включая свойства, унаследованные от предков)
+        в виде словаря, готового к JSON:
         {
-            "datatype_properties": [{"id": ..., "title": ..., "description": ...}, ...],
+            "datatype_properties": [{"id": ..., "title": ..., "description": ..., "owner": ...}, ...],
             "object_properties": [{"id": ..., "title": ..., "description": ..., "range": {...}}, ...]
         }
         """
-        signature = {"datatype_properties": [], "object_properties": []}
+        return self._signature(class_uri).as_dict()
 
-        # ---------- DatatypeProperties ----------
+    def schema_changed(self):
+        """
+        Увеличивает поколение схемы в базе и сбрасывает кэш сигнатур этого процесса.
+        Остальные процессы увидят новое поколение при следующем чтении сигнатуры.
+        """
+        self.repo.run_custom_query(BUMP_SCHEMA_GENERATION_QUERY)
+        self.signatures.invalidate()
 
-        q_dp = """
-        MATCH (c:Class {uri:$uri})
-        OPTIONAL MATCH (dp:DatatypeProperty)-[:DOMAIN]->(c)
-        RETURN collect(dp) AS dps
+    def _signature(self, class_uri: str) -> CompiledSignature:
         """
-        rdp = self.repo.run_custom_query(q_dp, {"uri": class_uri})
-        print(rdp)
-        dps = rdp[0]["dps"] if rdp else []
-        for dp in dps:
-            if not dp:
-                continue
-            props = dict(dp)
-            signature["datatype_properties"].append({
-                "id": props.get("uri"),
-                "title": props.get("title"),
-                "description": props.get("description"),
-                **props
-            })
-
-        # ---------- ObjectProperties ----------
-        q_op = f"""
-        MATCH (c:Class {{uri:$uri}})
-        OPTIONAL MATCH (op:ObjectProperty)-[:{DOMAIN_REL}]->(c)
-        OPTIONAL MATCH (op)-[:{RANGE_REL}]->(range:Class)
-        RETURN collect(op) AS ops, collect(range) AS ranges
+        Скомпилированная сигнатура из кэша, если поколение схемы, прочитанное
+        в текущей транзакции, совпадает с поколением кэша; иначе — один запрос
+        в той же транзакции. Для несуществующего класса — пустая сигнатура (не кэшируется).
         """
-        rop = self.repo.run_custom_query(q_op, {"uri": class_uri})
-        if rop:
-            ops = rop[0]["ops"]
-            ranges = rop[0]["ranges"]
-            for i, op in enumerate(ops):
-                if not op:
-                    continue
-                op_props = dict(op)
-                range_node = ranges[i] if i < len(ranges) else None
-                range_props = dict(range_node) if range_node else None
-                signature["object_properties"].append({
-                    "id": op_props.get("uri"),
-                    "title": op_props.get("title"),
-                    "description": op_props.get("description"),
-                    **op_props,
-                    "range": {
-                        "id": range_props.get("uri"),
-                        "title": range_props.get("title"),
-                        "description": range_props.get("description"),
-                        **(range_props or {})
-                    } if range_props else None
-                })
-
-        return signature
+        generation = self._count(SCHEMA_GENERATION_QUERY, {})
+        compiled = self.signatures.get(class_uri, lambda: self._load_signature(class_uri), generation)
+        return compiled or compile_signature(class_uri, [])
+
+    def _load_signature(self, class_uri: str) -> Optional[CompiledSignature]:
+        rows = self.repo.run_custom_query(SIGNATURE_INHERITED_QUERY, {"uri": class_uri},
+                                          projection=PROJECTION_PROPERTIES)
+        return compile_signature(class_uri, rows) if rows else None
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
-from neo4j import GraphDatabase, basic_auth
+from neo4j import GraphDatabase, basic_auth, unit_of_work
+from neo4j.exceptions import ConstraintError
 from neo4j.graph import Node, Relationship
 from typing import List, Dict, Any, Optional
 import secrets
@@ -7,25 +8,115 @@ import os
 from dotenv import load_dotenv
 from pprint import pprint
 
+from .instrumentation import instrumented
+from .schema import DERIVED_REL_TYPES, ONTOLOGY_LABEL, SCHEMA_META_LABEL
+
 # Загружаем переменные окружения из .env
 load_dotenv()
 
 NEO4J_URI = os.getenv("NEO4J_URI")
 NEO4J_USER = os.getenv("NEO4J_USER")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+# Таймаут одной транзакции (сек.) и общее время повторов при транзиентных ошибках
+NEO4J_TX_TIMEOUT = float(os.getenv("NEO4J_TX_TIMEOUT", "30"))
+NEO4J_MAX_RETRY_TIME = float(os.getenv("NEO4J_MAX_RETRY_TIME", "15"))
+NODES_PAGE_SIZE = 500
+
+# Формы результата run_custom_query / iter_custom_query:
+#   records    — словарь на запись, узлы и рёбра в обёртках {_type, id, properties, ...}
+#   properties — словарь на запись, узлы и рёбра заменены словарями их свойств
+#   scalar     — только значение первого столбца (узел — в обёртке, как в records)
+PROJECTION_RECORDS = "records"
+PROJECTION_PROPERTIES = "properties"
+PROJECTION_SCALAR = "scalar"
+
+# Узел и его исходящие рёбра одной строкой; подзапрос выполняется на каждый узел,
+# так что результат отдаётся потоком, без агрегации по всему графу.
+# Служебные рёбра (замыкание иерархии) и узел поколений схемы в выгрузку не попадают.
+_DERIVED_TYPES = ", ".join(f"'{t}'" for t in DERIVED_REL_TYPES)
+
+NODES_WITH_ARCS_QUERY = f"""
+MATCH (n)
+WHERE NOT n:{SCHEMA_META_LABEL}
+CALL {{
+    WITH n
+    OPTIONAL MATCH (n)-[r]->()
+    WHERE NOT type(r) IN [{_DERIVED_TYPES}]
+    RETURN collect(r) AS arcs
+}}
+RETURN n, arcs
+"""
+
+NODES_WITH_ARCS_PAGE_QUERY = f"""
+MATCH (n)
+WHERE ($after IS NULL OR elementId(n) > $after) AND NOT n:{SCHEMA_META_LABEL}
+WITH n ORDER BY elementId(n) LIMIT $limit
+CALL {{
+    WITH n
+    OPTIONAL MATCH (n)-[r]->()
+    WHERE NOT type(r) IN [{_DERIVED_TYPES}]
+    RETURN collect(r) AS arcs
+}}
+RETURN n, arcs
+"""
+
 TNode = Dict[str, Any]
 TArc = Dict[str, Any]
 
+
+class DuplicateUriError(ValueError):
+    """Узел с таким uri уже есть (нарушено ограничение уникальности uri)."""
+
+
 class Neo4jRepository:
+    # True только у репозитория, привязанного к открытой транзакции
+    in_transaction = False
+
     def __init__(self,
                  uri=NEO4J_URI,
                  user=NEO4J_USER,
-                 password=NEO4J_PASSWORD):
-        self.driver = GraphDatabase.driver(uri, auth=basic_auth(user, password))
+                 password=NEO4J_PASSWORD,
+                 tx_timeout=NEO4J_TX_TIMEOUT):
+        self.driver = GraphDatabase.driver(
+            uri,
+            auth=basic_auth(user, password),
+            max_transaction_retry_time=NEO4J_MAX_RETRY_TIME
+        )
+        self.tx_timeout = tx_timeout
 
     def close(self):
         self.driver.close()
 
+    # ---------- unit of work ----------
+    def read(self, work, timeout: Optional[float] = None):
+        """
+        Выполняет work(uow) в одной управляемой read-транзакции.
+        uow — репозиторий с теми же методами, но привязанный к транзакции.
+        При транзиентных ошибках драйвер повторяет work целиком,
+        поэтому work не должен иметь побочных эффектов вне базы.
+        """
+        return self._execute(work, write=False, timeout=timeout)
+
+    def write(self, work, timeout: Optional[float] = None):
+        """
+        Выполняет work(uow) в одной управляемой write-транзакции:
+        либо применяются все изменения, либо ни одного.
+        """
+        return self._execute(work, write=True, timeout=timeout)
+
+    def _execute(self, work, write: bool, timeout: Optional[float]):
+        @unit_of_work(timeout=timeout or self.tx_timeout)
+        def tx_function(tx):
+            return work(TransactionRepository(self, tx))
+
+        try:
+            with self.driver.session() as s:
+                if write:
+                    return s.execute_write(tx_function)
+                return s.execute_read(tx_function)
+        except ConstraintError as exc:
+            raise DuplicateUriError(exc.message) from exc
+
     @staticmethod
     def generate_random_string(length: int = 12) -> str:
         alphabet = string.ascii_letters + string.digits
@@ -36,33 +127,48 @@ class Neo4jRepository:
         """
         Возвращает все узлы.
         """
-        query = "MATCH (n) RETURN n"
+        query = f"MATCH (n) WHERE NOT n:{SCHEMA_META_LABEL} RETURN n"
         return self.run_custom_query(query)
 
     def get_all_nodes_and_arcs(self) -> List[Dict[str, Any]]:
         """
         Возвращает все узлы и их исходящие рёбра.
         """
-        out = []
-        with self.driver.session() as s:
-            # Узлы
-            res_nodes = s.run("MATCH (n) RETURN n")
-            nodes_map = {}
-            for r in res_nodes:
-                n = r["n"]
-                node = {
-                    "_type": "node",
-                    "id": getattr(n, "element_id", ""),
-                    "properties": dict(n),
-                    "arcs": []
-                }
-                nodes_map[node["id"]] = node
+        return list(self.iter_nodes_and_arcs())
+
+    def iter_nodes_and_arcs(self, after: Optional[str] = None, limit: Optional[int] = None):
+        """
+        Лениво отдаёт узлы вместе с исходящими рёбрами по мере чтения из драйвера:
+        рёбра собираются подзапросом на каждый узел, поэтому весь граф
+        в памяти не материализуется.
+        С limit — страница в порядке elementId, начиная после after (keyset).
+        """
+        if limit is None and after is None:
+            query = NODES_WITH_ARCS_QUERY
+            parameters = {}
+        else:
+            query = NODES_WITH_ARCS_PAGE_QUERY
+            parameters = {"after": after, "limit": limit if limit is not None else NODES_PAGE_SIZE}
+
+        for record in self._stream(query, parameters):
+            yield self._serialize_node_with_arcs(record["n"], record["arcs"])
+
+    def get_nodes_and_arcs_page(self, after: Optional[str] = None, limit: int = 500) -> Dict[str, Any]:
+        """
+        Страница узлов с рёбрами и курсор следующей страницы (None — страниц больше нет).
+        """
+        items = list(self.iter_nodes_and_arcs(after=after, limit=limit))
+        next_cursor = items[-1]["id"] if len(items) == limit else None
+        return {"items": items, "next": next_cursor}
 
-            # Рёбра
-            res_arcs = s.run("MATCH (a)-[r]->(b) RETURN a, r, b")
-            for r in res_arcs:
-                rel = r["r"]
-                arc = {
+    @staticmethod
+    def _serialize_node_with_arcs(n, arcs) -> Dict[str, Any]:
+        return {
+            "_type": "node",
+            "id": getattr(n, "element_id", ""),
+            "properties": dict(n),
+            "arcs": [
+                {
                     "_type": "rel",
                     "id": getattr(rel, "element_id", ""),
                     "type": getattr(rel, "type", ""),
@@ -70,12 +176,9 @@ class Neo4jRepository:
                     "start": getattr(rel.start_node, "element_id", ""),
                     "end": getattr(rel.end_node, "element_id", "")
                 }
-                start_id = arc["start"]
-                if start_id in nodes_map:
-                    nodes_map[start_id]["arcs"].append(arc)
-
-            out = list(nodes_map.values())
-        return out
+                for rel in arcs
+            ]
+        }
 
     def get_nodes_by_labels(self, labels: List[str]) -> List[Dict[str, Any]]:
         if not labels:
@@ -85,23 +188,21 @@ class Neo4jRepository:
         return self.run_custom_query(query)
 
     def get_node_by_uri(self, uri: str) -> Optional[Dict[str, Any]]:
-        query = "MATCH (n {uri: $uri}) RETURN n LIMIT 1"
-        rows = self.run_custom_query(query, {"uri": uri})
-        return rows[0]["n"] if rows else None
+        query = f"MATCH (n:{ONTOLOGY_LABEL} {{uri: $uri}}) RETURN n LIMIT 1"
+        rows = self.run_custom_query(query, {"uri": uri}, projection=PROJECTION_SCALAR)
+        return rows[0] if rows else None
 
     def create_node(self, params: Dict[str, Any], labels: Optional[List[str]] = None) -> Dict[str, Any]:
         props = dict(params)
         if "uri" not in props or not props["uri"]:
             props["uri"] = self.generate_random_string(12)
 
-        label_str = ""
-        if labels:
-            label_str = ":" + ":".join([lbl.replace(":", "") for lbl in labels])
+        # общая метка нужна, чтобы поиск по uri шёл через индекс ограничения уникальности
+        labels = [ONTOLOGY_LABEL] + [lbl for lbl in (labels or []) if lbl != ONTOLOGY_LABEL]
+        label_str = ":" + ":".join([lbl.replace(":", "") for lbl in labels])
 
         query = f"CREATE (n{label_str} $props) RETURN n"
-        rows = self.run_custom_query(query, {"props": props})
-
-        node = rows[0]["n"]
+        node = self.run_custom_query(query, {"props": props}, projection=PROJECTION_SCALAR)[0]
         # прокинем uri наружу для удобства
         node["uri"] = node["properties"].get("uri", "")
 
@@ -114,20 +215,21 @@ class Neo4jRepository:
                    rel_props: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
         rel_props = rel_props or {}
         query = f"""
-            MATCH (a {{uri: $u1}}), (b {{uri: $u2}})
+            MATCH (a:{ONTOLOGY_LABEL} {{uri: $u1}}), (b:{ONTOLOGY_LABEL} {{uri: $u2}})
             CREATE (a)-[r:{rel_type} $rprops]->(b)
             RETURN r
         """
-        rows = self.run_custom_query(query, {"u1": node1_uri, "u2": node2_uri, "rprops": rel_props})
-        return rows[0]["r"] if rows else None
+        rows = self.run_custom_query(query, {"u1": node1_uri, "u2": node2_uri, "rprops": rel_props},
+                                     projection=PROJECTION_SCALAR)
+        return rows[0] if rows else None
 
     def delete_node_by_uri(self, uri: str, detach: bool = True) -> int:
         if detach:
-            query = "MATCH (n {uri: $uri}) DETACH DELETE n RETURN count(n) AS cnt"
+            query = f"MATCH (n:{ONTOLOGY_LABEL} {{uri: $uri}}) DETACH DELETE n RETURN count(n) AS cnt"
         else:
-            query = "MATCH (n {uri: $uri}) DELETE n RETURN count(n) AS cnt"
-        rows = self.run_custom_query(query, {"uri": uri})
-        return int(rows[0]["cnt"]) if rows else 0
+            query = f"MATCH (n:{ONTOLOGY_LABEL} {{uri: $uri}}) DELETE n RETURN count(n) AS cnt"
+        rows = self.run_custom_query(query, {"uri": uri}, projection=PROJECTION_SCALAR)
+        return int(rows[0]) if rows else 0
 
     def delete_arc_by_id(self, arc_element_id: str) -> bool:
         query = "MATCH ()-[r]-() WHERE elementId(r) = $rid DELETE r RETURN count(r) AS cnt"
@@ -136,44 +238,110 @@ class Neo4jRepository:
 
     def update_node(self, uri: str, properties: Dict[str, Any], merge: bool = False) -> Optional[Dict[str, Any]]:
         if merge:
-            query = "MATCH (n {uri: $uri}) SET n += $properties RETURN n"
+            query = f"MATCH (n:{ONTOLOGY_LABEL} {{uri: $uri}}) SET n += $properties RETURN n"
         else:
-            query = "MATCH (n {uri: $uri}) SET n = $properties RETURN n"
-        rows = self.run_custom_query(query, {"uri": uri, "properties": properties})
-        return rows[0]["n"] if rows else None
+            query = f"MATCH (n:{ONTOLOGY_LABEL} {{uri: $uri}}) SET n = $properties RETURN n"
+        rows = self.run_custom_query(query, {"uri": uri, "properties": properties}, projection=PROJECTION_SCALAR)
+        return rows[0] if rows else None
 
-    def run_custom_query(self, query: str, parameters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    def run_custom_query(self,
+                         query: str,
+                         parameters: Dict[str, Any] = None,
+                         projection: str = PROJECTION_RECORDS) -> List[Any]:
         """
         Выполняет произвольный Cypher-запрос. Узлы и рёбра сериализуются автоматически.
+        projection — форма строк результата (см. PROJECTION_*).
+        """
+        return list(self.iter_custom_query(query, parameters, projection))
+
+    def iter_custom_query(self,
+                          query: str,
+                          parameters: Dict[str, Any] = None,
+                          projection: str = PROJECTION_RECORDS):
         """
-        parameters = parameters or {}
-        with self.driver.session() as s:
-            res = s.run(query, **parameters)
-            out = []
-            for record in res:
-                rec = {}
-                for k in record.keys():
-                    v = record[k]
-                    if isinstance(v, Node):
-                        rec[k] = {
-                            "_type": "node",
-                            "id": getattr(v, "element_id", ""),
-                            "properties": dict(v)
-                        }
-                        continue
-                    if isinstance(v, Relationship):
-                        rec[k] = {
-                            "_type": "rel",
-                            "id": getattr(v, "element_id", ""),
-                            "type": getattr(v, "type", ""),
-                            "properties": dict(v),
-                            "start": getattr(v.start_node, "element_id", ""),
-                            "end": getattr(v.end_node, "element_id", "")
-                        }
-                        continue
-                    rec[k] = v
-                out.append(rec)
-            return out
+        Как run_custom_query, но отдаёт строки лениво, пока открыта сессия:
+        список результатов целиком не строится.
+        """
+        convert = self._projector(projection)
+        for record in self._stream(query, parameters):
+            yield convert(record)
+
+    def _stream(self, query: str, parameters: Dict[str, Any] = None):
+        """
+        Отдаёт сырые записи драйвера по мере чтения; сессия открыта,
+        пока генератор не исчерпан или не закрыт. Время и сводка
+        выполнения попадают в статистику запросов (instrumentation).
+        """
+        try:
+            with self.driver.session() as s:
+                yield from instrumented(s.run, query, parameters, driver=self.driver)
+        except ConstraintError as exc:
+            raise DuplicateUriError(exc.message) from exc
+
+    @classmethod
+    def _projector(cls, projection: str):
+        if projection == PROJECTION_RECORDS:
+            return cls._serialize_record
+        if projection == PROJECTION_PROPERTIES:
+            return lambda record: {k: cls._plain_value(v) for k, v in record.items()}
+        if projection == PROJECTION_SCALAR:
+            return lambda record: cls._serialize_value(record[0])
+        raise ValueError(f"Unknown projection '{projection}'")
+
+    @staticmethod
+    def _plain_value(v):
+        if isinstance(v, (Node, Relationship)):
+            return dict(v)
+        return v
+
+    @staticmethod
+    def _serialize_value(v):
+        if isinstance(v, Node):
+            return {
+                "_type": "node",
+                "id": getattr(v, "element_id", ""),
+                "properties": dict(v)
+            }
+        if isinstance(v, Relationship):
+            return {
+                "_type": "rel",
+                "id": getattr(v, "element_id", ""),
+                "type": getattr(v, "type", ""),
+                "properties": dict(v),
+                "start": getattr(v.start_node, "element_id", ""),
+                "end": getattr(v.end_node, "element_id", "")
+            }
+        return v
+
+    @classmethod
+    def _serialize_record(cls, record) -> Dict[str, Any]:
+        return {k: cls._serialize_value(record[k]) for k in record.keys()}
+
+
+class TransactionRepository(Neo4jRepository):
+    """
+    Репозиторий, привязанный к управляемой транзакции (см. Neo4jRepository.read/write).
+    Все методы выполняются в этой транзакции; вложенные read/write
+    не открывают новую, а работают в текущей.
+    """
+    in_transaction = True
+
+    def __init__(self, parent: Neo4jRepository, tx):
+        self.driver = parent.driver
+        self.tx_timeout = parent.tx_timeout
+        self.tx = tx
+
+    def close(self):
+        pass
+
+    def read(self, work, timeout: Optional[float] = None):
+        return work(self)
+
+    def write(self, work, timeout: Optional[float] = None):
+        return work(self)
+
+    def _stream(self, query: str, parameters: Dict[str, Any] = None):
+        yield from instrumented(self.tx.run, query, parameters, driver=self.driver)
 
 # ---- Пример использования ----
 if __name__ == "__main__":
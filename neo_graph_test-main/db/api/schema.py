@@ -0,0 +1,113 @@
+from typing import Any, Dict, List
+
+# Общая метка всех узлов онтологии: по ней и uri работают все поиски репозитория
+ONTOLOGY_LABEL = "OntologyNode"
+ONTOLOGY_LABELS = ["Class", "Object", "DatatypeProperty", "ObjectProperty"]
+
+# Транзитивное замыкание SUBCLASS_OF: (потомок)-[:DESCENDANT_OF {depth}]->(предок),
+# depth — длина кратчайшего пути. Служебные рёбра, наружу не отдаются.
+DESCENDANT_REL = "DESCENDANT_OF"
+DERIVED_REL_TYPES = [DESCENDANT_REL]
+
+# Служебный узел со счётчиком поколений схемы (см. OntologyService.schema_changed);
+# в выгрузки графа не попадает
+SCHEMA_META_LABEL = "OntologyMeta"
+
+
+def _constraint_name(label: str) -> str:
+    return f"{label.lower()}_uri_unique"
+
+
+# label -> (имя ограничения, запрос создания)
+URI_CONSTRAINTS = {
+    label: (
+        _constraint_name(label),
+        f"CREATE CONSTRAINT {_constraint_name(label)} IF NOT EXISTS "
+        f"FOR (n:{label}) REQUIRE n.uri IS UNIQUE"
+    )
+    for label in [ONTOLOGY_LABEL] + ONTOLOGY_LABELS
+}
+
+# Проставляет общую метку узлам, созданным до её появления
+LABEL_BACKFILL_QUERY = f"""
+MATCH (n)
+WHERE n.uri IS NOT NULL AND NOT n:{ONTOLOGY_LABEL}
+CALL {{
+    WITH n
+    SET n:{ONTOLOGY_LABEL}
+}} IN TRANSACTIONS OF $batch_size ROWS
+RETURN count(n) AS cnt
+"""
+
+# Узлы онтологии без общей метки: поиски репозитория по uri их не видят
+_ONTOLOGY_LABELS_PREDICATE = " OR ".join(f"n:{label}" for label in ONTOLOGY_LABELS)
+
+UNLABELLED_NODES_QUERY = f"""
+MATCH (n)
+WHERE ({_ONTOLOGY_LABELS_PREDICATE}) AND n.uri IS NOT NULL AND NOT n:{ONTOLOGY_LABEL}
+RETURN count(n) AS cnt
+"""
+
+DUPLICATE_URIS_QUERY = """
+MATCH (n)
+WHERE n.uri IS NOT NULL AND $label IN labels(n)
+WITH n.uri AS uri, count(*) AS cnt
+WHERE cnt > 1
+RETURN uri, cnt
+LIMIT 20
+"""
+
+SHOW_CONSTRAINTS_QUERY = "SHOW CONSTRAINTS YIELD name RETURN collect(name) AS names"
+
+
+def existing_constraints(repo) -> List[str]:
+    rows = repo.run_custom_query(SHOW_CONSTRAINTS_QUERY)
+    return list(rows[0]["names"]) if rows else []
+
+
+def missing_constraints(repo) -> List[str]:
+    """Имена ограничений уникальности uri, которых ещё нет в базе."""
+    existing = set(existing_constraints(repo))
+    return [name for name, _ in URI_CONSTRAINTS.values() if name not in existing]
+
+
+def unlabelled_nodes(repo) -> int:
+    """Число узлов онтологии с uri, которым ещё не проставлена метка OntologyNode."""
+    rows = repo.run_custom_query(UNLABELLED_NODES_QUERY)
+    return int(rows[0]["cnt"]) if rows else 0
+
+
+def bootstrap_schema(repo, batch_size: int = 10000) -> Dict[str, Any]:
+    """
+    Готовит схему Neo4j: проставляет общую метку OntologyNode всем узлам с uri
+    и создаёт ограничения уникальности uri (они же индексы) для OntologyNode,
+    Class, Object, DatatypeProperty и ObjectProperty.
+    Метки с дублирующимися uri пропускаются и попадают в отчёт.
+    Если в графе есть иерархия классов, но нет замыкания DESCENDANT_OF,
+    замыкание строится (rebuild_closure).
+    Выполняется вне управляемых транзакций: DDL и CALL ... IN TRANSACTIONS
+    допустимы только в auto-commit запросах.
+    """
+    from .closure import closure_missing, rebuild_closure
+
+    report = {"labelled": 0, "created": [], "existing": [], "duplicates": {}, "closure": None}
+
+    rows = repo.run_custom_query(LABEL_BACKFILL_QUERY, {"batch_size": batch_size})
+    report["labelled"] = int(rows[0]["cnt"]) if rows else 0
+
+    existing = set(existing_constraints(repo))
+    for label, (name, query) in URI_CONSTRAINTS.items():
+        if name in existing:
+            report["existing"].append(name)
+            continue
+        duplicates = repo.run_custom_query(DUPLICATE_URIS_QUERY, {"label": label})
+        if duplicates:
+            report["duplicates"][label] = {row["uri"]: row["cnt"] for row in duplicates}
+            continue
+        repo.run_custom_query(query)
+        report["created"].append(name)
+
+    # после меток и ограничений: построение замыкания ищет классы по индексу
+    if closure_missing(repo):
+        report["closure"] = rebuild_closure(repo, batch_size=batch_size)
+    return report
@@ -0,0 +1,245 @@
+import datetime
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Сколько секунд скомпилированная сигнатура считается свежей. Явная
+# инвалидация действует только в своём процессе, TTL ограничивает
+# устаревание в остальных воркерах.
+SIGNATURE_CACHE_TTL = float(os.getenv("ONTOLOGY_SIGNATURE_TTL", "60"))
+
+# Служебные свойства, которые всегда разрешены
+SYSTEM_PROPERTIES = frozenset({"uri", "title", "description"})
+
+
+def _to_str(value):
+    return value if isinstance(value, str) else str(value)
+
+
+def _to_int(value):
+    if isinstance(value, bool):
+        raise ValueError("boolean is not an integer")
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(f"{value} is not an integer")
+        return int(value)
+    return int(value)
+
+
+def _to_float(value):
+    if isinstance(value, bool):
+        raise ValueError("boolean is not a number")
+    return float(value)
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in ("true", "1", "yes", "да"):
+        return True
+    if text in ("false", "0", "no", "нет"):
+        return False
+    raise ValueError(f"'{value}' is not a boolean")
+
+
+def _to_date(value):
+    return datetime.date.fromisoformat(str(value)).isoformat()
+
+
+def _to_datetime(value):
+    return datetime.datetime.fromisoformat(str(value)).isoformat()
+
+
+# Значение свойства "type" у DatatypeProperty -> приведение значения
+COERCERS: Dict[str, Callable[[Any], Any]] = {
+    "string": _to_str,
+    "str": _to_str,
+    "text": _to_str,
+    "int": _to_int,
+    "integer": _to_int,
+    "float": _to_float,
+    "number": _to_float,
+    "double": _to_float,
+    "bool": _to_bool,
+    "boolean": _to_bool,
+    "date": _to_date,
+    "datetime": _to_datetime,
+}
+
+
+def _identity(value):
+    return value
+
+
+@dataclass(frozen=True)
+class RelationSpec:
+    uri: str
+    title: Optional[str]
+    range_uri: Optional[str]
+
+
+@dataclass(frozen=True)
+class CompiledSignature:
+    """
+    Сигнатура класса с учётом наследования, собранная один раз:
+    разрешённые имена свойств, приведение типов и типы связей.
+    Свойство ближайшего класса перекрывает одноимённое свойство предка.
+    """
+    class_uri: str
+    datatype_properties: Tuple[Mapping[str, Any], ...]
+    object_properties: Tuple[Mapping[str, Any], ...]
+    allowed: frozenset
+    coercers: Mapping[str, Callable[[Any], Any]]
+    relations: Mapping[str, RelationSpec]
+    compiled_at: float = field(default_factory=time.monotonic)
+
+    def validate(self, properties: dict) -> dict:
+        """
+        Оставляет только разрешённые свойства и приводит значения к типам.
+        Неприводимое значение — ValueError; None (очистка свойства) не приводится.
+        """
+        validated = {}
+        for name, value in properties.items():
+            if name not in self.allowed:
+                logger.warning("Property '%s' is not allowed for class %s", name, self.class_uri)
+                continue
+            if value is None:
+                validated[name] = None
+                continue
+            try:
+                validated[name] = self.coercers.get(name, _identity)(value)
+            except (TypeError, ValueError) as exc:
+                raise ValueError(f"Invalid value for property '{name}': {exc}") from None
+        return validated
+
+    def as_dict(self) -> dict:
+        """Сигнатура в формате ответа collect_signature."""
+        return {
+            "datatype_properties": [dict(dp) for dp in self.datatype_properties],
+            "object_properties": [
+                {**op, "range": dict(op["range"]) if op.get("range") else None}
+                for op in self.object_properties
+            ],
+        }
+
+
+def compile_signature(class_uri: str, rows) -> CompiledSignature:
+    """
+    Собирает сигнатуру из строк SIGNATURE_INHERITED_QUERY (отсортированных
+    по глубине: сам класс, затем предки от ближних к дальним).
+    """
+    datatype, objects = {}, {}
+    for row in rows:
+        prop = row.get("property")
+        if not prop:
+            continue
+        title = prop.get("title")
+        key = title or prop.get("uri")
+        entry = {
+            "id": prop.get("uri"),
+            "title": title,
+            "description": prop.get("description"),
+            **prop,
+            "owner": row.get("owner_uri"),
+        }
+        if "ObjectProperty" in (row.get("labels") or ()):
+            # свойство уже задано более близким классом (или это второй RANGE того же свойства)
+            if key in objects:
+                continue
+            range_props = row.get("range")
+            entry["range"] = {
+                "id": range_props.get("uri"),
+                "title": range_props.get("title"),
+                "description": range_props.get("description"),
+                **range_props,
+            } if range_props else None
+            objects[key] = entry
+        elif key not in datatype:
+            datatype[key] = entry
+
+    coercers = {}
+    for name, dp in datatype.items():
+        coercer = COERCERS.get(str(dp.get("type") or "").lower())
+        if coercer is not None:
+            coercers[name] = coercer
+
+    relations = {
+        op["id"]: RelationSpec(uri=op["id"], title=op.get("title"),
+                               range_uri=op["range"]["id"] if op.get("range") else None)
+        for op in objects.values() if op.get("id")
+    }
+    return CompiledSignature(
+        class_uri=class_uri,
+        datatype_properties=tuple(MappingProxyType(dp) for dp in datatype.values()),
+        object_properties=tuple(MappingProxyType(op) for op in objects.values()),
+        allowed=frozenset(datatype) | frozenset(objects) | SYSTEM_PROPERTIES,
+        coercers=MappingProxyType(coercers),
+        relations=MappingProxyType(relations),
+    )
+
+
+class SignatureCache:
+    """
+    Кэш скомпилированных сигнатур по uri класса с TTL.
+    Изменения схемы сбрасывают кэш целиком: свойство класса
+    наследуется всеми потомками, и точечная инвалидация требовала бы
+    того же обхода иерархии, что и перекомпиляция.
+
+    Изменения из других процессов кэш узнаёт по поколению схемы, которое
+    вызывающий читает из базы: записи действительны только для поколения,
+    при котором собраны, более новое поколение сбрасывает кэш.
+    """
+
+    def __init__(self, ttl: float = SIGNATURE_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items: Dict[str, CompiledSignature] = {}
+        self._generation = 0
+        self._schema_generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self,
+            class_uri: str,
+            load: Callable[[], Optional[CompiledSignature]],
+            schema_generation: Optional[int] = None) -> Optional[CompiledSignature]:
+        with self._lock:
+            if schema_generation is not None and schema_generation > self._schema_generation:
+                # схему изменили в другом процессе
+                self._items.clear()
+                self._generation += 1
+                self._schema_generation = schema_generation
+            # транзакция, видящая более старую схему, кэшем не пользуется
+            current = schema_generation is None or schema_generation == self._schema_generation
+            compiled = self._items.get(class_uri)
+            if current and compiled is not None and time.monotonic() - compiled.compiled_at < self.ttl:
+                self.hits += 1
+                return compiled
+            self.misses += 1
+            generation = self._generation
+
+        compiled = load()
+        with self._lock:
+            # сигнатура, собранная до инвалидации, в кэш не попадает
+            if compiled is not None and current and generation == self._generation:
+                self._items[class_uri] = compiled
+        return compiled
+
+    def invalidate(self):
+        with self._lock:
+            self._items.clear()
+            self._generation += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._items), "hits": self.hits, "misses": self.misses, "ttl": self.ttl,
+                    "schema_generation": self._schema_generation}
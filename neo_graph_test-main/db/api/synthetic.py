@@ -0,0 +1,214 @@
+"""
+Генератор синтетической онтологии для нагрузочных замеров.
+
+Иерархия классов — полное дерево: branching потомков у каждого класса,
+depth уровней под корнем (depth=50, branching=1 — глубокая цепочка;
+depth=1, branching=1000 — широкий корень). У каждого класса свои
+DatatypeProperty и ObjectProperty (RANGE — случайный класс), объекты
+распределены по классам по кругу, у каждого объекта relations_per_object
+рёбер типа uri ObjectProperty своего класса к объектам класса RANGE.
+
+Граф выдаётся в формате снимка (ontology_snapshot, MemoryRepository.load_snapshot)
+генераторами, так что миллионы объектов не держатся в памяти целиком.
+Замыкание DESCENDANT_OF строится здесь же — так же, как его поддерживает
+OntologyService. Всё определяется spec.seed: повторный запуск даёт тот же граф.
+"""
+import random
+from dataclasses import dataclass
+from itertools import chain
+from typing import Any, Dict, Iterator, List
+
+from .ontology import DOMAIN_REL, RANGE_REL, SUBCLASS_REL, TYPE_REL
+from .schema import DESCENDANT_REL, ONTOLOGY_LABEL
+
+DATATYPE_TYPES = ("int", "string", "float", "bool")
+
+# Узлы и рёбра пакетами; метки и тип ребра задаются динамически (Neo4j 5.26+)
+LOAD_NODES_QUERY = """
+UNWIND $rows AS row
+CREATE (n:$(row.labels))
+SET n = row.properties
+"""
+
+LOAD_RELS_QUERY = f"""
+UNWIND $rows AS row
+MATCH (a:{ONTOLOGY_LABEL} {{uri: row.start}})
+MATCH (b:{ONTOLOGY_LABEL} {{uri: row.end}})
+CREATE (a)-[r:$(row.type)]->(b)
+SET r = row.properties
+"""
+
+
+@dataclass(frozen=True)
+class OntologySpec:
+    prefix: str = "synthetic-"
+    depth: int = 3
+    branching: int = 4
+    datatype_properties: int = 3
+    object_properties: int = 1
+    objects: int = 1000
+    relations_per_object: int = 1
+    seed: int = 0
+
+
+def _batched(items, size: int) -> Iterator[List[Any]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _node(uri: str, label: str, props: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": uri, "labels": [ONTOLOGY_LABEL, label], "properties": {"uri": uri, **props}}
+
+
+def _rel(start: str, end: str, rel_type: str, props: Dict[str, Any] = None) -> Dict[str, Any]:
+    return {"start": start, "end": end, "type": rel_type, "properties": props or {}}
+
+
+class SyntheticOntology:
+    """Граф по OntologySpec; класс k — вершина полного дерева, его родитель — (k - 1) // branching."""
+
+    def __init__(self, spec: OntologySpec):
+        if spec.depth < 0 or spec.branching < 1:
+            raise ValueError("depth must be >= 0 and branching >= 1")
+        self.spec = spec
+        self.classes = sum(spec.branching ** level for level in range(spec.depth + 1))
+        rng = random.Random(spec.seed)
+        self._ranges = [[rng.randrange(self.classes) for _ in range(spec.object_properties)]
+                        for _ in range(self.classes)]
+
+    # ---------- uri ----------
+    def class_uri(self, k: int) -> str:
+        return f"{self.spec.prefix}class-{k}"
+
+    def datatype_property_uri(self, k: int, j: int) -> str:
+        return f"{self.spec.prefix}dp-{k}-{j}"
+
+    def object_property_uri(self, k: int, j: int) -> str:
+        return f"{self.spec.prefix}op-{k}-{j}"
+
+    def object_uri(self, i: int) -> str:
+        return f"{self.spec.prefix}obj-{i}"
+
+    @property
+    def root_uri(self) -> str:
+        return self.class_uri(0)
+
+    @property
+    def leaf(self) -> int:
+        """Самый глубокий класс (последний в дереве)."""
+        return self.classes - 1
+
+    def parent(self, k: int):
+        return (k - 1) // self.spec.branching if k else None
+
+    def ancestors(self, k: int) -> List[int]:
+        """Предки класса от ближнего к корню."""
+        result = []
+        while k:
+            k = (k - 1) // self.spec.branching
+            result.append(k)
+        return result
+
+    def class_of(self, i: int) -> int:
+        return i % self.classes
+
+    def objects_in_class(self, k: int) -> int:
+        return max(0, (self.spec.objects - k + self.classes - 1) // self.classes)
+
+    # ---------- содержимое ----------
+    def object_properties(self, i: int) -> Dict[str, Any]:
+        """Свойства объекта i: значения всех DatatypeProperty его класса (без предков)."""
+        k = self.class_of(i)
+        props = {"uri": self.object_uri(i), "title": f"object {i}"}
+        for j in range(self.spec.datatype_properties):
+            kind = DATATYPE_TYPES[j % len(DATATYPE_TYPES)]
+            value = {"int": i, "string": f"value {i}", "float": i / 2, "bool": i % 2 == 0}[kind]
+            props[f"attr_{k}_{j}"] = value
+        return props
+
+    def object_relations(self, i: int, rng: random.Random) -> List[Dict[str, Any]]:
+        """Связи объекта i в формате OntologyService.create_object."""
+        spec, k = self.spec, self.class_of(i)
+        relations = []
+        if not spec.object_properties:
+            return relations
+        for n in range(spec.relations_per_object):
+            j = n % spec.object_properties
+            target_class = self._ranges[k][j]
+            count = self.objects_in_class(target_class)
+            if count:
+                target = target_class + self.classes * rng.randrange(count)
+                relations.append({"rel_uri": self.object_property_uri(k, j),
+                                  "target_uri": self.object_uri(target), "direction": 1})
+        return relations
+
+    def schema_nodes(self) -> Iterator[Dict[str, Any]]:
+        spec = self.spec
+        for k in range(self.classes):
+            yield _node(self.class_uri(k), "Class", {"title": f"class {k}", "description": ""})
+            for j in range(spec.datatype_properties):
+                yield _node(self.datatype_property_uri(k, j), "DatatypeProperty",
+                            {"title": f"attr_{k}_{j}", "type": DATATYPE_TYPES[j % len(DATATYPE_TYPES)]})
+            for j in range(spec.object_properties):
+                yield _node(self.object_property_uri(k, j), "ObjectProperty", {"title": f"rel_{k}_{j}"})
+
+    def schema_rels(self) -> Iterator[Dict[str, Any]]:
+        spec = self.spec
+        for k in range(self.classes):
+            uri = self.class_uri(k)
+            if k:
+                yield _rel(uri, self.class_uri(self.parent(k)), SUBCLASS_REL)
+            for depth, ancestor in enumerate(self.ancestors(k), start=1):
+                yield _rel(uri, self.class_uri(ancestor), DESCENDANT_REL, {"depth": depth})
+            for j in range(spec.datatype_properties):
+                yield _rel(self.datatype_property_uri(k, j), uri, DOMAIN_REL)
+            for j in range(spec.object_properties):
+                op_uri = self.object_property_uri(k, j)
+                yield _rel(op_uri, uri, DOMAIN_REL)
+                yield _rel(op_uri, self.class_uri(self._ranges[k][j]), RANGE_REL)
+
+    def object_nodes(self, start: int = 0, end: int = None) -> Iterator[Dict[str, Any]]:
+        for i in range(start, self.spec.objects if end is None else end):
+            uri = self.object_uri(i)
+            yield {"id": uri, "labels": [ONTOLOGY_LABEL, "Object"], "properties": self.object_properties(i)}
+
+    def object_rels(self, start: int = 0, end: int = None) -> Iterator[Dict[str, Any]]:
+        end = self.spec.objects if end is None else end
+        # своё зерно на каждый диапазон: один и тот же диапазон всегда даёт те же рёбра
+        rng = random.Random(self.spec.seed * 1_000_003 + start)
+        for i in range(start, end):
+            uri = self.object_uri(i)
+            yield _rel(uri, self.class_uri(self.class_of(i)), TYPE_REL)
+            for rel in self.object_relations(i, rng):
+                yield _rel(uri, rel["target_uri"], rel["rel_uri"])
+
+    def nodes(self) -> Iterator[Dict[str, Any]]:
+        return chain(self.schema_nodes(), self.object_nodes())
+
+    def rels(self) -> Iterator[Dict[str, Any]]:
+        return chain(self.schema_rels(), self.object_rels())
+
+    # ---------- загрузка ----------
+    def load(self, repo, batch_size: int = 10000) -> Dict[str, int]:
+        """
+        Загружает граф в репозиторий: MemoryRepository — через load_graph,
+        Neo4j — пакетными auto-commit запросами (сначала все узлы, затем рёбра,
+        чтобы рёбра к объектам из следующих пакетов находили концы).
+        """
+        if hasattr(repo, "load_graph"):
+            return repo.load_graph(self.nodes(), self.rels())
+
+        counts = {"nodes": 0, "relationships": 0}
+        for batch in _batched(self.nodes(), batch_size):
+            repo.run_custom_query(LOAD_NODES_QUERY, {"rows": batch})
+            counts["nodes"] += len(batch)
+        for batch in _batched(self.rels(), batch_size):
+            repo.run_custom_query(LOAD_RELS_QUERY, {"rows": batch})
+            counts["relationships"] += len(batch)
+        return counts
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class DbConfig(AppConfig):
     name = 'db'
+
+    def ready(self):
+        from . import checks  # noqa: F401 — регистрирует проверку схемы Neo4j
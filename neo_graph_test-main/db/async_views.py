@@ -0,0 +1,183 @@
+"""
+Асинхронные представления онтологии, классов и объектов.
+
+Подключаются вместо синхронных из db.views при ONTOLOGY_ASYNC=1 и рассчитаны
+на ASGI-сервер (uvicorn core.asgi:application): чтения из Neo4j идут через
+асинхронный драйвер и не занимают поток на время ожидания базы.
+DRF не поддерживает async-представления, поэтому здесь обычные
+представления Django с тем же форматом ответов.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .api.async_ontology import AsyncOntologyService
+from .api.async_repository import get_async_repository
+from .api.repository import DuplicateUriError
+from .api.jobs import DeleteClassJob
+from .views import ONTOLOGY_PAGE_MAX, class_page_params, service as sync_service, submit_job, wants_job
+
+
+def _service() -> AsyncOntologyService:
+    return AsyncOntologyService(get_async_repository(), sync_service)
+
+
+def _response(data, status=200):
+    return JsonResponse(data, status=status, safe=False, json_dumps_params={"ensure_ascii": False})
+
+
+def _payload(request):
+    """Тело запроса: JSON или форма. None — тело не разобрать."""
+    if request.content_type == "application/json":
+        try:
+            return json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+    return request.POST.dict()
+
+
+# ---------- Ontology ----------
+
+@require_http_methods(["GET"])
+async def get_ontology(request):
+    """То же, что db.views.get_ontology: ?stream=1 — NDJSON, ?limit=&after= — страница."""
+    svc = _service()
+    if request.GET.get("stream") in ("1", "true", "ndjson"):
+        async def lines():
+            async for node in svc.iter_ontology():
+                yield json.dumps(node, ensure_ascii=False, default=str) + "\n"
+        return StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+
+    if "limit" in request.GET or "after" in request.GET:
+        try:
+            limit = int(request.GET.get("limit", 500))
+        except ValueError:
+            return _response({"error": "limit must be an integer"}, status=400)
+        limit = max(1, min(limit, ONTOLOGY_PAGE_MAX))
+        return _response(await svc.get_ontology_page(after=request.GET.get("after") or None, limit=limit))
+
+    return _response(await svc.get_ontology())
+
+
+@require_http_methods(["GET"])
+async def get_ontology_parents(request):
+    return _response(await _service().get_ontology_parent_classes())
+
+
+# ---------- Class ----------
+
+@require_http_methods(["GET"])
+async def get_class(request, uri: str):
+    data = await _service().get_class(uri)
+    return _response(data if data else {})
+
+
+@require_http_methods(["GET"])
+async def get_class_parents(request, uri: str):
+    return _response(await _service().get_class_parents(uri))
+
+
+@require_http_methods(["GET"])
+async def get_class_children(request, uri: str):
+    """То же, что db.views.get_class_children: ?limit=&after=&include_subclasses= — страница."""
+    try:
+        page = class_page_params(request.GET, include_subclasses=True)
+    except ValueError:
+        return _response({"error": "limit must be an integer"}, status=400)
+    if page is not None:
+        return _response(await _service().get_class_children_page(uri, **page))
+    return _response(await _service().get_class_children(uri))
+
+
+@require_http_methods(["GET"])
+async def get_class_objects(request, uri: str):
+    """То же, что db.views.get_class_objects: ?limit=&after=&include_subclasses= — страница."""
+    try:
+        page = class_page_params(request.GET, include_subclasses=False)
+    except ValueError:
+        return _response({"error": "limit must be an integer"}, status=400)
+    if page is not None:
+        return _response(await _service().get_class_objects_page(uri, **page))
+    return _response(await _service().get_class_objects(uri))
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def create_class(request):
+    data = _payload(request)
+    if data is None:
+        return _response({"error": "invalid JSON"}, status=400)
+    try:
+        node = await _service().create_class(
+            data.get("title"), data.get("description", ""), data.get("uri"), data.get("parent_uri")
+        )
+    except DuplicateUriError as exc:
+        return _response({"error": str(exc)}, status=409)
+    except ValueError as exc:
+        return _response({"error": str(exc)}, status=400)
+    return _response(node, status=201)
+
+
+@csrf_exempt
+@require_http_methods(["PUT"])
+async def update_class(request, uri: str):
+    data = _payload(request)
+    if data is None:
+        return _response({"error": "invalid JSON"}, status=400)
+    return _response(await _service().update_class(uri, data.get("title"), data.get("description")))
+
+
+@csrf_exempt
+@require_http_methods(["DELETE"])
+async def delete_class(request, uri: str):
+    if wants_job(request):
+        body, code = await sync_to_async(submit_job)(DeleteClassJob.kind, {"class_uri": uri})
+        return _response(body, status=code)
+    return _response(await _service().delete_class(uri))
+
+
+# ---------- Object ----------
+
+@require_http_methods(["GET"])
+async def get_object(request, uri: str):
+    return _response(await _service().get_object(uri))
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def create_object(request):
+    data = _payload(request)
+    if data is None:
+        return _response({"error": "invalid JSON"}, status=400)
+    class_uri = data.get("class_uri")
+    if not class_uri:
+        return _response({"error": "class_uri is required"}, status=400)
+    try:
+        node = await _service().create_object(class_uri, data.get("properties", {}), data.get("relations", {}))
+    except DuplicateUriError as exc:
+        return _response({"error": str(exc)}, status=409)
+    except ValueError as exc:
+        return _response({"error": str(exc)}, status=400)
+    return _response(node, status=201)
+
+
+@csrf_exempt
+@require_http_methods(["PUT"])
+async def update_object(request, uri: str):
+    data = _payload(request)
+    if data is None:
+        return _response({"error": "invalid JSON"}, status=400)
+    try:
+        node = await _service().update_object(uri, data.get("properties", {}))
+    except ValueError as exc:
+        return _response({"error": str(exc)}, status=400)
+    return _response(node)
+
+
+@csrf_exempt
+@require_http_methods(["DELETE"])
+async def delete_object(request, uri: str):
+    return _response({"deleted": await _service().delete_object(uri)})
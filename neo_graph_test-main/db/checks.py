@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+
+@register("neo4j")
+def check_neo4j_schema(app_configs=None, **kwargs):
+    """
+    Предупреждает, если в Neo4j нет ограничений уникальности uri:
+    без них поиск узла по uri — полный проход по графу.
+    Узлы онтологии без метки OntologyNode — ошибка: репозиторий ищет
+    только по этой метке, и такие узлы для него не существуют.
+    Иерархия классов без замыкания DESCENDANT_OF — тоже ошибка: у всех
+    классов не находятся потомки, а delete_class оставляет сирот.
+    """
+    if not getattr(settings, "NEO4J_SCHEMA_CHECK", True) or settings.ONTOLOGY_BACKEND != "neo4j":
+        return []
+
+    from .api.closure import closure_missing
+    from .api.repository import Neo4jRepository
+    from .api.schema import missing_constraints, unlabelled_nodes
+
+    try:
+        repo = Neo4jRepository()
+        try:
+            missing = missing_constraints(repo)
+            unlabelled = unlabelled_nodes(repo)
+            no_closure = closure_missing(repo)
+        finally:
+            repo.close()
+    except Exception as exc:
+        return [Warning(
+            f"Cannot check Neo4j schema: {exc}",
+            hint="Set NEO4J_SCHEMA_CHECK=0 to skip this check.",
+            id="db.W001",
+        )]
+
+    messages = []
+    if unlabelled:
+        messages.append(Error(
+            f"{unlabelled} ontology nodes in Neo4j have no OntologyNode label and are invisible to lookups by uri",
+            hint="Run manage.py bootstrap_schema.",
+            id="db.E001",
+        ))
+    if no_closure:
+        messages.append(Error(
+            "Neo4j has SUBCLASS_OF edges but no DESCENDANT_OF closure: subclasses are not found",
+            hint="Run manage.py bootstrap_schema.",
+            id="db.E002",
+        ))
+    if missing:
+        messages.append(Warning(
+            f"Neo4j uri uniqueness constraints are missing: {', '.join(missing)}",
+            hint="Run manage.py bootstrap_schema.",
+            id="db.W002",
+        ))
+    return messages
@@ -1,5 +1,29 @@
-from .models import Corpus, Text
+import datetime
+import logging
+
+from .models import Corpus, Text, TextEmbedding, ChunkEmbedding, OntologyJob
+from .embeddings import (
+    MODEL_NAME,
+    DOCUMENT_POOLING,
+    POOLING_TRUNCATE,
+    POOLING_MAX,
+    content_hash,
+    embed_document,
+    get_embeddings,
+    iter_batches,
+    iter_chunks,
+)
+import numpy as np
+from .quantization import quantize, dequantize
+from .ann_index import get_ann_index
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
 
 
 class CorpusDAO:
@@ -24,7 +48,10 @@ class CorpusDAO:
     @staticmethod
     def delete_corpus(corpus_id):
         corpus = get_object_or_404(Corpus, id=corpus_id)
+        chunk_ids = list(ChunkEmbedding.objects.filter(text__corpus=corpus).values_list("id", flat=True))
         corpus.delete()
+        # фрагменты текстов корпуса удаляются каскадно — помечаем их в ANN-индексе, как в delete_text
+        get_ann_index().remove(chunk_ids)
         return True
 
 
@@ -33,17 +60,20 @@ class TextDAO:
 
     @staticmethod
     def create_text(name, content, corpus, description=None, has_translation=None):
-        return Text.objects.create(
+        text = Text.objects.create(
             name=name,
             description=description,
             content=content,
             corpus=corpus,
             has_translation=has_translation
         )
+        TextDAO._refresh_embedding(text)
+        return text
 
     @staticmethod
     def update_text(text_id, **kwargs):
         text = get_object_or_404(Text, id=text_id)
+        old_content = text.content
 
         # если передан corpus_id — ищем объект корпуса
         corpus_id = kwargs.pop("corpus_id", None)
@@ -56,8 +86,21 @@ class TextDAO:
             setattr(text, field, value)
 
         text.save()
+
+        # эмбеддинг пересчитываем только если изменилось содержимое
+        if text.content != old_content:
+            TextDAO._refresh_embedding(text)
         return text
 
+    @staticmethod
+    def _refresh_embedding(text):
+        # текст уже сохранён: сбой модели не превращает ответ в 500,
+        # эмбеддинг досчитает get_vectors при первом обращении (или embed_corpus)
+        try:
+            TextEmbeddingDAO.refresh(text)
+        except Exception:
+            logger.exception("Cannot compute embedding for text %s; it will be computed on first use", text.id)
+
 
     @staticmethod
     def get_text(text_id):
@@ -66,5 +109,289 @@ class TextDAO:
     @staticmethod
     def delete_text(text_id):
         text = get_object_or_404(Text, id=text_id)
+        chunk_ids = list(text.chunk_embeddings.values_list("id", flat=True))
         text.delete()
+        # фрагменты удалённого текста помечаются в ANN-индексе
+        get_ann_index().remove(chunk_ids)
+        return True
+
+
+class TextEmbeddingDAO:
+    """DAO для работы с таблицей TextEmbedding (эмбеддинги текстов по хэшу содержимого)"""
+
+    @staticmethod
+    def refresh(text, model_name=MODEL_NAME, pooling=DOCUMENT_POOLING):
+        """
+        Пересчитывает эмбеддинг текста, если сохранённый отсутствует
+        или вычислен для другого содержимого.
+        """
+        digest = content_hash(text.content)
+        stored = TextEmbedding.objects.filter(text=text, model_name=model_name, pooling=pooling).first()
+        if stored is not None and stored.content_hash == digest:
+            return stored
+        return TextEmbeddingDAO._compute(text, model_name, pooling)
+
+    @staticmethod
+    def get_vectors(texts, model_name=MODEL_NAME, pooling=DOCUMENT_POOLING):
+        """
+        Возвращает {text_id: вектор} для переданных текстов.
+        Берёт сохранённые векторы; отсутствующие или устаревшие
+        вычисляет и сохраняет.
+        """
+        texts = list(texts)
+        stored = {
+            e.text_id: e
+            for e in TextEmbedding.objects.filter(text__in=texts, model_name=model_name, pooling=pooling)
+        }
+
+        vectors = {}
+        for text in texts:
+            if text.id in vectors:
+                continue
+            embedding = stored.get(text.id)
+            if embedding is None or embedding.content_hash != content_hash(text.content):
+                embedding = TextEmbeddingDAO._compute(text, model_name, pooling)
+            vectors[text.id] = dequantize(embedding.vector, embedding.dim, embedding.encoding, embedding.scale)
+        return vectors
+
+    @staticmethod
+    def _compute(text, model_name, pooling):
+        """
+        Вычисляет эмбеддинг документа и заодно сохраняет векторы его фрагментов.
+        Кодирование идёт вне транзакции (на SQLite транзакция держала бы
+        блокировку записи всё время работы модели); в транзакции — только
+        замена фрагментов и запись вектора документа. После коммита старые
+        фрагменты помечаются удалёнными в ANN-индексе, а новые добавляются в него.
+        """
+        if pooling == POOLING_TRUNCATE:
+            return TextEmbeddingDAO._save(text, model_name, pooling, *embed_document(text.content, pooling))
+
+        encoding = settings.EMBEDDING_STORAGE_ENCODING
+        chunk_vectors = []
+        chunk_rows = []
+
+        def collect_chunks(start, embeddings):
+            for i, vector in enumerate(embeddings):
+                data, scale = quantize(vector, encoding)
+                chunk_vectors.append(vector)
+                chunk_rows.append(ChunkEmbedding(
+                    text=text,
+                    model_name=model_name,
+                    chunk_index=start + i,
+                    dim=int(vector.shape[0]),
+                    vector=data,
+                    encoding=encoding,
+                    scale=scale,
+                ))
+
+        vector, chunk_count = embed_document(text.content, pooling, on_batch=collect_chunks)
+
+        with transaction.atomic():
+            old_chunks = ChunkEmbedding.objects.filter(text=text, model_name=model_name)
+            old_chunk_ids = list(old_chunks.values_list("id", flat=True))
+            old_chunks.delete()
+            created = ChunkEmbedding.objects.bulk_create(chunk_rows, batch_size=1000)
+            new_chunks = [(c.id, text.id, v) for c, v in zip(created, chunk_vectors)]
+            embedding = TextEmbeddingDAO._save(text, model_name, pooling, vector, chunk_count)
+
+            def update_index():
+                index = get_ann_index()
+                index.remove(old_chunk_ids)
+                index.add(new_chunks)
+
+            transaction.on_commit(update_index)
+        return embedding
+
+    @staticmethod
+    def stale_texts(texts, model_name=MODEL_NAME, pooling=DOCUMENT_POOLING):
+        """
+        Оставляет из texts только те, у которых нет эмбеддинга для текущего содержимого.
+        """
+        stored = dict(
+            TextEmbedding.objects.filter(text__in=texts, model_name=model_name, pooling=pooling)
+            .values_list("text_id", "content_hash")
+        )
+        return [t for t in texts if stored.get(t.id) != content_hash(t.content)]
+
+    @staticmethod
+    def bulk_compute(texts, model_name=MODEL_NAME, pooling=DOCUMENT_POOLING, batch_size=256):
+        """
+        Пакетный расчёт эмбеддингов для группы текстов: фрагменты всех текстов
+        сортируются по длине и кодируются большими батчами (меньше паддинга),
+        затем пулятся по текстам. Векторы фрагментов и документов пишутся
+        bulk-запросами в одной транзакции. Возвращает число фрагментов.
+        """
+        texts = list(texts)
+        if not texts:
+            return 0
+
+        # (номер текста, номер фрагмента, строка); пустой текст кодируется как ""
+        pieces = []
+        for i, text in enumerate(texts):
+            chunks = [text.content] if pooling == POOLING_TRUNCATE else list(iter_chunks(text.content))
+            pieces.extend((i, j, chunk) for j, chunk in enumerate(chunks or [""]))
+
+        order = sorted(range(len(pieces)), key=lambda k: len(pieces[k][2]))
+        vectors = None
+        for batch in iter_batches(order, batch_size):
+            embeddings = get_embeddings([pieces[k][2] for k in batch])
+            if vectors is None:
+                vectors = np.empty((len(pieces), embeddings.shape[1]), dtype=np.float32)
+            vectors[batch] = embeddings
+
+        rows_by_text = [[] for _ in texts]
+        for k, (i, _, _) in enumerate(pieces):
+            rows_by_text[i].append(k)
+
+        encoding = settings.EMBEDDING_STORAGE_ENCODING
+        text_rows = []
+        chunk_rows = []
+        for text, rows in zip(texts, rows_by_text):
+            block = vectors[rows]
+            if pooling == POOLING_TRUNCATE:
+                vector, chunk_count = block[0], 1
+            else:
+                vector = block.max(axis=0) if pooling == POOLING_MAX else block.mean(axis=0)
+                chunk_count = len(rows) if text.content and text.content.strip() else 0
+                for k, row in enumerate(rows[:chunk_count]):
+                    data, scale = quantize(vectors[row], encoding)
+                    chunk_rows.append(ChunkEmbedding(
+                        text=text, model_name=model_name, chunk_index=k,
+                        dim=vectors.shape[1], vector=data, encoding=encoding, scale=scale,
+                    ))
+            data, scale = quantize(vector, encoding)
+            text_rows.append(TextEmbedding(
+                text=text, model_name=model_name, pooling=pooling,
+                content_hash=content_hash(text.content), chunk_count=chunk_count,
+                dim=vectors.shape[1], vector=data, encoding=encoding, scale=scale,
+            ))
+
+        with transaction.atomic():
+            if pooling != POOLING_TRUNCATE:
+                old_chunks = ChunkEmbedding.objects.filter(text__in=texts, model_name=model_name)
+                old_chunk_ids = list(old_chunks.values_list("id", flat=True))
+                old_chunks.delete()
+                created = ChunkEmbedding.objects.bulk_create(chunk_rows, batch_size=1000)
+
+                def update_index():
+                    index = get_ann_index()
+                    index.remove(old_chunk_ids)
+                    index.add(
+                        (c.id, c.text_id, dequantize(c.vector, c.dim, c.encoding, c.scale)) for c in created
+                    )
+
+                transaction.on_commit(update_index)
+
+            TextEmbedding.objects.bulk_create(
+                text_rows,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=["text", "model_name", "pooling"],
+                update_fields=["content_hash", "chunk_count", "dim", "vector", "encoding", "scale", "updated_at"],
+            )
+        return len(chunk_rows) if pooling != POOLING_TRUNCATE else len(text_rows)
+
+    @staticmethod
+    def _save(text, model_name, pooling, vector, chunk_count):
+        data, scale = quantize(vector, settings.EMBEDDING_STORAGE_ENCODING)
+        embedding, _ = TextEmbedding.objects.update_or_create(
+            text=text,
+            model_name=model_name,
+            pooling=pooling,
+            defaults={
+                "content_hash": content_hash(text.content),
+                "chunk_count": chunk_count,
+                "dim": int(vector.shape[0]),
+                "vector": data,
+                "encoding": settings.EMBEDDING_STORAGE_ENCODING,
+                "scale": scale,
+            }
+        )
+        return embedding
+
+
+class OntologyJobDAO:
+    """DAO для очереди фоновых задач онтологии (OntologyJob)"""
+
+    @staticmethod
+    def submit(kind, params):
+        return OntologyJob.objects.create(kind=kind, params=params)
+
+    @staticmethod
+    def get_job(job_id):
+        return get_object_or_404(OntologyJob, id=job_id)
+
+    @staticmethod
+    def claim_next(worker, stale_after):
+        """
+        Забирает самую старую ожидающую задачу или выполняющуюся, которая не
+        сохраняла контрольную точку дольше stale_after секунд (воркер упал).
+        Захват — условный UPDATE по прежним status/updated_at, так что
+        задачу получает ровно один воркер и без блокировок строк.
+        """
+        now = timezone.now()
+        stale = Q(status=OntologyJob.STATUS_RUNNING, updated_at__lt=now - datetime.timedelta(seconds=stale_after))
+        candidates = (
+            OntologyJob.objects
+            .filter(Q(status=OntologyJob.STATUS_PENDING) | stale)
+            .order_by("created_at")
+            .values_list("id", "status", "updated_at")[:10]
+        )
+        for job_id, job_status, updated_at in candidates:
+            claimed = OntologyJob.objects.filter(id=job_id, status=job_status, updated_at=updated_at).update(
+                status=OntologyJob.STATUS_RUNNING,
+                worker=worker,
+                started_at=Coalesce("started_at", now),
+                claimed_at=now,
+                claimed_rows=F("rows_processed"),
+                updated_at=now,
+            )
+            if claimed:
+                return OntologyJob.objects.get(id=job_id)
+        return None
+
+    @staticmethod
+    def _owned(job, **fields):
+        """
+        Условная запись в задачу: только пока она выполняется этим воркером.
+        Если задачу перехватил другой воркер (она считалась зависшей),
+        ничего не пишет и возвращает False — текущий воркер должен остановиться.
+        """
+        updated = OntologyJob.objects.filter(
+            id=job.id, worker=job.worker, status=OntologyJob.STATUS_RUNNING,
+        ).update(updated_at=timezone.now(), **fields)
+        return updated > 0
+
+    @staticmethod
+    def prepared(job, state, rows_total):
+        if not OntologyJobDAO._owned(job, state=state, rows_total=rows_total):
+            return False
+        job.state = state
+        job.rows_total = rows_total
         return True
+
+    @staticmethod
+    def checkpoint(job, rows, state):
+        """Сохраняет состояние после пакета; updated_at служит heartbeat."""
+        if not OntologyJobDAO._owned(job, rows_processed=F("rows_processed") + rows,
+                                     batches=F("batches") + 1, state=state):
+            return False
+        job.rows_processed += rows
+        job.batches += 1
+        job.state = state
+        return True
+
+    @staticmethod
+    def release(job):
+        """Возвращает задачу в очередь (воркер останавливается); контрольная точка сохраняется."""
+        return OntologyJobDAO._owned(job, status=OntologyJob.STATUS_PENDING, worker="")
+
+    @staticmethod
+    def finish(job, result):
+        return OntologyJobDAO._owned(job, status=OntologyJob.STATUS_DONE, result=result,
+                                     finished_at=timezone.now())
+
+    @staticmethod
+    def fail(job, error):
+        return OntologyJobDAO._owned(job, status=OntologyJob.STATUS_FAILED, error=error,
+                                     finished_at=timezone.now())
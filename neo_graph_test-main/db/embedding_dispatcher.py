@@ -0,0 +1,146 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class _Request:
+    __slots__ = ("texts", "future", "enqueued")
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+
+class EmbeddingDispatcher:
+    """
+    Объединяет запросы на кодирование из параллельных HTTP-запросов в батчи.
+
+    Фоновый поток забирает запросы из очереди, пока батч не наберёт
+    max_batch_size текстов или не истечёт max_wait_ms с момента первого
+    запроса, сортирует тексты по длине (меньше паддинга внутри батча),
+    кодирует их одним вызовом модели и раздаёт результаты по Future.
+    Поток создаётся лениво и заново после fork.
+    """
+
+    def __init__(self, encode, max_batch_size=64, max_wait_ms=5.0):
+        self._encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._stats = {
+            "requests": 0,
+            "texts": 0,
+            "batches": 0,
+            "max_queue_depth": 0,
+            "wait_ms_total": 0.0,
+            "encode_ms_total": 0.0,
+        }
+        self._histogram = {}
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # после fork поток родителя не существует, очередь и статистика — его
+                self._queue = queue.Queue()
+                self._reset_stats()
+                self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="embedding-dispatcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, texts):
+        """Ставит тексты в очередь; возвращает Future с массивом эмбеддингов."""
+        self._ensure_worker()
+        request = _Request(list(texts))
+        self._queue.put(request)
+        depth = self._queue.qsize()
+        if depth > self._stats["max_queue_depth"]:
+            self._stats["max_queue_depth"] = depth
+        return request.future
+
+    def encode(self, texts, timeout=None):
+        texts = list(texts)
+        if not texts:
+            return self._encode(texts)
+        return self.submit(texts).result(timeout)
+
+    # ---------- фоновый поток ----------
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            pending = [first]
+            size = len(first.texts)
+            deadline = first.enqueued + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(request)
+                size += len(request.texts)
+            self._process(pending)
+
+    def _process(self, pending):
+        started = time.monotonic()
+        flat = [(i, j, text) for i, request in enumerate(pending) for j, text in enumerate(request.texts)]
+        order = sorted(range(len(flat)), key=lambda k: len(flat[k][2]))
+        try:
+            # один запрос может принести тысячи текстов: модель кодирует их срезами
+            # не больше max_batch_size, а не одним огромным батчем с паддингом
+            encoded = self._encode([flat[k][2] for k in order],
+                                   batch_size=max(1, min(len(order), self.max_batch_size)))
+        except Exception as exc:
+            for request in pending:
+                request.future.set_exception(exc)
+            return
+
+        results = [np.empty((len(r.texts), encoded.shape[1]), dtype=encoded.dtype) for r in pending]
+        for row, k in enumerate(order):
+            i, j, _ = flat[k]
+            results[i][j] = encoded[row]
+        for request, result in zip(pending, results):
+            request.future.set_result(result)
+
+        finished = time.monotonic()
+        self._stats["requests"] += len(pending)
+        self._stats["texts"] += len(flat)
+        self._stats["batches"] += 1
+        self._stats["wait_ms_total"] += sum(started - r.enqueued for r in pending) * 1000
+        self._stats["encode_ms_total"] += (finished - started) * 1000
+        bucket = 1
+        while bucket < len(flat):
+            bucket *= 2
+        self._histogram[bucket] = self._histogram.get(bucket, 0) + 1
+
+    def stats(self):
+        """Глубина очереди, гистограмма размеров батчей (по степеням двойки) и средние времена."""
+        batches = self._stats["batches"] or 1
+        requests = self._stats["requests"] or 1
+        return {
+            "pid": os.getpid(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0,
+            **self._stats,
+            "avg_batch_texts": round(self._stats["texts"] / batches, 2),
+            "avg_wait_ms": round(self._stats["wait_ms_total"] / requests, 3),
+            "avg_encode_ms": round(self._stats["encode_ms_total"] / batches, 3),
+            "batch_size_histogram": {f"<={k}": v for k, v in sorted(self._histogram.items())},
+        }
@@ -0,0 +1,219 @@
+import fcntl
+import json
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, F, Max, Sum
+
+from .embeddings import MODEL_NAME, DOCUMENT_POOLING
+from .models import TextEmbedding
+from .quantization import DTYPES, ENCODING_FLOAT32, check_encoding, dequantize, quantize_matrix, quantized_scores
+
+
+class EmbeddingMatrix:
+    """
+    Матрица нормированных эмбеддингов всех текстов для поиска похожих.
+
+    Векторы лежат в непрерывном массиве N×D в файле .npy (float32, float16
+    или int8 с масштабом на строку в scales.npy) и открываются через mmap: воркеры gunicorn разделяют одни и те же
+    страницы page cache, а не держат по копии матрицы.
+    Рядом хранятся text_ids.npy и corpus_ids.npy (номер строки -> текст/корпус)
+    и manifest.json с отпечатком таблицы TextEmbedding, по которому
+    определяется, что матрицу пора пересобрать.
+    """
+
+    def __init__(self, directory, model_name=MODEL_NAME, pooling=DOCUMENT_POOLING, encoding=ENCODING_FLOAT32):
+        self.directory = directory
+        self.model_name = model_name
+        self.pooling = pooling
+        self.encoding = check_encoding(encoding)
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._vectors = None
+        self._scales = None
+        self._text_ids = None
+        self._corpus_ids = None
+
+    # ---------- файлы ----------
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _queryset(self):
+        return TextEmbedding.objects.filter(model_name=self.model_name, pooling=self.pooling)
+
+    def fingerprint(self):
+        """
+        Отпечаток хранилища: число векторов, время последнего изменения
+        и контрольная сумма принадлежности текстов корпусам — перенос текста
+        в другой корпус (update_text(corpus_id=...)) сам эмбеддинг не трогает,
+        но меняет corpus_ids.npy.
+        """
+        agg = self._queryset().aggregate(
+            count=Count("id"),
+            updated=Max("updated_at"),
+            corpora=Sum(F("text_id") * F("text__corpus_id")),
+        )
+        return {
+            "model_name": self.model_name,
+            "pooling": self.pooling,
+            "encoding": self.encoding,
+            "count": agg["count"],
+            "updated": agg["updated"].isoformat() if agg["updated"] else None,
+            "corpora": agg["corpora"] or 0,
+        }
+
+    def _read_manifest(self):
+        try:
+            with open(self._path("manifest.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def build(self, fingerprint=None):
+        """
+        Пересобирает матрицу из TextEmbedding. Строки пишутся в memmap
+        потоково, файлы подменяются атомарно (os.replace).
+        """
+        fingerprint = fingerprint or self.fingerprint()
+        os.makedirs(self.directory, exist_ok=True)
+
+        rows = self._queryset().order_by("text_id").values_list(
+            "text_id", "text__corpus_id", "dim", "vector", "encoding", "scale"
+        )
+        count = fingerprint["count"]
+        dim = self._queryset().values_list("dim", flat=True).first() or 0
+
+        tmp_vectors = self._path("vectors.tmp.npy")
+        vectors = np.lib.format.open_memmap(tmp_vectors, mode="w+", dtype=DTYPES[self.encoding], shape=(count, dim))
+        scales = np.ones(count, dtype=np.float32)
+        text_ids = np.zeros(count, dtype=np.int64)
+        corpus_ids = np.zeros(count, dtype=np.int64)
+
+        n = 0
+        for text_id, corpus_id, row_dim, data, encoding, scale in rows.iterator(chunk_size=2000):
+            if n >= count or row_dim != dim:
+                continue
+            vector = dequantize(data, row_dim, encoding, scale)
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector = vector / norm
+            q, row_scales = quantize_matrix(vector[None, :], self.encoding)
+            vectors[n] = q[0]
+            scales[n] = row_scales[0]
+            text_ids[n] = text_id
+            corpus_ids[n] = corpus_id
+            n += 1
+        vectors.flush()
+        del vectors
+
+        # строки, изменившиеся во время сборки, попадут в следующую пересборку;
+        # если часть строк успели удалить, хвост vectors.npy не используется
+        fingerprint = dict(fingerprint, rows=n)
+        np.save(self._path("scales.tmp.npy"), scales[:n])
+        np.save(self._path("text_ids.tmp.npy"), text_ids[:n])
+        np.save(self._path("corpus_ids.tmp.npy"), corpus_ids[:n])
+        os.replace(tmp_vectors, self._path("vectors.npy"))
+        os.replace(self._path("scales.tmp.npy"), self._path("scales.npy"))
+        os.replace(self._path("text_ids.tmp.npy"), self._path("text_ids.npy"))
+        os.replace(self._path("corpus_ids.tmp.npy"), self._path("corpus_ids.npy"))
+        with open(self._path("manifest.tmp.json"), "w") as f:
+            json.dump(fingerprint, f)
+        os.replace(self._path("manifest.tmp.json"), self._path("manifest.json"))
+        return fingerprint
+
+    def _load(self, manifest):
+        if not manifest["rows"]:
+            self._vectors = self._scales = self._text_ids = self._corpus_ids = None
+            self._manifest = manifest
+            return
+        self._vectors = np.load(self._path("vectors.npy"), mmap_mode="r")[:manifest["rows"]]
+        self._scales = np.load(self._path("scales.npy"), mmap_mode="r")
+        self._text_ids = np.load(self._path("text_ids.npy"), mmap_mode="r")
+        self._corpus_ids = np.load(self._path("corpus_ids.npy"), mmap_mode="r")
+        self._manifest = manifest
+
+    @staticmethod
+    def _is_current(manifest, fingerprint):
+        if not manifest:
+            return False
+        return all(manifest.get(key) == value for key, value in fingerprint.items())
+
+    def ensure_fresh(self):
+        """
+        Проверяет, что матрица соответствует хранилищу, и при необходимости
+        пересобирает её. Пересборку делает один процесс (flock), остальные
+        дожидаются и открывают готовые файлы.
+        """
+        fingerprint = self.fingerprint()
+        with self._lock:
+            if self._is_current(self._manifest, fingerprint):
+                return
+            if not fingerprint["count"]:
+                # пустой memmap открыть нельзя — обходимся без файлов
+                self._vectors = self._scales = self._text_ids = self._corpus_ids = None
+                self._manifest = dict(fingerprint, rows=0)
+                return
+            manifest = self._read_manifest()
+            if not self._is_current(manifest, fingerprint):
+                os.makedirs(self.directory, exist_ok=True)
+                with open(self._path("build.lock"), "w") as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    try:
+                        manifest = self._read_manifest()
+                        if not self._is_current(manifest, fingerprint):
+                            manifest = self.build(fingerprint)
+                    finally:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+            self._load(manifest)
+
+    # ---------- поиск ----------
+    def top_k(self, query_vector, k=10, corpus_id=None, exclude_text_id=None):
+        """
+        Возвращает [(text_id, similarity), ...] для k ближайших текстов по косинусу.
+        Скоринг — матрично-векторное произведение прямо по закодированной
+        матрице (см. quantized_scores) и argpartition.
+        """
+        self.ensure_fresh()
+        vectors, text_ids = self._vectors, self._text_ids
+        if vectors is None or vectors.shape[0] == 0:
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        if corpus_id is not None:
+            rows = np.flatnonzero(self._corpus_ids == int(corpus_id))
+            scores = quantized_scores(vectors[rows], self._scales[rows], query, self.encoding)
+            ids = text_ids[rows]
+        else:
+            scores = quantized_scores(vectors, self._scales, query, self.encoding)
+            ids = text_ids
+
+        if exclude_text_id is not None:
+            scores = np.where(ids == exclude_text_id, -np.inf, scores)
+
+        k = min(int(k), scores.shape[0])
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (int(ids[i]), float(np.clip(scores[i], -1.0, 1.0)))
+            for i in top
+            if np.isfinite(scores[i])
+        ]
+
+
+_matrix = None
+
+
+def get_embedding_matrix():
+    """Матрица эмбеддингов текущего процесса (файлы общие для всех воркеров)."""
+    global _matrix
+    if _matrix is None:
+        _matrix = EmbeddingMatrix(settings.EMBEDDING_MATRIX_DIR, encoding=settings.EMBEDDING_MATRIX_ENCODING)
+    return _matrix
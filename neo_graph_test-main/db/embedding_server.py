@@ -0,0 +1,204 @@
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import numpy as np
+
+# Протокол (все числа little-endian):
+#   запрос:  magic "EMB1", op (uint8), count (uint32), затем count раз: len (uint32) + текст в UTF-8
+#   ответ:   magic "EMB1", status (uint8), rows (uint32), dim (uint32),
+#            затем rows*dim float32 (status=0) или сообщение об ошибке длиной dim байт (status=1)
+MAGIC = b"EMB1"
+OP_ENCODE = 1
+OP_PING = 2
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+REQUEST_HEADER = struct.Struct("<4sBI")
+RESPONSE_HEADER = struct.Struct("<4sBII")
+LENGTH = struct.Struct("<I")
+
+
+class EmbeddingServerError(Exception):
+    pass
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Embedding server connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def encode_request(texts, op=OP_ENCODE):
+    parts = [REQUEST_HEADER.pack(MAGIC, op, len(texts))]
+    for text in texts:
+        data = text.encode("utf-8")
+        parts.append(LENGTH.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def encode_response(embeddings):
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    rows, dim = embeddings.shape if embeddings.ndim == 2 else (0, 0)
+    return RESPONSE_HEADER.pack(MAGIC, STATUS_OK, rows, dim) + embeddings.tobytes()
+
+
+def encode_error(message):
+    data = message.encode("utf-8")
+    return RESPONSE_HEADER.pack(MAGIC, STATUS_ERROR, 0, len(data)) + data
+
+
+def read_request(sock):
+    """Читает один запрос из sock (нужен только recv). Возвращает (op, texts)."""
+    magic, op, count = REQUEST_HEADER.unpack(_recv_exact(sock, REQUEST_HEADER.size))
+    if magic != MAGIC:
+        raise EmbeddingServerError("bad magic")
+    texts = []
+    for _ in range(count):
+        (length,) = LENGTH.unpack(_recv_exact(sock, LENGTH.size))
+        texts.append(_recv_exact(sock, length).decode("utf-8"))
+    return op, texts
+
+
+def read_response(sock):
+    """Читает один ответ из sock: матрица rows×dim float32 или EmbeddingServerError."""
+    magic, status, rows, dim = RESPONSE_HEADER.unpack(_recv_exact(sock, RESPONSE_HEADER.size))
+    if magic != MAGIC:
+        raise EmbeddingServerError("bad magic in response")
+    if status != STATUS_OK:
+        raise EmbeddingServerError(_recv_exact(sock, dim).decode("utf-8", "replace"))
+    data = _recv_exact(sock, rows * dim * 4) if rows and dim else b""
+    return np.frombuffer(data, dtype=np.float32).reshape(rows, dim)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """Обслуживает одно соединение; клиент может слать запросы подряд (переиспользование соединения)."""
+
+    def handle(self):
+        sock = self.request
+        while True:
+            try:
+                op, texts = read_request(sock)
+            except ConnectionError:
+                return
+            except EmbeddingServerError as exc:
+                sock.sendall(encode_error(str(exc)))
+                return
+
+            if op == OP_PING:
+                sock.sendall(RESPONSE_HEADER.pack(MAGIC, STATUS_OK, 0, 0))
+                continue
+            try:
+                sock.sendall(encode_response(self.server.encode(texts)))
+            except Exception as exc:
+                sock.sendall(encode_error(f"{type(exc).__name__}: {exc}"))
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Процесс-владелец единственного экземпляра модели. Каждое соединение
+    обслуживается своим потоком, а кодирование идёт через общий
+    микробатчер, так что запросы разных веб-воркеров объединяются в батчи.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, encode):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.encode = encode
+        super().__init__(socket_path, _Handler)
+        os.chmod(socket_path, 0o660)
+
+
+class EmbeddingClient:
+    """
+    Клиент сервера эмбеддингов. Соединение открывается один раз на поток
+    и переиспользуется; при обрыве делается одна попытка переподключения.
+    """
+
+    def __init__(self, socket_path, timeout=30.0, connect_timeout=1.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.connect_timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        sock.settimeout(self.timeout)
+        return sock
+
+    def _socket(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None or getattr(self._local, "pid", None) != os.getpid():
+            sock = self._connect()
+            self._local.sock = sock
+            self._local.pid = os.getpid()
+        return sock
+
+    def close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _roundtrip(self, payload):
+        sock = self._socket()
+        sock.sendall(payload)
+        return read_response(sock)
+
+    def encode(self, texts):
+        payload = encode_request(list(texts))
+        try:
+            try:
+                return self._roundtrip(payload)
+            except ConnectionError:
+                # соединение могло устареть (перезапуск сервера) — пробуем ещё раз с новым
+                self.close()
+                return self._roundtrip(payload)
+        except OSError:
+            # после таймаута в сокете мог остаться недочитанный ответ
+            self.close()
+            raise
+
+    def ping(self):
+        return self._roundtrip(encode_request([], op=OP_PING)).shape == (0, 0)
+
+
+class FallbackClient:
+    """
+    Обёртка клиента с откатом на локальное кодирование: при недоступности
+    сервера запросы retry_after секунд идут в локальную модель, не тратя
+    время на попытки подключения.
+    """
+
+    def __init__(self, client, local_encode, retry_after=30.0, fallback=True):
+        self.client = client
+        self.local_encode = local_encode
+        self.retry_after = retry_after
+        self.fallback = fallback
+        self._down_until = 0.0
+
+    def encode(self, texts):
+        if time.monotonic() >= self._down_until:
+            try:
+                return self.client.encode(texts)
+            except (OSError, EmbeddingServerError):
+                if not self.fallback:
+                    raise
+                self._down_until = time.monotonic() + self.retry_after
+        return self.local_encode(texts)
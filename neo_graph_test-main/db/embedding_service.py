@@ -1,15 +1,96 @@
-from .models import Text
-from .embeddings import get_embeddings, cos_compare
+from django.shortcuts import get_object_or_404
+
+from .models import Corpus, Text
+from .embeddings import cos_compare
+from .dao import TextEmbeddingDAO
+from .embedding_matrix import get_embedding_matrix
+from .ann_index import get_ann_index
+import io
+import json
 import numpy as np
 
 def compare_texts_by_ids(id1, id2):
-    t1 = Text.objects.get(pk=id1)
-    t2 = Text.objects.get(pk=id2)
+    t1 = get_object_or_404(Text, pk=id1)
+    t2 = get_object_or_404(Text, pk=id2)
 
-    emb1 = get_embeddings(t1.content)[0]
-    emb2 = get_embeddings(t2.content)[0]
+    # векторы берутся из хранилища; модель вызывается только для новых/изменённых текстов
+    vectors = TextEmbeddingDAO.get_vectors([t1, t2])
+    emb1 = vectors[t1.id]
+    emb2 = vectors[t2.id]
 
     score = cos_compare(emb1, emb2)
     similarity = np.clip(score, -1.0, 1.0)
 
-    return similarity
\ No newline at end of file
+    return similarity
+
+
+def find_similar_texts(text_id, k=10, corpus_id=None, approximate=False):
+    """
+    Возвращает k текстов, ближайших к тексту text_id по косинусному сходству,
+    опционально только из корпуса corpus_id.
+    approximate=True — поиск по IVF-индексу фрагментов (без фильтра по корпусу).
+    """
+    text = get_object_or_404(Text, pk=text_id)
+    vector = TextEmbeddingDAO.get_vectors([text])[text.id]
+
+    if approximate:
+        hits = get_ann_index().search_texts(vector, k=k, exclude_text_id=text.id)
+    else:
+        hits = get_embedding_matrix().top_k(vector, k=k, corpus_id=corpus_id, exclude_text_id=text.id)
+    names = dict(Text.objects.filter(id__in=[h[0] for h in hits]).values_list("id", "name"))
+    return [
+        {"id": hit_id, "name": names.get(hit_id), "similarity": similarity}
+        for hit_id, similarity in hits
+        if hit_id in names
+    ]
+
+
+def resolve_text_ids(ids=None, corpus_id=None):
+    """
+    Список id текстов: либо переданные ids (в исходном порядке),
+    либо все тексты корпуса corpus_id (по возрастанию id).
+    Возвращает (ids, missing_ids). ids — только список целых (иначе TypeError),
+    несуществующий корпус — Http404.
+    """
+    if corpus_id is not None:
+        corpus = get_object_or_404(Corpus, id=corpus_id)
+        return list(Text.objects.filter(corpus=corpus).order_by("id").values_list("id", flat=True)), []
+    ids = [] if ids is None else ids
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise TypeError("ids must be a list of integers")
+    existing = set(Text.objects.filter(id__in=ids).values_list("id", flat=True))
+    return ids, [i for i in ids if i not in existing]
+
+
+def normalized_matrix(ids):
+    """Нормированные векторы текстов ids построчно, в порядке ids."""
+    texts = Text.objects.filter(id__in=ids)
+    vectors = TextEmbeddingDAO.get_vectors(texts)
+    matrix = np.vstack([vectors[i] for i in ids]).astype(np.float32) if ids else np.zeros((0, 0), np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def iter_similarity_matrix(ids1, ids2, rows, cols, block_rows=256, precision=6):
+    """
+    Потоково отдаёт JSON {"rows": [...], "cols": [...], "matrix": [[...], ...]}
+    по нормированным векторам rows и cols (normalized_matrix). Векторы
+    получают до начала ответа: ошибка модели — ещё обычный ответ с кодом,
+    а не оборванный поток после 200.
+    Матрица считается блоками строк: одно матричное умножение (BLAS) на блок,
+    так что целиком результат в памяти не строится.
+    """
+    yield '{"rows": %s, "cols": %s, "matrix": [' % (json.dumps(ids1), json.dumps(ids2))
+    fmt = f"%.{precision}f"
+    for start in range(0, len(ids1), block_rows):
+        block = np.clip(rows[start:start + block_rows] @ cols.T, -1.0, 1.0) if len(ids2) else None
+        buf = io.StringIO()
+        if block is not None:
+            np.savetxt(buf, block, fmt=fmt, delimiter=",")
+            lines = buf.getvalue().splitlines()
+        else:
+            lines = [""] * min(block_rows, len(ids1) - start)
+        prefix = "," if start else ""
+        yield prefix + ",".join(f"[{line}]" for line in lines)
+    yield "]}"
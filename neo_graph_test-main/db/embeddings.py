@@ -1,23 +1,124 @@
-from sentence_transformers import SentenceTransformer
+from django.conf import settings
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
+import hashlib
 import re
 
-# Загружаем модель один раз при импорте
-model = SentenceTransformer("sentence-transformers/paraphrase-multilingual-mpnet-base-v2")
+from .model_provider import ModelProvider
+from .embedding_dispatcher import EmbeddingDispatcher
+from .embedding_server import EmbeddingClient, FallbackClient
 
+MODEL_NAME = getattr(
+    settings, "EMBEDDING_MODEL_NAME", "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+)
 
-def get_chunks(text, max_words=100):
+# Способы получения вектора документа:
+#   truncate — весь текст подаётся в модель целиком (модель обрезает длинные тексты),
+#   mean / max — текст режется на фрагменты get_chunks, векторы фрагментов пулятся.
+POOLING_TRUNCATE = "truncate"
+POOLING_MEAN = "mean"
+POOLING_MAX = "max"
+POOLINGS = (POOLING_TRUNCATE, POOLING_MEAN, POOLING_MAX)
+
+DOCUMENT_POOLING = POOLING_MEAN
+CHUNK_MAX_WORDS = 100
+CHUNK_BATCH_SIZE = 32
+
+# Модель загружается при первом обращении (или заранее через preload_model)
+model_provider = ModelProvider(
+    MODEL_NAME,
+    local_path=getattr(settings, "EMBEDDING_MODEL_PATH", None),
+    device=getattr(settings, "EMBEDDING_DEVICE", None),
+    offline=getattr(settings, "EMBEDDING_OFFLINE", False),
+    torch_threads=getattr(settings, "EMBEDDING_TORCH_THREADS", None),
+)
+
+
+def get_model():
+    """
+    Возвращает SentenceTransformer, загружая его при первом вызове.
+    """
+    return model_provider.get()
+
+
+def preload_model():
+    """
+    Загружает модель в текущем процессе заранее — в master-процессе
+    gunicorn до fork, чтобы воркеры разделяли веса.
+    """
+    return model_provider.preload()
+
+
+def iter_chunks(text, max_words=CHUNK_MAX_WORDS):
+    """
+    Лениво разбивает текст на фрагменты примерно по max_words слов.
+    В отличие от get_chunks не держит в памяти список всех слов.
+    """
+    words = []
+    for match in re.finditer(r'\S+', text or ""):
+        words.append(match.group(0))
+        if len(words) == max_words:
+            yield " ".join(words)
+            words = []
+    if words:
+        yield " ".join(words)
+
+
+def get_chunks(text, max_words=CHUNK_MAX_WORDS):
     """
     Разбивает длинный текст на фрагменты примерно по max_words слов.
     Возвращает список строк.
     """
-    words = re.findall(r'\S+', text)
-    chunks = []
-    for i in range(0, len(words), max_words):
-        chunk = " ".join(words[i:i + max_words])
-        chunks.append(chunk)
-    return chunks
+    return list(iter_chunks(text, max_words))
+
+
+def iter_batches(items, batch_size):
+    """
+    Группирует элементы итератора в списки длиной не более batch_size.
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def encode_texts(texts, batch_size=32):
+    """
+    Кодирует список текстов моделью текущего процесса (без очереди).
+    """
+    return get_model().encode(texts, convert_to_numpy=True, batch_size=batch_size)
+
+
+# Запросы на кодирование из параллельных потоков собираются в общие батчи
+dispatcher = EmbeddingDispatcher(
+    encode_texts,
+    max_batch_size=getattr(settings, "EMBEDDING_MAX_BATCH_SIZE", 64),
+    max_wait_ms=getattr(settings, "EMBEDDING_MAX_WAIT_MS", 5.0),
+)
+
+
+def local_embeddings(texts):
+    """
+    Кодирует тексты моделью в этом процессе (через микробатчер, если он включён).
+    """
+    if getattr(settings, "EMBEDDING_BATCHING", True):
+        return dispatcher.encode(texts)
+    return encode_texts(texts)
+
+
+# Если задан сокет сервера эмбеддингов (manage.py embedding_server), модель
+# живёт в отдельном процессе, а здесь только клиент с откатом на локальную модель
+server_client = None
+if getattr(settings, "EMBEDDING_SERVER_SOCKET", None):
+    server_client = FallbackClient(
+        EmbeddingClient(settings.EMBEDDING_SERVER_SOCKET, timeout=settings.EMBEDDING_SERVER_TIMEOUT),
+        local_embeddings,
+        fallback=settings.EMBEDDING_SERVER_FALLBACK,
+    )
 
 
 def get_embeddings(texts):
@@ -27,8 +128,60 @@ def get_embeddings(texts):
     """
     if isinstance(texts, str):
         texts = [texts]
-    embeddings = model.encode(texts, convert_to_numpy=True)
-    return embeddings
+    if server_client is not None:
+        return server_client.encode(texts)
+    return local_embeddings(texts)
+
+
+def get_document_embedding(text, max_words=CHUNK_MAX_WORDS, batch_size=CHUNK_BATCH_SIZE, on_batch=None):
+    """
+    Эмбеддинг длинного документа: текст режется на фрагменты, фрагменты
+    кодируются батчами по batch_size, векторы агрегируются на лету
+    (сумма и покомпонентный максимум), поэтому в памяти одновременно
+    находится не больше одного батча.
+    on_batch(start_index, embeddings) вызывается для каждого батча —
+    например, чтобы сохранить векторы фрагментов.
+    Возвращает {"mean": вектор, "max": вектор, "chunk_count": n}.
+    """
+    total = None
+    maximum = None
+    count = 0
+    for batch in iter_batches(iter_chunks(text, max_words), batch_size):
+        embeddings = get_embeddings(batch)
+        if on_batch is not None:
+            on_batch(count, embeddings)
+        batch_sum = embeddings.sum(axis=0, dtype=np.float64)
+        batch_max = embeddings.max(axis=0)
+        if total is None:
+            total, maximum = batch_sum, batch_max
+        else:
+            total += batch_sum
+            np.maximum(maximum, batch_max, out=maximum)
+        count += embeddings.shape[0]
+
+    if count == 0:
+        # пустой текст: кодируем как есть, чтобы размерность совпадала
+        empty = get_embeddings("")[0]
+        return {"mean": empty, "max": empty, "chunk_count": 0}
+
+    return {
+        "mean": (total / count).astype(np.float32),
+        "max": maximum.astype(np.float32),
+        "chunk_count": count,
+    }
+
+
+def embed_document(text, pooling=DOCUMENT_POOLING, on_batch=None):
+    """
+    Возвращает (вектор, число фрагментов) для документа в заданном режиме пулинга.
+    on_batch передаётся в get_document_embedding (в режиме truncate фрагментов нет).
+    """
+    if pooling not in POOLINGS:
+        raise ValueError(f"Unknown pooling '{pooling}', expected one of {POOLINGS}")
+    if pooling == POOLING_TRUNCATE:
+        return get_embeddings(text)[0], 1
+    document = get_document_embedding(text, on_batch=on_batch)
+    return document[pooling], document["chunk_count"]
 
 
 def cos_compare(emb1, emb2):
@@ -39,3 +192,11 @@ def cos_compare(emb1, emb2):
     emb1 = np.array(emb1).reshape(1, -1)
     emb2 = np.array(emb2).reshape(1, -1)
     return float(cosine_similarity(emb1, emb2)[0][0])
+
+
+def content_hash(text):
+    """
+    Возвращает sha256-хэш содержимого текста (hex).
+    По нему определяется, устарел ли сохранённый эмбеддинг.
+    """
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
@@ -0,0 +1,76 @@
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from db.ann_index import get_ann_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает IVF-индекс с точным поиском: recall@k и задержка "
+        "для разных nprobe. Запросы — случайные векторы самого индекса."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--nprobe", default="1,2,4,8,16,32", help="Список значений nprobe через запятую")
+        parser.add_argument("--block", type=int, default=65536, help="Размер блока строк при точном поиске")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        index = get_ann_index()
+        stats = index.stats()
+        if not stats["built"] or not stats["count"]:
+            raise CommandError("ANN index is not built; run manage.py build_ann_index first")
+
+        k = options["k"]
+        rng = np.random.default_rng(options["seed"])
+        rows = rng.choice(stats["count"], min(options["queries"], stats["count"]), replace=False)
+        queries = np.asarray(index.vectors[np.sort(rows)])
+
+        # точный top-k: полный проход по базовому сегменту блоками
+        started = time.perf_counter()
+        exact = []
+        for query in queries:
+            best_scores = np.full(0, -np.inf, dtype=np.float32)
+            best_ids = np.zeros(0, dtype=np.int64)
+            for start in range(0, stats["count"], options["block"]):
+                scores = index.vectors[start:start + options["block"]] @ query
+                ids = index.ids[start:start + options["block"]]
+                best_scores = np.concatenate([best_scores, scores])
+                best_ids = np.concatenate([best_ids, ids])
+                if best_scores.shape[0] > k:
+                    top = np.argpartition(-best_scores, k - 1)[:k]
+                    best_scores, best_ids = best_scores[top], best_ids[top]
+            exact.append(set(int(i) for i in best_ids))
+        exact_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+        report = {
+            "count": stats["count"],
+            "nlist": stats["nlist"],
+            "k": k,
+            "queries": len(queries),
+            "exact_ms_per_query": round(exact_ms, 3),
+            "ivf": [],
+        }
+        for nprobe in [int(n) for n in options["nprobe"].split(",") if n]:
+            latencies = []
+            recall = 0.0
+            for query, truth in zip(queries, exact):
+                started = time.perf_counter()
+                hits = index.search(query, k=k, nprobe=nprobe)
+                latencies.append((time.perf_counter() - started) * 1000)
+                recall += len(truth & {h[0] for h in hits}) / max(1, len(truth))
+            latencies = np.asarray(latencies)
+            report["ivf"].append({
+                "nprobe": nprobe,
+                f"recall@{k}": round(recall / len(queries), 4),
+                "ms_p50": round(float(np.percentile(latencies, 50)), 3),
+                "ms_p95": round(float(np.percentile(latencies, 95)), 3),
+                "speedup_vs_exact": round(exact_ms / max(float(latencies.mean()), 1e-9), 1),
+            })
+
+        self.stdout.write(json.dumps(report, indent=2))
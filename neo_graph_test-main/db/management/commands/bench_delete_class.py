@@ -0,0 +1,100 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from db.api.ontology import TYPE_REL, OntologyService
+from db.api.repository import Neo4jRepository
+from db.api.schema import ONTOLOGY_LABEL
+
+BENCH_LABEL = "DeleteClassBench"
+
+CREATE_OBJECTS_QUERY = f"""
+MATCH (c:Class {{uri: $class_uri}})
+UNWIND range($start, $end - 1) AS i
+CREATE (:{BENCH_LABEL}:{ONTOLOGY_LABEL}:Object {{uri: $prefix + toString(i), size: i}})-[:{TYPE_REL}]->(c)
+"""
+
+# Цепочка связей между соседними объектами; тип ребра — uri ObjectProperty
+LINK_OBJECTS_QUERY = """
+UNWIND range($start, $end - 2) AS i
+MATCH (a:Object {{uri: $prefix + toString(i)}}), (b:Object {{uri: $prefix + toString(i + 1)}})
+CREATE (a)-[:`{rel_type}`]->(b)
+"""
+
+CLEANUP_QUERY = f"""
+MATCH (n:{ONTOLOGY_LABEL})
+WHERE n.uri STARTS WITH $prefix
+CALL {{
+    WITH n
+    DETACH DELETE n
+}} IN TRANSACTIONS OF 10000 ROWS
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Время каскадного удаления класса (OntologyService.delete_class) "
+        "в зависимости от числа объектов. На каждом шаге создаёт класс с "
+        "подклассом, атрибутом, ObjectProperty и N объектами, связанными "
+        "цепочкой, и удаляет его."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,100000",
+                            help="Число объектов на каждом шаге, через запятую")
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help="Размер пакета delete_class (по умолчанию ONTOLOGY_DELETE_BATCH_SIZE)")
+        parser.add_argument("--create-batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(s) for s in options["sizes"].split(",") if s)
+        repo = Neo4jRepository()
+        service = OntologyService(repo)
+        report = {"batch_size": options["batch_size"], "steps": []}
+        try:
+            for size in sizes:
+                prefix = f"bench-{Neo4jRepository.generate_random_string(6)}-"
+                try:
+                    root_uri = self._populate(service, repo, prefix, size, options["create_batch_size"])
+                    started = time.perf_counter()
+                    stats = service.delete_class(root_uri, batch_size=options["batch_size"])
+                    elapsed = time.perf_counter() - started
+                finally:
+                    repo.run_custom_query(CLEANUP_QUERY, {"prefix": prefix})
+
+                step = {
+                    "objects": size,
+                    "seconds": round(elapsed, 3),
+                    "objects_per_s": round(size / elapsed, 1) if elapsed else None,
+                    "stats": stats,
+                }
+                report["steps"].append(step)
+                self.stderr.write(json.dumps(step))
+        finally:
+            repo.close()
+
+        self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
+
+    @staticmethod
+    def _populate(service, repo, prefix, size, batch_size):
+        """Класс, подкласс, свойства и size объектов (половина — в подклассе)."""
+        root = service.create_class("bench root", uri=prefix + "root")
+        sub = service.create_class("bench sub", uri=prefix + "sub", parent_uri=root["uri"])
+        service.add_class_attribute(root["uri"], "size", attr_uri=prefix + "size", attr_props={"type": "int"})
+        op = service.add_class_object_attribute(root["uri"], "next", root["uri"], attr_uri=prefix + "next")
+
+        half = size // 2
+        for class_uri, start, end in ((root["uri"], 0, half), (sub["uri"], half, size)):
+            for offset in range(start, end, batch_size):
+                repo.run_custom_query(CREATE_OBJECTS_QUERY, {
+                    "class_uri": class_uri, "prefix": prefix,
+                    "start": offset, "end": min(end, offset + batch_size),
+                })
+
+        link_query = LINK_OBJECTS_QUERY.format(rel_type=op["uri"].replace("`", "``"))
+        for offset in range(0, size, batch_size):
+            # +1: связь через границу пакета
+            repo.run_custom_query(link_query, {"prefix": prefix, "start": offset,
+                                               "end": min(size, offset + batch_size + 1)})
+        return root["uri"]
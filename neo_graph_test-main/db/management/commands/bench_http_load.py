@@ -0,0 +1,107 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест HTTP-эндпоинтов: для каждого уровня параллелизма — "
+        "пропускная способность, перцентили задержки и ошибки. "
+        "Для сравнения синхронного и асинхронного режима запустите его против "
+        "`gunicorn core.wsgi -w N` и `ONTOLOGY_ASYNC=1 uvicorn core.asgi:application` "
+        "с одинаковыми --url, сохранив первый отчёт (--output) и передав его "
+        "во второй запуск как --baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", action="append", required=True,
+                            help="Адрес для GET-запросов; можно указать несколько, они чередуются")
+        parser.add_argument("--concurrency", default="1,10,50,100,200,400",
+                            help="Уровни параллелизма через запятую")
+        parser.add_argument("--duration", type=float, default=10.0, help="Секунд на каждый уровень")
+        parser.add_argument("--timeout", type=float, default=30.0)
+        parser.add_argument("--label", default="", help="Подпись отчёта, например gunicorn-sync")
+        parser.add_argument("--output", help="Сохранить отчёт в JSON")
+        parser.add_argument("--baseline", help="Отчёт предыдущего запуска для сравнения")
+
+    def handle(self, *args, **options):
+        levels = [int(c) for c in options["concurrency"].split(",") if c]
+        report = {"label": options["label"], "urls": options["url"], "duration": options["duration"], "levels": []}
+        for concurrency in levels:
+            level = self._run_level(options["url"], concurrency, options["duration"], options["timeout"])
+            report["levels"].append(level)
+            self.stderr.write(json.dumps(level))
+
+        if options["baseline"]:
+            report["comparison"] = self._compare(report, options["baseline"])
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+        self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
+
+    def _run_level(self, urls, concurrency, duration, timeout):
+        deadline = time.monotonic() + duration
+
+        def worker(n):
+            session = requests.Session()
+            latencies, errors, i = [], 0, n
+            while time.monotonic() < deadline:
+                url = urls[i % len(urls)]
+                i += 1
+                started = time.perf_counter()
+                try:
+                    # .content дочитывает тело ответа, иначе замер не включает передачу
+                    response = session.get(url, timeout=timeout)
+                    response.content
+                    ok = response.status_code < 400
+                except requests.RequestException:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+            return latencies, errors
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(worker, range(concurrency)))
+        elapsed = time.monotonic() - started
+
+        latencies = np.array([x for lat, _ in results for x in lat]) * 1000
+        errors = sum(err for _, err in results)
+        level = {
+            "concurrency": concurrency,
+            "requests": int(latencies.size),
+            "errors": errors,
+            "rps": round(latencies.size / elapsed, 1),
+        }
+        if latencies.size:
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            level.update({"p50_ms": round(p50, 2), "p95_ms": round(p95, 2), "p99_ms": round(p99, 2)})
+        return level
+
+    @staticmethod
+    def _compare(report, baseline_path):
+        try:
+            with open(baseline_path) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Cannot read baseline report: {exc}")
+        base_levels = {level["concurrency"]: level for level in baseline.get("levels", [])}
+        comparison = []
+        for level in report["levels"]:
+            base = base_levels.get(level["concurrency"])
+            if not base:
+                continue
+            row = {"concurrency": level["concurrency"]}
+            if base.get("rps"):
+                row["rps_ratio"] = round(level["rps"] / base["rps"], 2)
+            if base.get("p95_ms") and level.get("p95_ms"):
+                row["p95_ratio"] = round(level["p95_ms"] / base["p95_ms"], 2)
+            row["errors"] = {"baseline": base.get("errors", 0), "current": level["errors"]}
+            comparison.append(row)
+        return {"baseline": baseline.get("label", baseline_path), "levels": comparison}
@@ -0,0 +1,90 @@
+import json
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+
+def memory_kb(pid="self"):
+    """
+    Возвращает {"rss": ..., "pss": ..., "uss": ...} в килобайтах для процесса.
+    PSS/USS доступны только в Linux (/proc/<pid>/smaps_rollup).
+    """
+    stats = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                    stats[key] = int(value.split()[0])
+    except OSError:
+        import resource
+        return {"rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    return {
+        "rss": stats.get("Rss"),
+        "pss": stats.get("Pss"),
+        "uss": stats.get("Private_Clean", 0) + stats.get("Private_Dirty", 0),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Измеряет холодный старт приложения и память воркеров: время импорта db.views, "
+        "время загрузки модели эмбеддингов и RSS/PSS/USS воркеров после fork "
+        "с предварительной загрузкой модели в родителе (--preload) и без неё."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2, help="Сколько воркеров форкнуть")
+        parser.add_argument("--preload", action="store_true", help="Загрузить модель до fork")
+        parser.add_argument("--text", default="Пример текста для прогрева модели.")
+
+    def handle(self, *args, **options):
+        report = {"preload": options["preload"], "workers": []}
+
+        started = time.perf_counter()
+        import db.views  # noqa: F401
+        report["import_views_s"] = round(time.perf_counter() - started, 4)
+        report["torch_imported_on_startup"] = "torch" in sys.modules
+        report["after_import"] = memory_kb()
+
+        from db.embeddings import model_provider, get_embeddings
+
+        if options["preload"]:
+            started = time.perf_counter()
+            model_provider.preload()
+            report["model_load_s"] = round(time.perf_counter() - started, 4)
+            report["after_preload"] = memory_kb()
+
+        children = []
+        for _ in range(options["workers"]):
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(read_fd)
+                model_provider.after_fork()
+                started = time.perf_counter()
+                get_embeddings(options["text"])
+                result = {
+                    "pid": os.getpid(),
+                    "first_encode_s": round(time.perf_counter() - started, 4),
+                    **memory_kb(),
+                }
+                os.write(write_fd, json.dumps(result).encode("utf-8"))
+                os.close(write_fd)
+                os._exit(0)
+            os.close(write_fd)
+            children.append((pid, read_fd))
+
+        for pid, read_fd in children:
+            with os.fdopen(read_fd, "rb") as pipe:
+                data = pipe.read()
+            os.waitpid(pid, 0)
+            if data:
+                report["workers"].append(json.loads(data))
+
+        if report["workers"]:
+            report["total_worker_pss_kb"] = sum(w.get("pss") or 0 for w in report["workers"])
+
+        self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
@@ -0,0 +1,208 @@
+import json
+import platform
+import random
+import subprocess
+import time
+from dataclasses import asdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from db.api.factory import BACKEND_MEMORY, BACKEND_NEO4J, BACKENDS
+from db.api.ontology import OntologyService
+from db.api.repository import Neo4jRepository
+from db.api.schema import ONTOLOGY_LABEL, bootstrap_schema
+from db.api.synthetic import OntologySpec, SyntheticOntology
+
+OPERATIONS = (
+    "create_object",
+    "collect_signature_cold",
+    "collect_signature_warm",
+    "get_class_children",
+    "get_class_objects",
+    "get_ontology",
+    "delete_class",
+)
+
+CLEANUP_QUERY = f"""
+MATCH (n:{ONTOLOGY_LABEL})
+WHERE n.uri STARTS WITH $prefix
+CALL {{
+    WITH n
+    DETACH DELETE n
+}} IN TRANSACTIONS OF 10000 ROWS
+"""
+
+
+def summarize(samples):
+    """Сводка по замерам в миллисекундах."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"count": 0}
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "min_ms": round(ordered[0], 3),
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "p50_ms": round(percentile(0.5), 3),
+        "p95_ms": round(percentile(0.95), 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def _revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=settings.BASE_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеры OntologyService на синтетической онтологии: create_object, "
+        "collect_signature (с кэшем и без), get_class_children, get_class_objects, "
+        "get_ontology и delete_class для каждого числа объектов. "
+        "Работает с Neo4j (узлы с уникальным префиксом uri, удаляются в конце) "
+        "или с бэкендом в памяти. Отчёт — JSON с отсортированными ключами, "
+        "чтобы сравнивать прогоны между версиями обычным diff."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backend", choices=BACKENDS, default=None,
+                            help="По умолчанию ONTOLOGY_BACKEND")
+        parser.add_argument("--sizes", default="1000,10000,100000",
+                            help="Число объектов на каждом шаге, через запятую")
+        parser.add_argument("--depth", type=int, default=3, help="Уровней иерархии под корнем")
+        parser.add_argument("--branching", type=int, default=4, help="Подклассов у каждого класса")
+        parser.add_argument("--datatype-properties", type=int, default=3, help="DatatypeProperty на класс")
+        parser.add_argument("--object-properties", type=int, default=1, help="ObjectProperty на класс")
+        parser.add_argument("--relations-per-object", type=int, default=1)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--repeat", type=int, default=20,
+                            help="Вызовов каждой операции (get_ontology — не больше 3, delete_class — один)")
+        parser.add_argument("--operations", default=",".join(OPERATIONS),
+                            help="Операции через запятую")
+        parser.add_argument("--batch-size", type=int, default=10000, help="Пакет загрузки в Neo4j")
+        parser.add_argument("--output", help="Файл отчёта (по умолчанию stdout)")
+
+    def handle(self, *args, **options):
+        backend = options["backend"] or settings.ONTOLOGY_BACKEND
+        selected = {op for op in options["operations"].split(",") if op}
+        unknown = selected - set(OPERATIONS)
+        if unknown:
+            raise CommandError(f"Unknown operations: {', '.join(sorted(unknown))}")
+        # порядок фиксирован: delete_class всегда последней
+        operations = [op for op in OPERATIONS if op in selected]
+        sizes = sorted(int(s) for s in options["sizes"].split(",") if s)
+
+        report = {
+            "backend": backend,
+            "revision": _revision(),
+            "python": platform.python_version(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "repeat": options["repeat"],
+            "steps": [],
+        }
+        for size in sizes:
+            spec = OntologySpec(
+                prefix=f"bench-{Neo4jRepository.generate_random_string(6)}-",
+                depth=options["depth"],
+                branching=options["branching"],
+                datatype_properties=options["datatype_properties"],
+                object_properties=options["object_properties"],
+                objects=size,
+                relations_per_object=options["relations_per_object"],
+                seed=options["seed"],
+            )
+            report.setdefault("shape", {k: v for k, v in asdict(spec).items() if k not in ("prefix", "objects")})
+            step = self._step(backend, SyntheticOntology(spec), operations, options)
+            report["steps"].append(step)
+            self.stderr.write(json.dumps({"objects": size, "load_seconds": step["load_seconds"]}))
+
+        output = json.dumps(report, indent=2, ensure_ascii=False, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
+
+    def _step(self, backend, ontology, operations, options):
+        if backend == BACKEND_NEO4J:
+            repo = Neo4jRepository()
+            bootstrap_schema(repo)
+        else:
+            from db.api.memory_repository import MemoryRepository
+            repo = MemoryRepository()
+
+        try:
+            started = time.perf_counter()
+            counts = ontology.load(repo, batch_size=options["batch_size"])
+            step = {
+                "objects": ontology.spec.objects,
+                "classes": ontology.classes,
+                **counts,
+                "load_seconds": round(time.perf_counter() - started, 3),
+                "operations": {},
+            }
+            service = OntologyService(repo)
+            for name in operations:
+                step["operations"][name] = summarize(getattr(self, f"_{name}")(service, ontology, options["repeat"]))
+            return step
+        finally:
+            if backend != BACKEND_MEMORY:
+                repo.run_custom_query(CLEANUP_QUERY, {"prefix": ontology.spec.prefix})
+            repo.close()
+
+    @staticmethod
+    def _timed(call, times):
+        samples = []
+        for _ in range(times):
+            started = time.perf_counter()
+            call()
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    # ---------- операции; каждая возвращает замеры в мс ----------
+    def _create_object(self, service, ontology, repeat):
+        # объекты создаются в самом глубоком классе: сигнатура с наибольшим числом предков
+        leaf, rng = ontology.leaf, random.Random(ontology.spec.seed)
+        template = ontology.object_properties(leaf)
+        samples = []
+        for n in range(repeat):
+            props = {**template, "uri": f"{ontology.spec.prefix}created-{n}"}
+            relations = ontology.object_relations(leaf, rng)
+            started = time.perf_counter()
+            service.create_object(ontology.class_uri(leaf), props, relations)
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    def _collect_signature_cold(self, service, ontology, repeat):
+        uri = ontology.class_uri(ontology.leaf)
+
+        def call():
+            service.signatures.invalidate()
+            service.collect_signature(uri)
+        return self._timed(call, repeat)
+
+    def _collect_signature_warm(self, service, ontology, repeat):
+        uri = ontology.class_uri(ontology.leaf)
+        service.collect_signature(uri)
+        return self._timed(lambda: service.collect_signature(uri), repeat)
+
+    def _get_class_children(self, service, ontology, repeat):
+        return self._timed(lambda: service.get_class_children(ontology.root_uri), repeat)
+
+    def _get_class_objects(self, service, ontology, repeat):
+        uri = ontology.class_uri(ontology.leaf)
+        return self._timed(lambda: service.get_class_objects(uri), repeat)
+
+    def _get_ontology(self, service, ontology, repeat):
+        return self._timed(service.get_ontology, min(repeat, 3))
+
+    def _delete_class(self, service, ontology, repeat):
+        # удаляет всё дерево классов с объектами, поэтому выполняется один раз и последним
+        return self._timed(lambda: service.delete_class(ontology.root_uri), 1)
@@ -0,0 +1,76 @@
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from scipy.stats import spearmanr
+
+from db.embeddings import cos_compare
+from db.models import ChunkEmbedding, TextEmbedding
+from db.quantization import ENCODINGS, dequantize, quantize_matrix, quantized_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает кодирования эмбеддингов (float32/float16/int8): память, "
+        "скорость скоринга и потерю ранговой корреляции относительно cos_compare на float32."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sample", type=int, default=2000, help="Сколько векторов взять из хранилища")
+        parser.add_argument("--queries", type=int, default=20, help="Сколько векторов выборки использовать как запросы")
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=5, help="Повторов при замере скорости")
+        parser.add_argument("--chunks", action="store_true", help="Брать эмбеддинги фрагментов вместо текстов")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def _load_sample(self, options):
+        model = ChunkEmbedding if options["chunks"] else TextEmbedding
+        rows = model.objects.order_by("?").values_list("dim", "vector", "encoding", "scale")[:options["sample"]]
+        vectors = [dequantize(data, dim, encoding, scale) for dim, data, encoding, scale in rows]
+        if not vectors:
+            raise CommandError("No stored embeddings; run manage.py embed_corpus or create texts first")
+        return np.vstack(vectors).astype(np.float32)
+
+    def handle(self, *args, **options):
+        matrix = self._load_sample(options)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix = matrix / norms
+
+        rng = np.random.default_rng(options["seed"])
+        query_rows = rng.choice(matrix.shape[0], min(options["queries"], matrix.shape[0]), replace=False)
+        queries = matrix[query_rows]
+        k = min(options["k"], matrix.shape[0])
+
+        # эталон: cos_compare на float32 для каждой пары (запрос, вектор выборки)
+        reference = np.array([[cos_compare(q, v) for v in matrix] for q in queries], dtype=np.float32)
+        reference_top = [set(np.argsort(-row)[:k]) for row in reference]
+
+        report = {"vectors": int(matrix.shape[0]), "dim": int(matrix.shape[1]), "k": k, "encodings": []}
+        float32_bytes = matrix.astype(np.float32).nbytes
+        for encoding in ENCODINGS:
+            quantized, scales = quantize_matrix(matrix, encoding)
+            stored_bytes = quantized.nbytes + (scales.nbytes if encoding == "int8" else 0)
+
+            started = time.perf_counter()
+            for _ in range(options["repeat"]):
+                scores = np.vstack([quantized_scores(quantized, scales, q, encoding) for q in queries])
+            elapsed = time.perf_counter() - started
+
+            rhos = [spearmanr(ref, got).correlation for ref, got in zip(reference, scores)]
+            recall = np.mean([
+                len(truth & set(np.argsort(-row)[:k])) / k for truth, row in zip(reference_top, scores)
+            ])
+            report["encodings"].append({
+                "encoding": encoding,
+                "bytes": int(stored_bytes),
+                "memory_saved": round(1 - stored_bytes / float32_bytes, 4),
+                "vectors_per_second": round(matrix.shape[0] * len(queries) * options["repeat"] / elapsed),
+                "spearman_mean": round(float(np.mean(rhos)), 6),
+                "spearman_loss": round(float(1 - np.mean(rhos)), 6),
+                f"recall@{k}": round(float(recall), 4),
+                "max_abs_error": round(float(np.max(np.abs(scores - reference))), 6),
+            })
+
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,75 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from db.api.repository import Neo4jRepository
+from db.api.schema import ONTOLOGY_LABEL, bootstrap_schema
+
+BENCH_LABEL = "UriLookupBench"
+
+CREATE_BATCH_QUERY = f"""
+UNWIND range($start, $end - 1) AS i
+CREATE (n:{BENCH_LABEL}:{ONTOLOGY_LABEL}:Object {{uri: $prefix + toString(i), title: 'bench ' + toString(i)}})
+"""
+
+LOOKUPS = {
+    # прежний вид запроса: без метки индекс не используется
+    "unlabelled": "MATCH (n {uri: $uri}) RETURN n LIMIT 1",
+    "labelled": f"MATCH (n:{ONTOLOGY_LABEL} {{uri: $uri}}) RETURN n LIMIT 1",
+}
+
+CLEANUP_QUERY = f"""
+MATCH (n:{BENCH_LABEL})
+CALL {{
+    WITH n
+    DETACH DELETE n
+}} IN TRANSACTIONS OF 10000 ROWS
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Задержка поиска узла по uri без метки и по метке OntologyNode "
+        "(через индекс ограничения) в зависимости от числа узлов. "
+        "Создаёт временные узлы с меткой UriLookupBench и удаляет их в конце."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,100000",
+                            help="Число узлов на каждом шаге, через запятую")
+        parser.add_argument("--lookups", type=int, default=200, help="Поисков на каждый вариант запроса")
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument("--keep", action="store_true", help="Не удалять созданные узлы")
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(s) for s in options["sizes"].split(",") if s)
+        prefix = f"bench-{Neo4jRepository.generate_random_string(6)}-"
+        repo = Neo4jRepository()
+        report = {"schema": None, "lookups": options["lookups"], "steps": []}
+        try:
+            report["schema"] = bootstrap_schema(repo)
+            created = 0
+            for size in sizes:
+                while created < size:
+                    end = min(size, created + options["batch_size"])
+                    repo.run_custom_query(CREATE_BATCH_QUERY, {"start": created, "end": end, "prefix": prefix})
+                    created = end
+
+                step = {"nodes": size}
+                for name, query in LOOKUPS.items():
+                    # равномерная выборка uri; первый запрос прогревает кэш плана
+                    uris = [f"{prefix}{(i * 7919) % size}" for i in range(options["lookups"])]
+                    repo.run_custom_query(query, {"uri": uris[0]})
+                    started = time.perf_counter()
+                    for uri in uris:
+                        repo.run_custom_query(query, {"uri": uri})
+                    step[f"{name}_ms"] = round((time.perf_counter() - started) * 1000 / len(uris), 3)
+                report["steps"].append(step)
+                self.stderr.write(json.dumps(step))
+        finally:
+            if not options["keep"]:
+                repo.run_custom_query(CLEANUP_QUERY)
+            repo.close()
+
+        self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from db.api.repository import Neo4jRepository
+from db.api.schema import bootstrap_schema
+
+
+class Command(BaseCommand):
+    help = (
+        "Создаёт ограничения уникальности uri для узлов онтологии и проставляет "
+        "общую метку OntologyNode узлам, созданным до её появления; строит замыкание "
+        "DESCENDANT_OF, если его нет. Идемпотентна."
+    )
+    # проверки db.E001 и db.E002 требуют как раз того, что делает команда
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000,
+                            help="Размер транзакции при проставлении метки")
+
+    def handle(self, *args, **options):
+        repo = Neo4jRepository()
+        try:
+            report = bootstrap_schema(repo, batch_size=options["batch_size"])
+        finally:
+            repo.close()
+
+        self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
+        if report["duplicates"]:
+            raise CommandError(
+                "Some constraints were not created because of duplicate uris; "
+                "resolve them and run the command again"
+            )
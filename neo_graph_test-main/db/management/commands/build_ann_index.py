@@ -0,0 +1,22 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from db.ann_index import get_ann_index
+
+
+class Command(BaseCommand):
+    help = "Строит IVF-индекс по сохранённым эмбеддингам фрагментов (ChunkEmbedding)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--nlist", type=int, default=None, help="Число списков (по умолчанию 4*sqrt(N))")
+        parser.add_argument("--sample-size", type=int, default=100000, help="Размер выборки для k-means")
+        parser.add_argument("--iterations", type=int, default=20, help="Итерации k-means")
+
+    def handle(self, *args, **options):
+        meta = get_ann_index().build(
+            nlist=options["nlist"],
+            sample_size=options["sample_size"],
+            iterations=options["iterations"],
+        )
+        self.stdout.write(json.dumps(meta, indent=2))
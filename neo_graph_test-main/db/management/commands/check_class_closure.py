@@ -0,0 +1,35 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from db.api.closure import check_closure, rebuild_closure
+from db.api.repository import Neo4jRepository
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверяет, что рёбра DESCENDANT_OF совпадают с транзитивным замыканием "
+        "SUBCLASS_OF (пары и глубины). С --repair перестраивает замыкание; "
+        "так же заполняется замыкание для данных, созданных до его появления."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repair", action="store_true", help="Перестроить замыкание при расхождении")
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument("--sample", type=int, default=20, help="Сколько примеров расхождений вывести")
+
+    def handle(self, *args, **options):
+        repo = Neo4jRepository()
+        try:
+            report = check_closure(repo, sample=options["sample"])
+            if not report["consistent"] and options["repair"]:
+                report["rebuild"] = rebuild_closure(repo, batch_size=options["batch_size"])
+                report["after_repair"] = check_closure(repo, sample=options["sample"])
+        finally:
+            repo.close()
+
+        self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
+        final = report.get("after_repair", report)
+        if not final["consistent"]:
+            raise CommandError("Class hierarchy closure is inconsistent" +
+                               ("" if options["repair"] else "; run with --repair"))
@@ -0,0 +1,99 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from db.dao import TextEmbeddingDAO
+from db.embeddings import DOCUMENT_POOLING, MODEL_NAME, POOLINGS, iter_batches
+from db.models import Text
+
+
+class Command(BaseCommand):
+    help = (
+        "Предрасчёт эмбеддингов для существующих текстов. Тексты читаются потоком "
+        "(.iterator()), режутся на фрагменты, кодируются большими батчами, отсортированными "
+        "по длине, и пишутся bulk-запросами. Прогресс сохраняется в файл контрольной точки, "
+        "прерванный запуск продолжается с места остановки."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--corpus", type=int, default=None, help="id корпуса (по умолчанию все тексты)")
+        parser.add_argument("--batch-size", type=int, default=256, help="Фрагментов в одном вызове модели")
+        parser.add_argument("--texts-per-commit", type=int, default=64, help="Текстов между контрольными точками")
+        parser.add_argument("--pooling", default=DOCUMENT_POOLING, choices=POOLINGS)
+        parser.add_argument("--checkpoint", default=None, help="Путь к файлу контрольной точки")
+        parser.add_argument("--restart", action="store_true", help="Игнорировать сохранённую контрольную точку")
+
+    def _checkpoint_path(self, options):
+        if options["checkpoint"]:
+            return options["checkpoint"]
+        scope = options["corpus"] if options["corpus"] is not None else "all"
+        return os.path.join(
+            settings.EMBEDDING_MATRIX_DIR, "checkpoints", f"embed_corpus-{scope}-{options['pooling']}.json"
+        )
+
+    @staticmethod
+    def _read_checkpoint(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_checkpoint(path, state):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+
+    def handle(self, *args, **options):
+        path = self._checkpoint_path(options)
+        state = None if options["restart"] else self._read_checkpoint(path)
+        # завершённый прогон начинается заново: актуальные тексты будут пропущены по хэшу
+        if not state or state.get("model_name") != MODEL_NAME or state.get("finished"):
+            state = {"model_name": MODEL_NAME, "last_id": 0, "texts": 0, "skipped": 0, "chunks": 0}
+        elif state.get("last_id"):
+            self.stdout.write(f"Resuming after text id {state['last_id']} ({path})")
+
+        queryset = Text.objects.filter(id__gt=state["last_id"]).order_by("id").only("id", "content")
+        if options["corpus"] is not None:
+            queryset = queryset.filter(corpus_id=options["corpus"])
+        total = queryset.count()
+
+        started = time.perf_counter()
+        texts_done = chunks_done = 0
+        for group in iter_batches(queryset.iterator(chunk_size=options["texts_per_commit"] * 4),
+                                  options["texts_per_commit"]):
+            stale = TextEmbeddingDAO.stale_texts(group, pooling=options["pooling"])
+            chunks = TextEmbeddingDAO.bulk_compute(stale, pooling=options["pooling"], batch_size=options["batch_size"])
+
+            texts_done += len(group)
+            chunks_done += chunks
+            state["last_id"] = group[-1].id
+            state["texts"] += len(stale)
+            state["skipped"] += len(group) - len(stale)
+            state["chunks"] += chunks
+            self._write_checkpoint(path, state)
+
+            elapsed = max(time.perf_counter() - started, 1e-9)
+            self.stdout.write(
+                f"{texts_done}/{total} texts, {chunks_done} chunks, "
+                f"{texts_done / elapsed:.1f} texts/s, {chunks_done / elapsed:.1f} chunks/s"
+            )
+
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        state["finished"] = True
+        self._write_checkpoint(path, state)
+        self.stdout.write(self.style.SUCCESS(json.dumps({
+            "texts": texts_done,
+            "embedded": state["texts"],
+            "skipped_up_to_date": state["skipped"],
+            "chunks": chunks_done,
+            "seconds": round(elapsed, 2),
+            "texts_per_second": round(texts_done / elapsed, 2),
+            "chunks_per_second": round(chunks_done / elapsed, 2),
+        })))
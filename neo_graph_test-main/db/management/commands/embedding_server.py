@@ -0,0 +1,46 @@
+import os
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from db.embedding_server import EmbeddingServer
+from db.embeddings import local_embeddings, preload_model
+
+
+class Command(BaseCommand):
+    help = (
+        "Запускает сервер эмбеддингов на Unix-сокете: единственный экземпляр модели "
+        "обслуживает все веб-воркеры (клиент включается через EMBEDDING_SERVER_SOCKET)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--socket",
+            default=settings.EMBEDDING_SERVER_SOCKET,
+            help="Путь к сокету (по умолчанию EMBEDDING_SERVER_SOCKET)",
+        )
+
+    def handle(self, *args, **options):
+        socket_path = options["socket"]
+        if not socket_path:
+            raise CommandError("Socket path is required: pass --socket or set EMBEDDING_SERVER_SOCKET")
+
+        preload_model()
+        server = EmbeddingServer(socket_path, local_embeddings)
+        # обработчик выполняется в главном потоке, где крутится serve_forever():
+        # server.shutdown() здесь ждал бы сам себя, поэтому цикл прерывается исключением
+        signal.signal(signal.SIGTERM, self._terminate)
+        self.stdout.write(f"Embedding server listening on {socket_path} (pid {os.getpid()})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+    @staticmethod
+    def _terminate(signum, frame):
+        raise KeyboardInterrupt
@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from db.api.ontology import (
+    OBJECT_PROPERTIES_TITLED_QUERY,
+    OBJECT_PROPERTY_EDGES_COUNT_QUERY,
+    OBJECT_PROPERTY_EDGES_RETYPE_QUERY,
+    object_property_edges_query,
+)
+from db.api.repository import PROJECTION_PROPERTIES, PROJECTION_SCALAR, Neo4jRepository
+
+
+class Command(BaseCommand):
+    help = (
+        "Переводит рёбра между объектами, созданные с типом title ObjectProperty, "
+        "на тип uri свойства — по нему их ищут удаление свойства и класса. "
+        "Рёбра ищутся от экземпляров классов области определения свойства, "
+        "так что одинаковые title у разных свойств не смешиваются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument("--dry-run", action="store_true", help="Только посчитать рёбра")
+
+    def handle(self, *args, **options):
+        repo = Neo4jRepository()
+        report = {"properties": []}
+        try:
+            for prop in repo.run_custom_query(OBJECT_PROPERTIES_TITLED_QUERY, projection=PROJECTION_PROPERTIES):
+                params = {"op_uri": prop["uri"], "batch_size": options["batch_size"]}
+                found = repo.run_custom_query(object_property_edges_query(OBJECT_PROPERTY_EDGES_COUNT_QUERY, prop["title"]),
+                                              params, projection=PROJECTION_SCALAR)[0]
+                row = {**prop, "edges": found}
+                if found and not options["dry_run"]:
+                    row["retyped"] = repo.run_custom_query(
+                        object_property_edges_query(OBJECT_PROPERTY_EDGES_RETYPE_QUERY, prop["title"]),
+                        params, projection=PROJECTION_SCALAR,
+                    )[0]
+                if found:
+                    report["properties"].append(row)
+        finally:
+            repo.close()
+        report["edges"] = sum(row["edges"] for row in report["properties"])
+        self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
@@ -0,0 +1,44 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand
+
+from db.api.repository import Neo4jRepository, PROJECTION_PROPERTIES
+from db.api.schema import SCHEMA_META_LABEL
+
+SNAPSHOT_NODES_QUERY = f"""
+MATCH (n)
+WHERE NOT n:{SCHEMA_META_LABEL}
+RETURN elementId(n) AS id, labels(n) AS labels, properties(n) AS properties
+"""
+
+SNAPSHOT_RELS_QUERY = """
+MATCH (a)-[r]->(b)
+RETURN elementId(a) AS start, elementId(b) AS end, type(r) AS type, properties(r) AS properties
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгружает граф Neo4j в JSON-снимок для бэкенда в памяти "
+        "(ONTOLOGY_BACKEND=memory, ONTOLOGY_SNAPSHOT=<файл>)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл снимка")
+
+    def handle(self, *args, **options):
+        repo = Neo4jRepository()
+        try:
+            data = {
+                "nodes": list(repo.iter_custom_query(SNAPSHOT_NODES_QUERY, projection=PROJECTION_PROPERTIES)),
+                "rels": list(repo.iter_custom_query(SNAPSHOT_RELS_QUERY, projection=PROJECTION_PROPERTIES)),
+            }
+        finally:
+            repo.close()
+
+        tmp = f"{options['path']}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+        os.replace(tmp, options["path"])
+        self.stdout.write(f"{len(data['nodes'])} nodes, {len(data['rels'])} relationships -> {options['path']}")
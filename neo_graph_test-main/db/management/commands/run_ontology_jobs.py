@@ -0,0 +1,87 @@
+import logging
+import os
+import signal
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from db.api.factory import BACKEND_MEMORY, create_repository
+from db.api.jobs import create_mutation
+from db.api.ontology import OntologyService
+from db.dao import OntologyJobDAO
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Воркер фоновых задач онтологии (?async=1 у удаления класса и атрибутов): "
+        "забирает задачи из очереди OntologyJob и выполняет их пакетами, "
+        "сохраняя контрольную точку после каждого пакета. Задачу упавшего "
+        "воркера подхватывает другой через ONTOLOGY_JOB_STALE_AFTER секунд. "
+        "По SIGTERM дописывает текущий пакет и возвращает задачу в очередь."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=settings.ONTOLOGY_JOB_BATCH_SIZE)
+        parser.add_argument("--poll-interval", type=float, default=settings.ONTOLOGY_JOB_POLL_INTERVAL)
+        parser.add_argument("--stale-after", type=float, default=settings.ONTOLOGY_JOB_STALE_AFTER)
+        parser.add_argument("--once", action="store_true", help="Выполнить задачи из очереди и выйти")
+
+    def handle(self, *args, **options):
+        if settings.ONTOLOGY_BACKEND == BACKEND_MEMORY:
+            raise CommandError("Background jobs require the neo4j backend: the memory graph is not shared between processes")
+
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        repo = create_repository()
+        service = OntologyService(repo)
+        self.stdout.write(f"Ontology job worker {worker} started")
+        try:
+            while not self._stopping:
+                job = OntologyJobDAO.claim_next(worker, options["stale_after"])
+                if job is None:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+                self._run(job, service, options["batch_size"])
+        finally:
+            repo.close()
+
+    def _stop(self, *_):
+        self._stopping = True
+
+    def _run(self, job, service, batch_size):
+        started = time.monotonic()
+        try:
+            mutation = create_mutation(service, job.kind, job.params, job.state)
+            if not mutation.prepared:
+                rows_total = mutation.prepare()
+                if not OntologyJobDAO.prepared(job, mutation.state, rows_total):
+                    return self._lost(job)
+            while not mutation.done:
+                if self._stopping:
+                    if OntologyJobDAO.release(job):
+                        self.stdout.write(f"Job {job.id} released at {job.rows_processed} rows")
+                    return
+                rows = mutation.run_batch(batch_size)
+                if not OntologyJobDAO.checkpoint(job, rows, mutation.state):
+                    return self._lost(job)
+        except Exception as exc:
+            logger.exception("Ontology job %s failed", job.id)
+            OntologyJobDAO.fail(job, f"{type(exc).__name__}: {exc}")
+            return
+        if not OntologyJobDAO.finish(job, mutation.stats):
+            return self._lost(job)
+        self.stdout.write(f"Job {job.id} ({job.kind}) done in {time.monotonic() - started:.1f}s: {mutation.stats}")
+
+    def _lost(self, job):
+        # пакет выполнялся дольше stale_after, и задачу забрал другой воркер:
+        # он продолжит с последней контрольной точки (пакеты идемпотентны)
+        logger.warning("Ontology job %s was taken over by another worker, dropping it", job.id)
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-16 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0002_corpus_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TextEmbedding',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=255, verbose_name='Модель')),
+                ('content_hash', models.CharField(max_length=64, verbose_name='Хэш содержимого')),
+                ('dim', models.PositiveIntegerField(verbose_name='Размерность')),
+                ('vector', models.BinaryField(verbose_name='Вектор')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлён')),
+                ('text', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='embeddings', to='db.Text', verbose_name='Текст')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='textembedding',
+            constraint=models.UniqueConstraint(fields=('text', 'model_name'), name='unique_text_embedding_model'),
+        ),
+    ]
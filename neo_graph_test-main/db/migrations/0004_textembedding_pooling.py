@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-16 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0003_textembedding'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='textembedding',
+            name='unique_text_embedding_model',
+        ),
+        # уже сохранённые векторы считались по целому (обрезанному моделью) тексту
+        migrations.AddField(
+            model_name='textembedding',
+            name='pooling',
+            field=models.CharField(default='truncate', max_length=16, verbose_name='Пулинг'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='textembedding',
+            name='pooling',
+            field=models.CharField(default='mean', max_length=16, verbose_name='Пулинг'),
+        ),
+        migrations.AddField(
+            model_name='textembedding',
+            name='chunk_count',
+            field=models.PositiveIntegerField(default=1, verbose_name='Число фрагментов'),
+        ),
+        migrations.AddConstraint(
+            model_name='textembedding',
+            constraint=models.UniqueConstraint(fields=('text', 'model_name', 'pooling'), name='unique_text_embedding_model_pooling'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-16 12:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0004_textembedding_pooling'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChunkEmbedding',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=255, verbose_name='Модель')),
+                ('chunk_index', models.PositiveIntegerField(verbose_name='Номер фрагмента')),
+                ('dim', models.PositiveIntegerField(verbose_name='Размерность')),
+                ('vector', models.BinaryField(verbose_name='Вектор')),
+                ('text', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunk_embeddings', to='db.Text', verbose_name='Текст')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='chunkembedding',
+            constraint=models.UniqueConstraint(fields=('text', 'model_name', 'chunk_index'), name='unique_chunk_embedding'),
+        ),
+    ]
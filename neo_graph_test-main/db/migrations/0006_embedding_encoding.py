@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-16 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0005_chunkembedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='textembedding',
+            name='encoding',
+            field=models.CharField(default='float32', max_length=16, verbose_name='Кодирование'),
+        ),
+        migrations.AddField(
+            model_name='textembedding',
+            name='scale',
+            field=models.FloatField(default=1.0, verbose_name='Масштаб'),
+        ),
+        migrations.AddField(
+            model_name='chunkembedding',
+            name='encoding',
+            field=models.CharField(default='float32', max_length=16, verbose_name='Кодирование'),
+        ),
+        migrations.AddField(
+            model_name='chunkembedding',
+            name='scale',
+            field=models.FloatField(default=1.0, verbose_name='Масштаб'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-16 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0006_embedding_encoding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OntologyJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=64, verbose_name='Тип')),
+                ('params', models.JSONField(default=dict, verbose_name='Параметры')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('running', 'Выполняется'), ('done', 'Завершена'), ('failed', 'Ошибка')], default='pending', max_length=16, verbose_name='Статус')),
+                ('state', models.JSONField(blank=True, default=dict, verbose_name='Контрольная точка')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Результат')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Ошибка')),
+                ('rows_total', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='Оценка числа строк')),
+                ('rows_processed', models.PositiveBigIntegerField(default=0, verbose_name='Обработано строк')),
+                ('batches', models.PositiveIntegerField(default=0, verbose_name='Пакетов')),
+                ('worker', models.CharField(blank=True, default='', max_length=255, verbose_name='Воркер')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начата')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлена')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершена')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='ontologyjob_status_created')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0007_ontologyjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ontologyjob',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Взята текущим воркером'),
+        ),
+        migrations.AddField(
+            model_name='ontologyjob',
+            name='claimed_rows',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Обработано строк к захвату'),
+        ),
+    ]
@@ -0,0 +1,82 @@
+import os
+import threading
+
+
+class ModelProvider:
+    """
+    Ленивый загрузчик SentenceTransformer.
+
+    Модель (и torch) загружаются при первом обращении, а не при импорте,
+    поэтому migrate, shell и прочие команды manage.py их не трогают.
+    Если задан local_path, модель читается из локального каталога без
+    обращений к Hugging Face Hub.
+
+    Для gunicorn с preload_app модель можно загрузить в master-процессе
+    до fork (preload) — веса тогда разделяются воркерами copy-on-write,
+    а after_fork в дочернем процессе сбрасывает блокировку и ограничивает
+    пул потоков torch.
+    """
+
+    def __init__(self, model_name, local_path=None, device=None, offline=False, torch_threads=None):
+        self.model_name = model_name
+        self.local_path = local_path or None
+        self.device = device or None
+        self.offline = offline
+        self.torch_threads = torch_threads
+        self._model = None
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def get(self):
+        """Возвращает модель, загружая её при первом вызове."""
+        if self._pid != os.getpid():
+            self.after_fork()
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    def preload(self):
+        """
+        Загружает модель заранее (в master-процессе до fork).
+        Объекты, созданные к этому моменту, замораживаются для сборщика мусора,
+        чтобы его обходы не трогали страницы с весами и не копировали их в воркерах.
+        """
+        model = self.get()
+        import gc
+        gc.collect()
+        gc.freeze()
+        return model
+
+    def after_fork(self):
+        """Вызывается в дочернем процессе после fork."""
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        if self._model is not None:
+            self._configure_torch()
+
+    def _configure_torch(self):
+        if not self.torch_threads:
+            return
+        import torch
+        torch.set_num_threads(int(self.torch_threads))
+
+    def _load(self):
+        if self.offline or self.local_path:
+            os.environ.setdefault("HF_HUB_OFFLINE", "1")
+            os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+        from sentence_transformers import SentenceTransformer
+
+        if self.local_path:
+            model = SentenceTransformer(self.local_path, device=self.device, local_files_only=True)
+        else:
+            model = SentenceTransformer(self.model_name, device=self.device)
+        model.eval()
+        self._configure_torch()
+        return model
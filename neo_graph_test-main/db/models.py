@@ -47,4 +47,115 @@ class Text(models.Model):
     def __str__(self):
         return self.name
 
-    
\ No newline at end of file
+
+class TextEmbedding(models.Model):
+    """Сохранённый эмбеддинг текста для конкретной модели"""
+    text = models.ForeignKey(
+        Text,
+        on_delete=models.CASCADE,
+        related_name="embeddings",
+        verbose_name="Текст"
+    )
+    model_name = models.CharField(max_length=255, verbose_name="Модель")
+    pooling = models.CharField(max_length=16, default="mean", verbose_name="Пулинг")
+    chunk_count = models.PositiveIntegerField(default=1, verbose_name="Число фрагментов")
+    content_hash = models.CharField(max_length=64, verbose_name="Хэш содержимого")
+    dim = models.PositiveIntegerField(verbose_name="Размерность")
+    vector = models.BinaryField(verbose_name="Вектор")
+    encoding = models.CharField(max_length=16, default="float32", verbose_name="Кодирование")
+    scale = models.FloatField(default=1.0, verbose_name="Масштаб")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлён")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["text", "model_name", "pooling"], name="unique_text_embedding_model_pooling"),
+        ]
+
+    def __str__(self):
+        return f"{self.text_id}:{self.model_name}:{self.pooling}"
+
+
+class ChunkEmbedding(models.Model):
+    """Эмбеддинг фрагмента текста (см. get_chunks)"""
+    text = models.ForeignKey(
+        Text,
+        on_delete=models.CASCADE,
+        related_name="chunk_embeddings",
+        verbose_name="Текст"
+    )
+    model_name = models.CharField(max_length=255, verbose_name="Модель")
+    chunk_index = models.PositiveIntegerField(verbose_name="Номер фрагмента")
+    dim = models.PositiveIntegerField(verbose_name="Размерность")
+    vector = models.BinaryField(verbose_name="Вектор")
+    encoding = models.CharField(max_length=16, default="float32", verbose_name="Кодирование")
+    scale = models.FloatField(default=1.0, verbose_name="Масштаб")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["text", "model_name", "chunk_index"], name="unique_chunk_embedding"),
+        ]
+
+    def __str__(self):
+        return f"{self.text_id}:{self.model_name}#{self.chunk_index}"
+
+
+class OntologyJob(models.Model):
+    """Фоновая задача изменения онтологии (очередь manage.py run_ontology_jobs)"""
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Ожидает"),
+        (STATUS_RUNNING, "Выполняется"),
+        (STATUS_DONE, "Завершена"),
+        (STATUS_FAILED, "Ошибка"),
+    ]
+
+    kind = models.CharField(max_length=64, verbose_name="Тип")
+    params = models.JSONField(default=dict, verbose_name="Параметры")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="Статус")
+    state = models.JSONField(default=dict, blank=True, verbose_name="Контрольная точка")
+    result = models.JSONField(null=True, blank=True, verbose_name="Результат")
+    error = models.TextField(blank=True, default="", verbose_name="Ошибка")
+    rows_total = models.PositiveBigIntegerField(null=True, blank=True, verbose_name="Оценка числа строк")
+    rows_processed = models.PositiveBigIntegerField(default=0, verbose_name="Обработано строк")
+    batches = models.PositiveIntegerField(default=0, verbose_name="Пакетов")
+    worker = models.CharField(max_length=255, blank=True, default="", verbose_name="Воркер")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создана")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Начата")
+    claimed_at = models.DateTimeField(null=True, blank=True, verbose_name="Взята текущим воркером")
+    claimed_rows = models.PositiveBigIntegerField(default=0, verbose_name="Обработано строк к захвату")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлена")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершена")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="ontologyjob_status_created"),
+        ]
+
+    @property
+    def progress(self):
+        if self.status == self.STATUS_DONE:
+            return 1.0
+        if not self.rows_total:
+            return None
+        return min(1.0, self.rows_processed / self.rows_total)
+
+    @property
+    def eta_seconds(self):
+        """
+        Оставшееся время по скорости текущего воркера: с захвата задачи,
+        без времени в очереди и работы прежних воркеров.
+        """
+        if self.status != self.STATUS_RUNNING or not self.claimed_at or not self.rows_total:
+            return None
+        done = self.rows_processed - self.claimed_rows
+        if done <= 0:
+            return None
+        elapsed = (self.updated_at - self.claimed_at).total_seconds()
+        remaining = max(0, self.rows_total - self.rows_processed)
+        return round(elapsed / done * remaining, 1)
+
+    def __str__(self):
+        return f"{self.id}:{self.kind}:{self.status}"
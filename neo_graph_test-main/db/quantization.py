@@ -0,0 +1,87 @@
+import numpy as np
+
+ENCODING_FLOAT32 = "float32"
+ENCODING_FLOAT16 = "float16"
+ENCODING_INT8 = "int8"
+ENCODINGS = (ENCODING_FLOAT32, ENCODING_FLOAT16, ENCODING_INT8)
+
+DTYPES = {
+    ENCODING_FLOAT32: np.float32,
+    ENCODING_FLOAT16: np.float16,
+    ENCODING_INT8: np.int8,
+}
+
+
+def check_encoding(encoding):
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown embedding encoding '{encoding}', expected one of {ENCODINGS}")
+    return encoding
+
+
+def quantize(vector, encoding=ENCODING_FLOAT32):
+    """
+    Кодирует вектор для хранения. Возвращает (байты, scale).
+    int8 — симметричное квантование с масштабом на вектор: v ≈ q * scale
+    (у нулевого вектора scale = 0).
+    """
+    check_encoding(encoding)
+    vector = np.asarray(vector, dtype=np.float32)
+    if encoding == ENCODING_INT8:
+        peak = float(np.max(np.abs(vector))) if vector.size else 0.0
+        scale = peak / 127.0
+        if not scale:
+            return np.zeros(vector.shape, dtype=np.int8).tobytes(), 0.0
+        q = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+        return q.tobytes(), scale
+    return vector.astype(DTYPES[encoding]).tobytes(), 1.0
+
+
+def dequantize(data, dim=None, encoding=ENCODING_FLOAT32, scale=1.0):
+    """
+    Восстанавливает float32-вектор из байтов, сохранённых quantize.
+    """
+    check_encoding(encoding)
+    vector = np.frombuffer(bytes(data), dtype=DTYPES[encoding])
+    if dim is not None and vector.shape[0] != dim:
+        raise ValueError(f"Embedding size mismatch: expected {dim}, got {vector.shape[0]}")
+    vector = vector.astype(np.float32)
+    if encoding == ENCODING_INT8:
+        vector *= np.float32(scale)
+    return vector
+
+
+def quantize_matrix(matrix, encoding=ENCODING_FLOAT32):
+    """
+    Кодирует матрицу построчно. Возвращает (матрица нужного dtype, scales float32).
+    """
+    check_encoding(encoding)
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if encoding == ENCODING_INT8:
+        peaks = np.max(np.abs(matrix), axis=1) if matrix.size else np.zeros(matrix.shape[0], np.float32)
+        scales = (peaks / 127.0).astype(np.float32)
+        # нулевые строки: scale = 0, q = 0
+        scaled = np.divide(matrix, scales[:, None], out=np.zeros_like(matrix), where=scales[:, None] > 0)
+        q = np.clip(np.rint(scaled), -127, 127).astype(np.int8)
+        return q, scales
+    return matrix.astype(DTYPES[encoding]), np.ones(matrix.shape[0], dtype=np.float32)
+
+
+def quantized_scores(matrix, scales, query, encoding=ENCODING_FLOAT32, block_rows=65536):
+    """
+    Скалярные произведения строк закодированной матрицы с float32-запросом.
+    Матрица не распаковывается целиком: блоки по block_rows строк переводятся
+    в float32 и умножаются (BLAS), масштаб int8 выносится за скобку:
+    (q * s) · x = s * (q · x).
+    """
+    check_encoding(encoding)
+    query = np.asarray(query, dtype=np.float32)
+    if encoding == ENCODING_FLOAT32:
+        return np.asarray(matrix @ query, dtype=np.float32)
+
+    scores = np.empty(matrix.shape[0], dtype=np.float32)
+    for start in range(0, matrix.shape[0], block_rows):
+        block = np.asarray(matrix[start:start + block_rows], dtype=np.float32)
+        scores[start:start + block.shape[0]] = block @ query
+    if encoding == ENCODING_INT8:
+        scores *= np.asarray(scales, dtype=np.float32)
+    return scores
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Corpus, Text
+from .models import Corpus, Text, OntologyJob
 
 
 class TextSerializer(serializers.ModelSerializer):
@@ -14,3 +14,16 @@ class CorpusSerializer(serializers.ModelSerializer):
     class Meta:
         model = Corpus
         fields = ["id", "name", "description", "genre", "texts"]
+
+
+class OntologyJobSerializer(serializers.ModelSerializer):
+    progress = serializers.ReadOnlyField()
+    eta_seconds = serializers.ReadOnlyField()
+
+    class Meta:
+        model = OntologyJob
+        fields = [
+            "id", "kind", "params", "status", "rows_processed", "rows_total", "batches",
+            "progress", "eta_seconds", "result", "error",
+            "created_at", "started_at", "updated_at", "finished_at",
+        ]
@@ -1,3 +1,466 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from db.ann_index import IVFIndex
+from db.api.closure import CLOSURE_EDGES_QUERY, check_closure, closure_missing
+from db.api.memory_repository import MemoryRepository
+from db.api.ontology import OntologyService
+from db.api.repository import PROJECTION_PROPERTIES, DuplicateUriError
+from db.embedding_server import (
+    OP_ENCODE,
+    OP_PING,
+    EmbeddingServerError,
+    FallbackClient,
+    encode_error,
+    encode_request,
+    encode_response,
+    read_request,
+    read_response,
+)
+from db.embeddings import MODEL_NAME
+from db.models import ChunkEmbedding, Corpus, Text
+from db.quantization import (
+    ENCODING_FLOAT16,
+    ENCODING_FLOAT32,
+    ENCODING_INT8,
+    dequantize,
+    quantize,
+    quantize_matrix,
+    quantized_scores,
+)
+
+
+class MemoryOntologyTestCase(SimpleTestCase):
+    """
+    OntologyService поверх MemoryRepository. Бэкенд в памяти сопоставляет
+    текст запросов из ontology.py с обработчиками, так что эти тесты падают
+    (NotImplementedError), если запрос изменили, а обработчик — нет.
+    """
+
+    def setUp(self):
+        self.repo = MemoryRepository()
+        self.service = OntologyService(self.repo)
+
+    def uris(self, nodes):
+        return [node["properties"]["uri"] for node in nodes]
+
+    def closure(self):
+        rows = self.repo.run_custom_query(CLOSURE_EDGES_QUERY, projection=PROJECTION_PROPERTIES)
+        return {(row["child"], row["ancestor"]): row["depth"] for row in rows}
+
+    def arcs(self, uri):
+        node = next(n for n in self.service.get_ontology() if n["properties"].get("uri") == uri)
+        return node["arcs"]
+
+
+class ClassHierarchyTests(MemoryOntologyTestCase):
+
+    def test_closure_depths_with_multiple_inheritance(self):
+        self.service.create_class("Animal", uri="animal")
+        self.service.create_class("Pet", uri="pet")
+        self.service.create_class("Dog", uri="dog", parent_uri="animal")
+        self.service.create_class("Puppy", uri="puppy", parent_uri="dog")
+        self.assertTrue(self.service.add_class_parent("pet", "dog"))
+
+        self.assertEqual(self.closure(), {
+            ("dog", "animal"): 1,
+            ("dog", "pet"): 1,
+            ("puppy", "dog"): 1,
+            ("puppy", "animal"): 2,
+            ("puppy", "pet"): 2,
+        })
+        self.assertTrue(check_closure(self.repo)["consistent"])
+        self.assertEqual(self.uris(self.service.get_class_parents("puppy"))[0], "dog")
+        self.assertEqual(set(self.uris(self.service.get_class_children("pet"))), {"dog", "puppy"})
+
+    def test_closure_missing(self):
+        self.assertFalse(closure_missing(self.repo))
+        self.repo.load_graph(
+            [{"id": uri, "labels": ["OntologyNode", "Class"], "properties": {"uri": uri}} for uri in ("a", "b")],
+            [{"start": "b", "end": "a", "type": "SUBCLASS_OF", "properties": {}}],
+        )
+        self.assertTrue(closure_missing(self.repo))
+        self.service.create_class("C", uri="c", parent_uri="b")
+        self.assertFalse(closure_missing(self.repo))
+
+    def test_add_parent_to_missing_class(self):
+        self.service.create_class("Animal", uri="animal")
+        self.assertFalse(self.service.add_class_parent("missing", "animal"))
+        self.assertEqual(self.closure(), {})
+
+
+class CreateObjectTests(MemoryOntologyTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.service.create_class("Person", uri="person")
+        self.service.create_class("Dog", uri="dog")
+        self.service.add_class_attribute("dog", "age", attr_uri="dog-age", attr_props={"type": "int"})
+        self.service.add_class_object_attribute("dog", "owner", "person", attr_uri="owner")
+        self.service.create_object("person", {"uri": "alice", "title": "Alice"})
+
+    def test_relations_and_unresolved(self):
+        dog = self.service.create_object("dog", {"uri": "rex", "age": "3", "colour": "red"}, [
+            {"rel_uri": "owner", "target_uri": "alice"},
+            {"rel_uri": "owner", "target_uri": "bob"},
+            {"rel_uri": "friend", "target_uri": "alice"},
+            {"rel_uri": "owner", "target_uri": "alice", "direction": 2},
+            {"rel_uri": "owner"},
+        ])
+
+        self.assertEqual(dog["properties"], {"uri": "rex", "age": 3})
+        self.assertEqual(
+            sorted((rel["target_uri"] or "", rel["reason"]) for rel in dog["unresolved_relations"]),
+            [("", "rel_uri and target_uri are required"),
+             ("alice", "direction must be 1 or -1"),
+             ("alice", "unknown relation"),
+             ("bob", "target not found")],
+        )
+        owner_arcs = [arc for arc in self.arcs("rex") if arc["type"] == "owner"]
+        self.assertEqual(len(owner_arcs), 1)
+        self.assertEqual(self.uris(self.service.get_class_objects("dog")), ["rex"])
+
+    def test_reverse_direction(self):
+        self.service.create_object("dog", {"uri": "rex"}, [
+            {"rel_uri": "owner", "target_uri": "alice", "direction": -1},
+        ])
+        self.assertEqual([arc["type"] for arc in self.arcs("alice")], ["TYPE_OF", "owner"])
+
+    def test_unknown_class(self):
+        with self.assertRaises(ValueError):
+            self.service.create_object("cat", {"uri": "tom"})
+        self.assertIsNone(self.service.get_object("tom"))
+
+    def test_invalid_value(self):
+        with self.assertRaises(ValueError):
+            self.service.create_object("dog", {"uri": "rex", "age": "old"})
+        self.assertIsNone(self.service.get_object("rex"))
+
+
+class PaginationTests(MemoryOntologyTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.service.create_class("Root", uri="root")
+        for i in range(3):
+            self.service.create_class(f"Sub {i}", uri=f"sub-{i}", parent_uri="root")
+        self.service.create_class("Leaf", uri="leaf", parent_uri="sub-0")
+        for i in range(5):
+            self.service.create_object("root", {"uri": f"obj-root-{i}"})
+        for i in range(20):
+            self.service.create_object(f"sub-{i % 3}", {"uri": f"obj-sub-{i:02d}"})
+
+    def walk(self, method, uri, **kwargs):
+        items, after, counts = [], None, set()
+        while True:
+            page = method(uri, after=after, **kwargs)
+            items.extend(self.uris(page["items"]))
+            counts.add(page["count"])
+            after = page["next"]
+            if after is None:
+                return items, counts
+
+    def test_children_pages(self):
+        items, counts = self.walk(self.service.get_class_children_page, "root", limit=2)
+        self.assertEqual(items, ["leaf", "sub-0", "sub-1", "sub-2"])
+        self.assertEqual(counts, {4})
+
+        items, counts = self.walk(self.service.get_class_children_page, "root", limit=2, include_subclasses=False)
+        self.assertEqual(items, ["sub-0", "sub-1", "sub-2"])
+        self.assertEqual(counts, {3})
+
+    def test_object_pages(self):
+        # маленький класс — раскрытие TYPE_OF, поддерево — проход по uri
+        for limit in (1, 3, 100):
+            items, counts = self.walk(self.service.get_class_objects_page, "root", limit=limit)
+            self.assertEqual(items, [f"obj-root-{i}" for i in range(5)])
+            self.assertEqual(counts, {5})
+
+            items, counts = self.walk(self.service.get_class_objects_page, "root", limit=limit,
+                                      include_subclasses=True)
+            self.assertEqual(items, sorted(items))
+            self.assertEqual(len(items), 25)
+            self.assertEqual(len(set(items)), 25)
+            self.assertEqual(counts, {25})
+
+    def test_missing_class_page(self):
+        self.assertEqual(self.service.get_class_objects_page("missing"), {"items": [], "next": None, "count": 0})
+        self.assertEqual(self.service.get_class_children_page("missing"), {"items": [], "next": None, "count": 0})
+
+
+class DeleteClassTests(MemoryOntologyTestCase):
+
+    def test_cascade_stats(self):
+        self.service.create_class("Animal", uri="animal")
+        self.service.create_class("Dog", uri="dog", parent_uri="animal")
+        self.service.create_class("Person", uri="person")
+        self.service.add_class_attribute("animal", "name", attr_uri="animal-name")
+        self.service.add_class_attribute("dog", "breed", attr_uri="dog-breed")
+        self.service.add_class_object_attribute("dog", "friend", "dog", attr_uri="friend")
+        self.service.add_class_object_attribute("person", "pet", "animal", attr_uri="pet")
+        self.service.create_object("person", {"uri": "alice"})
+        self.service.create_object("animal", {"uri": "generic"})
+        self.service.create_object("dog", {"uri": "rex"})
+        self.service.create_object("dog", {"uri": "fido"}, [{"rel_uri": "friend", "target_uri": "rex"}])
+
+        stats = self.service.delete_class("animal", batch_size=1)
+
+        self.assertEqual(stats, {
+            "classes_deleted": 2,
+            "objects_deleted": 3,
+            "dp_deleted": 2,
+            "op_deleted": 1,
+            "relations_deleted": 1,
+        })
+        # ObjectProperty удаляется по DOMAIN; у pet удалённый класс только в RANGE
+        remaining = sorted(n["properties"]["uri"] for n in self.service.get_ontology())
+        self.assertEqual(remaining, ["alice", "person", "pet"])
+        self.assertTrue(check_closure(self.repo)["consistent"])
+
+    def test_missing_class(self):
+        self.assertEqual(self.service.delete_class("missing")["classes_deleted"], 0)
+
+
+class TransactionTests(MemoryOntologyTestCase):
+
+    def test_write_rolls_back_on_exception(self):
+        self.service.create_class("Animal", uri="animal")
+
+        def work(uow):
+            service = OntologyService(uow)
+            service.create_class("Dog", uri="dog", parent_uri="animal")
+            service.add_class_attribute("animal", "name", attr_uri="animal-name")
+            uow.update_node("animal", {"title": "Changed"}, merge=True)
+            raise RuntimeError("abort")
+
+        with self.assertRaises(RuntimeError):
+            self.repo.write(work)
+
+        self.assertEqual(self.uris(self.service.get_ontology()), ["animal"])
+        self.assertEqual(self.service.get_class("animal")["properties"]["title"], "Animal")
+        self.assertEqual(self.closure(), {})
+
+    def test_duplicate_uri_leaves_graph_unchanged(self):
+        self.service.create_class("Animal", uri="animal")
+        with self.assertRaises(DuplicateUriError):
+            self.service.create_class("Animal again", uri="animal", parent_uri="animal")
+        self.assertEqual(len(self.service.get_ontology()), 1)
+
+
+class SignatureGenerationTests(MemoryOntologyTestCase):
+
+    def test_schema_change_seen_by_other_service(self):
+        # два сервиса с отдельными кэшами над одной базой — как два воркера
+        other = OntologyService(self.repo)
+        self.service.create_class("Dog", uri="dog")
+        self.service.add_class_attribute("dog", "age", attr_uri="dog-age", attr_props={"type": "int"})
+        self.assertEqual(other.create_object("dog", {"uri": "rex", "age": "3"})["properties"],
+                         {"uri": "rex", "age": 3})
+
+        self.service.add_class_attribute("dog", "name", attr_uri="dog-name")
+        dog = other.create_object("dog", {"uri": "fido", "age": "2", "name": "Fido"})
+        self.assertEqual(dog["properties"], {"uri": "fido", "age": 2, "name": "Fido"})
+
+        self.service.delete_class_attribute("dog", attr_uri="dog-age")
+        dog = other.create_object("dog", {"uri": "max", "age": "5", "name": "Max"})
+        self.assertEqual(dog["properties"], {"uri": "max", "name": "Max"})
+
+
+class QuantizationTests(SimpleTestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.matrix = rng.standard_normal((50, 32)).astype(np.float32)
+        self.query = rng.standard_normal(32).astype(np.float32)
+
+    def test_int8_round_trip_within_scale(self):
+        for vector in self.matrix:
+            data, scale = quantize(vector, ENCODING_INT8)
+            restored = dequantize(data, 32, ENCODING_INT8, scale)
+            self.assertAlmostEqual(scale, float(np.max(np.abs(vector))) / 127, places=6)
+            # округление до ближайшего шага: ошибка не больше половины scale
+            self.assertLessEqual(float(np.max(np.abs(restored - vector))), scale / 2 + 1e-6)
+
+    def test_float16_scores_match_float32(self):
+        expected = quantized_scores(*quantize_matrix(self.matrix, ENCODING_FLOAT32), self.query, ENCODING_FLOAT32)
+        q, scales = quantize_matrix(self.matrix, ENCODING_FLOAT16)
+        scores = quantized_scores(q, scales, self.query, ENCODING_FLOAT16, block_rows=7)
+        np.testing.assert_allclose(scores, expected, rtol=1e-2, atol=1e-2)
+
+    def test_int8_scores_match_float32(self):
+        expected = self.matrix @ self.query
+        q, scales = quantize_matrix(self.matrix, ENCODING_INT8)
+        scores = quantized_scores(q, scales, self.query, ENCODING_INT8, block_rows=7)
+        np.testing.assert_allclose(scores, expected, atol=float(np.abs(self.query).sum() * scales.max() / 2))
+
+    def test_zero_vector(self):
+        data, scale = quantize(np.zeros(8), ENCODING_INT8)
+        self.assertEqual(scale, 0.0)
+        np.testing.assert_array_equal(dequantize(data, 8, ENCODING_INT8, scale), np.zeros(8))
+
+        matrix = np.vstack([np.zeros(8), np.ones(8)])
+        q, scales = quantize_matrix(matrix, ENCODING_INT8)
+        self.assertEqual(scales[0], 0.0)
+        np.testing.assert_array_equal(q[0], np.zeros(8))
+        np.testing.assert_allclose(quantized_scores(q, scales, np.ones(8), ENCODING_INT8), [0.0, 8.0])
+
+
+def basis(i, dim=8):
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[i] = 1.0
+    return vector
+
+
+class IVFIndexTestCase(SimpleTestCase):
+    """Индекс во временном каталоге; базовый сегмент пишется прямо в файлы, без build."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+        # два списка: первые и последние четыре оси
+        self.centroids = np.vstack([np.repeat([1, 0], 4), np.repeat([0, 1], 4)]).astype(np.float32) / 2
+
+    def write_segment(self, generation, ids, text_ids, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        assign = np.argmax(vectors @ self.centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        offsets = np.zeros(self.centroids.shape[0] + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assign, minlength=self.centroids.shape[0]))
+        arrays = {
+            "vectors": vectors[order],
+            "ids": np.asarray(ids, dtype=np.int64)[order],
+            "text_ids": np.asarray(text_ids, dtype=np.int64)[order],
+            "centroids": self.centroids,
+            "offsets": offsets,
+        }
+        files = {}
+        for name, array in arrays.items():
+            files[name] = f"{name}-{generation}.npy"
+            np.save(os.path.join(self.directory, files[name]), array)
+        meta = {"generation": generation, "model_name": MODEL_NAME, "dim": vectors.shape[1],
+                "nlist": self.centroids.shape[0], "count": len(ids), "files": files}
+        with open(os.path.join(self.directory, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    def hits(self, index, vector, k=3):
+        return [chunk_id for chunk_id, _, _ in index.search(vector, k=k, nprobe=2)]
+
+
+class IVFIndexTests(IVFIndexTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write_segment("1", [1, 2, 3], [10, 20, 30], [basis(0), basis(1), basis(5)])
+
+    def test_search_segment(self):
+        self.assertEqual(self.hits(IVFIndex(self.directory), basis(5), k=1), [3])
+
+    def test_inserts_visible_to_other_instances(self):
+        writer, reader = IVFIndex(self.directory), IVFIndex(self.directory)
+        self.assertEqual(self.hits(reader, basis(6), k=1), [3])
+        self.assertEqual(writer.add([(4, 40, basis(6))]), 1)
+        self.assertEqual(self.hits(reader, basis(6), k=1), [4])
+        self.assertEqual(reader.search_texts(basis(6), k=1), [(40, 1.0)])
+
+    def test_tombstones_hide_hits(self):
+        writer, reader = IVFIndex(self.directory), IVFIndex(self.directory)
+        writer.add([(4, 40, basis(0))])
+        writer.remove([1, 4])
+        self.assertNotIn(1, self.hits(reader, basis(0)))
+        self.assertNotIn(4, self.hits(reader, basis(0)))
+        self.assertEqual(reader.stats()["tombstones"], 2)
+
+
+class IVFIndexBuildTests(IVFIndexTestCase, TestCase):
+
+    def test_pending_changes_survive_generation_switch(self):
+        text = Text.objects.create(name="t", content="t", corpus=Corpus.objects.create(name="c", genre="g"))
+        chunks = [
+            ChunkEmbedding.objects.create(text=text, model_name=MODEL_NAME, chunk_index=i, dim=8,
+                                          vector=basis(axis).tobytes())
+            for i, axis in enumerate((0, 1, 4, 5))
+        ]
+        ids = [chunk.id for chunk in chunks]
+        self.write_segment("1", ids, [text.id] * 4, [basis(axis) for axis in (0, 1, 4, 5)])
+        index = IVFIndex(self.directory)
+        pending = max(ids) + 100
+        index.add([(pending, text.id, basis(6))])
+        index.remove([ids[0]])
+
+        meta = index.build(nlist=2, iterations=5)
+
+        self.assertNotEqual(meta["generation"], "1")
+        self.assertEqual(meta["count"], 4)
+        # запись журнала старого поколения перенесена в новое, надгробие тоже
+        other = IVFIndex(self.directory)
+        self.assertEqual(self.hits(other, basis(6), k=1), [pending])
+        self.assertNotIn(ids[0], self.hits(other, basis(0), k=4))
+        self.assertEqual(self.hits(other, basis(1), k=1), [ids[1]])
+        stats = other.stats()
+        self.assertEqual((stats["pending_inserts"], stats["tombstones"]), (1, 1))
+        # файлы предыдущей сборки остаются для процессов, ещё не перечитавших meta.json
+        self.assertTrue(os.path.exists(os.path.join(self.directory, "vectors-1.npy")))
+
+
+class BufferSocket:
+    """Сокет с одним recv поверх байтов: протокол читается без соединения."""
+
+    def __init__(self, data):
+        self.buffer = io.BytesIO(data)
+
+    def recv(self, size):
+        return self.buffer.read(size)
+
+
+class EmbeddingProtocolTests(SimpleTestCase):
+
+    def test_request_round_trip(self):
+        texts = ["привет", "", "x" * 70000]
+        self.assertEqual(read_request(BufferSocket(encode_request(texts))), (OP_ENCODE, texts))
+        self.assertEqual(read_request(BufferSocket(encode_request([], op=OP_PING))), (OP_PING, []))
+
+    def test_response_round_trip(self):
+        embeddings = np.arange(12, dtype=np.float32).reshape(3, 4) / 7
+        np.testing.assert_array_equal(read_response(BufferSocket(encode_response(embeddings))), embeddings)
+        self.assertEqual(read_response(BufferSocket(encode_response(np.zeros(0)))).shape, (0, 0))
+
+    def test_error_response(self):
+        with self.assertRaisesRegex(EmbeddingServerError, "model failed"):
+            read_response(BufferSocket(encode_error("RuntimeError: model failed")))
+
+    def test_bad_magic_and_truncation(self):
+        with self.assertRaises(EmbeddingServerError):
+            read_request(BufferSocket(b"XXXX" + encode_request(["a"])[4:]))
+        with self.assertRaises(ConnectionError):
+            read_request(BufferSocket(encode_request(["abc"])[:-1]))
+
+
+class FallbackClientTests(SimpleTestCase):
+
+    class DownClient:
+        calls = 0
+
+        def encode(self, texts):
+            self.calls += 1
+            raise ConnectionRefusedError("no server")
+
+    def local_encode(self, texts):
+        return np.ones((len(texts), 2), dtype=np.float32)
+
+    def test_falls_back_and_skips_server_while_down(self):
+        server = self.DownClient()
+        client = FallbackClient(server, self.local_encode, retry_after=60)
+        self.assertEqual(client.encode(["a", "b"]).shape, (2, 2))
+        client.encode(["c"])
+        self.assertEqual(server.calls, 1)
+
+    def test_no_fallback_raises(self):
+        client = FallbackClient(self.DownClient(), self.local_encode, fallback=False)
+        with self.assertRaises(OSError):
+            client.encode(["a"])
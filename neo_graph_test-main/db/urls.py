@@ -1,7 +1,13 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
 
+if settings.ONTOLOGY_ASYNC:
+    from . import async_views as ontology_views
+else:
+    ontology_views = views
+
 from db.views import (
     getTest,
     postTest,
@@ -24,25 +30,26 @@ urlpatterns = [
     path("text/<int:text_id>", views.get_text, name="get_text"),
     path("text/<int:text_id>/update", views.update_text, name="update_text"),
     path("text/<int:text_id>/delete", views.delete_text, name="delete_text"),
+    path("text/<int:text_id>/similar", views.similar_texts, name="similar_texts"),
 
     #Ontology
-    path("ontology", views.get_ontology, name="get_ontology"),
-    path("ontology/parents", views.get_ontology_parents, name="get_ontology_parents"),
+    path("ontology", ontology_views.get_ontology, name="get_ontology"),
+    path("ontology/parents", ontology_views.get_ontology_parents, name="get_ontology_parents"),
 
     # Class
-    path("class/create", views.create_class, name="create_class"),
-    path("class/<str:uri>", views.get_class, name="get_class"),
-    path("class/<str:uri>/parents", views.get_class_parents, name="get_class_parents"),
-    path("class/<str:uri>/children", views.get_class_children, name="get_class_children"),
-    path("class/<str:uri>/objects", views.get_class_objects, name="get_class_objects"),
-    path("class/<str:uri>/update", views.update_class, name="update_class"),
-    path("class/<str:uri>/delete", views.delete_class, name="delete_class"),
+    path("class/create", ontology_views.create_class, name="create_class"),
+    path("class/<str:uri>", ontology_views.get_class, name="get_class"),
+    path("class/<str:uri>/parents", ontology_views.get_class_parents, name="get_class_parents"),
+    path("class/<str:uri>/children", ontology_views.get_class_children, name="get_class_children"),
+    path("class/<str:uri>/objects", ontology_views.get_class_objects, name="get_class_objects"),
+    path("class/<str:uri>/update", ontology_views.update_class, name="update_class"),
+    path("class/<str:uri>/delete", ontology_views.delete_class, name="delete_class"),
 
     # Object
-    path("object/create", views.create_object, name="create_object"),
-    path("object/<str:uri>", views.get_object, name="get_object"),
-    path("object/<str:uri>/update", views.update_object, name="update_object"),
-    path("object/<str:uri>/delete", views.delete_object, name="delete_object"),
+    path("object/create", ontology_views.create_object, name="create_object"),
+    path("object/<str:uri>", ontology_views.get_object, name="get_object"),
+    path("object/<str:uri>/update", ontology_views.update_object, name="update_object"),
+    path("object/<str:uri>/delete", ontology_views.delete_object, name="delete_object"),
 
     # Class attributes
     path("class/<str:uri>/attribute/add", views.add_class_attribute, name="add_class_attribute"),
@@ -58,6 +65,14 @@ urlpatterns = [
     # Signature
     path("class/<str:uri>/collect-signature", views.collect_signature, name="collect_signature"),
 
+    # Background jobs
+    path("jobs/<int:job_id>", views.get_ontology_job, name="get_ontology_job"),
+
+    # Neo4j query statistics (admin only)
+    path("neo4j/query-stats", views.neo4j_query_stats, name="neo4j_query_stats"),
+
     # Embeddings
     path("compare/<int:id1>/<int:id2>", views.compare_texts, name="compare_texts"),
+    path("compare/matrix", views.compare_matrix, name="compare_matrix"),
+    path("embeddings/stats", views.embedding_stats, name="embedding_stats"),
 ]
\ No newline at end of file
@@ -14,7 +14,7 @@ import numpy as np
 # API IMPORTS
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 
 # REPO IMPORTS
 from db.api.TestRepository import TestRepository
@@ -22,15 +22,27 @@ from db.api.TestRepository import TestRepository
 
 from rest_framework import status
 
-from .dao import CorpusDAO, TextDAO
-from .serializers import CorpusSerializer, TextSerializer
+from .dao import CorpusDAO, TextDAO, OntologyJobDAO
+from .serializers import CorpusSerializer, TextSerializer, OntologyJobSerializer
 from .models import Corpus, Text
 from .api.ontology import OntologyService
-from .api.repository import Neo4jRepository
+from .api.factory import BACKEND_MEMORY, create_repository
+from .api.instrumentation import query_stats
+from .api.repository import DuplicateUriError
+from .api.jobs import DeleteClassAttributeJob, DeleteClassJob, DeleteObjectAttributeJob
+from django.conf import settings
+from django.urls import reverse
 
 from pprint import pprint
 
-from .embedding_service import compare_texts_by_ids
+from .embedding_service import (
+    compare_texts_by_ids,
+    find_similar_texts,
+    resolve_text_ids,
+    iter_similarity_matrix,
+    normalized_matrix,
+)
+from .embeddings import dispatcher
 
 
 @api_view(['GET', ])
@@ -154,15 +166,76 @@ def delete_text(request, text_id):
 
 
 # Создаем сервис (лучше потом вынести в DI контейнер / singleton)
-repo = Neo4jRepository()
+repo = create_repository()
 service = OntologyService(repo)
 
 
 # ---------- Ontology ----------
 
+ONTOLOGY_PAGE_MAX = 5000
+
+CLASS_PAGE_PARAMS = ("limit", "after", "include_subclasses")
+
+
+def class_page_params(query_params, include_subclasses: bool):
+    """
+    Параметры страницы для /class/<uri>/children и /objects: {"after", "limit",
+    "include_subclasses"}. None — параметров нет, ответ прежним списком.
+    ValueError — limit не число.
+    """
+    if not any(name in query_params for name in CLASS_PAGE_PARAMS):
+        return None
+    limit = max(1, min(int(query_params.get("limit", 500)), ONTOLOGY_PAGE_MAX))
+    flag = query_params.get("include_subclasses")
+    return {
+        "after": query_params.get("after") or None,
+        "limit": limit,
+        "include_subclasses": include_subclasses if flag is None else flag in ("1", "true"),
+    }
+
+
+# ---------- Фоновые задачи ----------
+
+def wants_job(request):
+    """?async=1 — выполнить изменение фоновой задачей (manage.py run_ontology_jobs)."""
+    return request.GET.get("async") in ("1", "true")
+
+
+def submit_job(kind, params):
+    """Ставит задачу в очередь; возвращает (тело ответа, статус) — 202 со ссылкой на /jobs/<id>."""
+    if settings.ONTOLOGY_BACKEND == BACKEND_MEMORY:
+        return {"error": "background jobs require the neo4j backend"}, status.HTTP_400_BAD_REQUEST
+    job = OntologyJobDAO.submit(kind, params)
+    body = {"job_id": job.id, "status": job.status, "status_url": reverse("get_ontology_job", args=[job.id])}
+    return body, status.HTTP_202_ACCEPTED
+
+
+@api_view(["GET"])
+@permission_classes((AllowAny,))
+def get_ontology_job(request, job_id):
+    """Статус задачи: обработано строк, оценка общего числа, прогресс и ETA."""
+    return Response(OntologyJobSerializer(OntologyJobDAO.get_job(job_id)).data)
+
+
 @api_view(["GET"])
 @permission_classes((AllowAny,))
 def get_ontology(request):
+    """
+    Вся онтология. ?stream=1 — поток NDJSON (узел с исходящими рёбрами на строку);
+    ?limit=&after= — страница с курсором next.
+    """
+    if request.GET.get("stream") in ("1", "true", "ndjson"):
+        lines = (json.dumps(node, ensure_ascii=False, default=str) + "\n" for node in service.iter_ontology())
+        return StreamingHttpResponse(lines, content_type="application/x-ndjson")
+
+    if "limit" in request.GET or "after" in request.GET:
+        try:
+            limit = int(request.GET.get("limit", 500))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, ONTOLOGY_PAGE_MAX))
+        return Response(service.get_ontology_page(after=request.GET.get("after") or None, limit=limit))
+
     data = service.get_ontology()
     return Response(data)
 
@@ -193,6 +266,16 @@ def get_class_parents(request, uri: str):
 @api_view(["GET"])
 @permission_classes((AllowAny,))
 def get_class_children(request, uri: str):
+    """
+    Все потомки класса списком. ?limit=&after=&include_subclasses= — страница
+    {"items", "next", "count"} в порядке uri; include_subclasses=0 — только прямые подклассы.
+    """
+    try:
+        page = class_page_params(request.GET, include_subclasses=True)
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+    if page is not None:
+        return Response(service.get_class_children_page(uri, **page))
     data = service.get_class_children(uri)
     return Response(data)
 
@@ -200,6 +283,16 @@ def get_class_children(request, uri: str):
 @api_view(["GET"])
 @permission_classes((AllowAny,))
 def get_class_objects(request, uri: str):
+    """
+    Объекты класса списком. ?limit=&after=&include_subclasses= — страница
+    {"items", "next", "count"} в порядке uri; include_subclasses=1 — вместе с объектами потомков.
+    """
+    try:
+        page = class_page_params(request.GET, include_subclasses=False)
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+    if page is not None:
+        return Response(service.get_class_objects_page(uri, **page))
     data = service.get_class_objects(uri)
     return Response(data)
 
@@ -211,7 +304,12 @@ def create_class(request):
     description = request.data.get("description", "")
     uri = request.data.get("uri")
     parent_uri = request.data.get("parent_uri")
-    node = service.create_class(title, description, uri, parent_uri)
+    try:
+        node = service.create_class(title, description, uri, parent_uri)
+    except DuplicateUriError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_409_CONFLICT)
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
     return Response(node, status=status.HTTP_201_CREATED)
 
 
@@ -227,6 +325,9 @@ def update_class(request, uri: str):
 @api_view(["DELETE"])
 @permission_classes((AllowAny,))
 def delete_class(request, uri: str):
+    if wants_job(request):
+        body, code = submit_job(DeleteClassJob.kind, {"class_uri": uri})
+        return Response(body, status=code)
     stats = service.delete_class(uri)
     return Response(stats)
 
@@ -251,8 +352,14 @@ def create_object(request):
 
     relations = request.data.get("relations", {})
 
-    # Создаём объект через OntologyService
-    node = service.create_object(class_uri, props, relations)
+    # Создаём объект через OntologyService; ошибки приведения типов и неизвестный класс — 400,
+    # занятый uri — 409
+    try:
+        node = service.create_object(class_uri, props, relations)
+    except DuplicateUriError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_409_CONFLICT)
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
     # Node уже словарь с _type и properties, безопасный для JSON
     return Response(node, status=status.HTTP_201_CREATED)
@@ -262,7 +369,10 @@ def create_object(request):
 @permission_classes((AllowAny,))
 def update_object(request, uri: str):
     props = request.data.get("properties", {})
-    node = service.update_object(uri, props)
+    try:
+        node = service.update_object(uri, props)
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
     return Response(node)
 
 
@@ -286,6 +396,9 @@ def add_class_attribute(request, uri):
 @api_view(["DELETE"])
 @permission_classes((AllowAny,))
 def delete_class_attribute(request, uri, attr_name):
+    if wants_job(request):
+        body, code = submit_job(DeleteClassAttributeJob.kind, {"class_uri": uri, "attr_name": attr_name})
+        return Response(body, status=code)
     res = service.delete_class_attribute(uri, attr_name)
     return JsonResponse({"deleted": res})
 
@@ -303,6 +416,9 @@ def add_class_object_attribute(request, uri):
 @api_view(["DELETE"])
 @permission_classes((AllowAny,))
 def delete_class_object_attribute(request, object_property_uri):
+    if wants_job(request):
+        body, code = submit_job(DeleteObjectAttributeJob.kind, {"object_property_uri": object_property_uri})
+        return Response(body, status=code)
     res = service.delete_class_object_attribute(object_property_uri)
     return JsonResponse({"deleted": res})
 
@@ -317,6 +433,31 @@ def add_class_parent(request, uri):
     return JsonResponse(res, safe=False)
 
 
+# ---------- Статистика запросов Neo4j ----------
+QUERY_STATS_SORT_FIELDS = ("total_ms", "mean_ms", "max_ms", "count", "slow", "rows", "errors")
+
+
+@api_view(["GET", "DELETE"])
+@permission_classes((IsAdminUser,))
+def neo4j_query_stats(request):
+    """
+    Статистика запросов к Neo4j по формам в этом процессе (у каждого воркера своя).
+    ?sort=total_ms|mean_ms|max_ms|count|slow|rows|errors, ?limit=N; DELETE — сброс.
+    """
+    if request.method == "DELETE":
+        query_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    sort = request.GET.get("sort", "total_ms")
+    if sort not in QUERY_STATS_SORT_FIELDS:
+        return Response({"error": f"sort must be one of {', '.join(QUERY_STATS_SORT_FIELDS)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = int(request.GET.get("limit", 0)) or None
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(query_stats.snapshot(sort=sort, limit=limit))
+
+
 # ---------- Collect Signature ----------
 @api_view(["GET"])
 @permission_classes((AllowAny,))
@@ -335,4 +476,72 @@ def compare_texts(request, id1, id2):
     
     similarity = compare_texts_by_ids(id1, id2)
 
-    return Response({"similarity": similarity})
\ No newline at end of file
+    return Response({"similarity": similarity})
+
+
+@api_view(["GET"])
+@permission_classes((AllowAny,))
+def similar_texts(request, text_id):
+    """
+    Возвращает k текстов, наиболее похожих на данный (?k=10&corpus=<id>).
+    ?mode=ann — приближённый поиск по индексу фрагментов.
+    """
+    try:
+        k = int(request.GET.get("k", 10))
+        corpus_id = request.GET.get("corpus")
+        corpus_id = int(corpus_id) if corpus_id else None
+    except ValueError:
+        return Response({"error": "k and corpus must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+    approximate = request.GET.get("mode") == "ann"
+    if approximate and corpus_id is not None:
+        return Response({"error": "corpus filter is not supported in ann mode"}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = find_similar_texts(text_id, k=k, corpus_id=corpus_id, approximate=approximate)
+    return Response({"text_id": text_id, "results": results})
+
+
+
+@api_view(["POST"])
+@permission_classes((AllowAny,))
+def compare_matrix(request):
+    """
+    Матрица косинусного сходства N×M между двумя наборами текстов.
+    Тело: {"ids1": [...], "ids2": [...]} или {"corpus1": id, "corpus2": id},
+    необязательно "block_rows". Ответ отдаётся потоком, блоками строк.
+    """
+    data = request.data
+    if data.get("corpus1") is None and data.get("ids1") is None:
+        return Response({"error": "ids1 or corpus1 is required"}, status=status.HTTP_400_BAD_REQUEST)
+    if data.get("corpus2") is None and data.get("ids2") is None:
+        return Response({"error": "ids2 or corpus2 is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        ids1, missing1 = resolve_text_ids(data.get("ids1"), data.get("corpus1"))
+        ids2, missing2 = resolve_text_ids(data.get("ids2"), data.get("corpus2"))
+        block_rows = max(1, int(data.get("block_rows", 256)))
+    except (TypeError, ValueError):
+        return Response({"error": "ids must be lists of integers, corpus and block_rows integers"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    if missing1 or missing2:
+        return Response({"error": "Texts not found", "missing": sorted(set(missing1 + missing2))},
+                        status=status.HTTP_404_NOT_FOUND)
+
+    # векторы (и вызовы модели для текстов без эмбеддинга) — до отправки статуса
+    rows = normalized_matrix(ids1)
+    cols = normalized_matrix(ids2)
+    return StreamingHttpResponse(
+        iter_similarity_matrix(ids1, ids2, rows, cols, block_rows=block_rows),
+        content_type="application/json",
+    )
+
+
+
+@api_view(["GET"])
+@permission_classes((AllowAny,))
+def embedding_stats(request):
+    """
+    Статистика микробатчинга эмбеддингов в текущем воркере.
+    """
+    return Response(dispatcher.stats())
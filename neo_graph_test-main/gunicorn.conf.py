@@ -0,0 +1,17 @@
+"""
+Конфигурация gunicorn (подхватывается автоматически из рабочего каталога).
+
+При EMBEDDING_PRELOAD=1 приложение импортируется в master-процессе,
+core.wsgi загружает модель эмбеддингов до fork, и все воркеры
+разделяют одну копию весов.
+"""
+import os
+
+preload_app = os.getenv("EMBEDDING_PRELOAD", "0") == "1"
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from db.embeddings import model_provider
+    model_provider.after_fork()